@@ -0,0 +1,101 @@
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "recognize-speech-cron"))
+
+from artifacts import ENCODINGS, compress, open_decoded
+
+REPEATS = 20
+# Пропускная способность функции до Object Storage, по которой оценивается время скачивания
+BANDWIDTH_MBIT = 100
+
+WORDS = ("лекция", "пример", "функция", "определение", "теорема", "доказательство", "задача",
+         "множество", "значение", "алгоритм", "сложность", "память", "данные", "модель")
+
+
+def make_sentence(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_summary(sections: int) -> dict:
+    # То, что сейчас лежит в speech/: конспект от модели в виде JSON
+    rnd = random.Random(sections)
+    return {
+        "title": "Лекция",
+        "sections": [
+            {
+                "title": make_sentence(rnd, 4),
+                "content": " ".join(make_sentence(rnd, 12) for _ in range(6)),
+                "examples": [make_sentence(rnd, 10) for _ in range(3)],
+                "key_points": [make_sentence(rnd, 6) for _ in range(5)],
+            }
+            for _ in range(sections)
+        ],
+    }
+
+
+def make_transcript(minutes: int) -> dict:
+    # Полная расшифровка с таймингами слов, примерно 130 слов в минуту
+    rnd = random.Random(minutes)
+    utterances = []
+    t = 0
+    for _ in range(minutes * 10):
+        words = []
+        for _ in range(13):
+            word = rnd.choice(WORDS)
+            words.append({"text": word, "startTimeMs": str(t), "endTimeMs": str(t + 350)})
+            t += 460
+        utterances.append({
+            "alternatives": [{
+                "text": " ".join(w["text"] for w in words),
+                "words": words,
+                "confidence": 1,
+            }],
+            "channelTag": "0",
+        })
+    return {"utterances": utterances}
+
+
+def time_call(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench(obj) -> list[tuple]:
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    rows = []
+    for encoding in ENCODINGS:
+        stored = compress(data, encoding)
+        write_ms = statistics.median(time_call(lambda: compress(data, encoding)) for _ in range(REPEATS)) * 1000
+        read_ms = statistics.median(
+            time_call(lambda: json.load(open_decoded(io.BytesIO(stored), encoding))) for _ in range(REPEATS)
+        ) * 1000
+        transfer_ms = len(stored) * 8 / (BANDWIDTH_MBIT * 1_000_000) * 1000
+        rows.append((encoding, len(data), len(stored), write_ms, read_ms, read_ms + transfer_ms))
+    return rows
+
+
+def report(name: str, rows: list[tuple]):
+    raw = rows[0][1]
+    print(f"\n{name}, {raw} bytes of JSON")
+    print(f"{'encoding':<10} {'stored':>10} {'saved':>7} {'write':>10} {'decode':>10} "
+          f"{'read @' + str(BANDWIDTH_MBIT) + 'Mbit':>16}")
+    for encoding, _, stored, write_ms, read_ms, total_ms in rows:
+        saved = (1 - stored / raw) * 100
+        print(f"{encoding:<10} {stored:>10} {saved:>6.1f}% {write_ms:>7.2f} ms {read_ms:>7.2f} ms {total_ms:>13.2f} ms")
+
+
+if __name__ == "__main__":
+    artifacts = {
+        "speech/ summary, 45 min lecture (15 sections)": make_summary(15),
+        "speech/ summary, 90 min lecture (40 sections)": make_summary(40),
+        "transcript, 90 min lecture": make_transcript(90),
+    }
+    for name, obj in artifacts.items():
+        report(name, bench(obj))
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from support import load_json_fixture, read_fixture
+
+
+@pytest.mark.benchmark(group="form-receiver")
+def bench_parse_request_body(benchmark, form_receiver):
+    event = load_json_fixture("form_event.json")
+    result = benchmark(form_receiver["main"].parse_request_body, event)
+    assert result["yandex-link"].startswith("https://disk.yandex.ru/")
+
+
+@pytest.mark.benchmark(group="form-receiver")
+def bench_parse_request_body_base64(benchmark, form_receiver):
+    event = load_json_fixture("form_event_base64.json")
+    result = benchmark(form_receiver["main"].parse_request_body, event)
+    assert result["yandex-link"].startswith("https://disk.yandex.ru/")
+
+
+@pytest.mark.benchmark(group="form-receiver")
+def bench_parse_bulk_request_body(benchmark, form_receiver):
+    event = load_json_fixture("bulk_event.json")
+    result = benchmark(form_receiver["main"].parse_bulk_request_body, event)
+    assert len(result["links"]) == 200
+
+
+# Начало handler у функций на очередях: лог события, разбор тела, полоса,
+# метрика ожидания в очереди и контекст трассировки
+def decode_queue_event(modules: dict, event: dict) -> list[tuple]:
+    main = modules["main"]
+    main.logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
+    decoded = []
+    for message in event["messages"]:
+        body = json.loads(message["details"]["message"]["body"])
+        lane = main.get_lane(body)
+        main.record_queue_wait(main.STAGE_NAME, lane, message)
+        decoded.append((body["task_id"], body["object_name"], lane, main.get_message_traceparent(message)))
+    return decoded
+
+
+@pytest.mark.benchmark(group="queue-event")
+def bench_load_queue_event(benchmark):
+    raw = read_fixture("queue_event.json")
+    event = benchmark(json.loads, raw)
+    assert len(event["messages"]) == 10
+
+
+@pytest.mark.benchmark(group="queue-event")
+def bench_decode_queue_event(benchmark, recognize_speech):
+    event = load_json_fixture("queue_event.json")
+    decoded = benchmark(decode_queue_event, recognize_speech, event)
+    assert len(decoded) == 10
+    assert all(traceparent for *_, traceparent in decoded)
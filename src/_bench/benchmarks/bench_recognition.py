@@ -0,0 +1,42 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from support import read_fixture
+
+GET_RECOGNITION_URL = "https://stt.api.cloud.yandex.net/stt/v3/getRecognition"
+
+
+@pytest.fixture(scope="module")
+def recognition_ndjson() -> bytes:
+    return read_fixture("get_recognition.ndjson.gz")
+
+
+# Полный путь cron: запрос через requests, декодирование 3 МБ ответа, разбор
+# последней строки с резюме и фрагментов речи для поиска
+@pytest.mark.benchmark(group="recognition")
+def bench_check_recognition_status(benchmark, recognize_speech_cron, recorded_http, recognition_ndjson):
+    recorded_http.add("GET", GET_RECOGNITION_URL, 200, recognition_ndjson, "application/json")
+    config = SimpleNamespace(ya_api_key="bench")
+    done, result, utterances = benchmark(recognize_speech_cron["main"].check_recognition_status,
+                                         config, "operation-id")
+    assert done
+    assert "summarization" in result["result"]
+    assert utterances
+
+
+# Только разбор: отделяет стоимость splitlines и json.loads от накладных расходов requests
+@pytest.mark.benchmark(group="recognition")
+def bench_parse_recognition_last_line(benchmark, recognition_ndjson):
+    text = recognition_ndjson.decode("utf-8")
+    result = benchmark(lambda: json.loads(text.splitlines()[-1]))
+    assert "summarization" in result["result"]
+
+
+# Фрагменты речи с отметками времени из finalRefinement для transcript/
+@pytest.mark.benchmark(group="recognition")
+def bench_parse_transcript(benchmark, recognize_speech_cron, recognition_ndjson):
+    lines = recognition_ndjson.decode("utf-8").splitlines()
+    utterances = benchmark(recognize_speech_cron["main"].parse_transcript, lines)
+    assert utterances[0]["start_ms"] == 0
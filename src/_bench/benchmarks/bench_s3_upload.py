@@ -0,0 +1,49 @@
+import os
+from io import BytesIO
+
+import pytest
+
+from support import BUCKET
+
+MB = 1024 * 1024
+SIZES_MB = (16, 64)
+# Кусок, которым write_pdf отдаёт данные в файлоподобный объект
+PDF_WRITE_CHUNK = 64 * 1024
+
+
+@pytest.fixture(scope="module")
+def buffers() -> dict[int, bytes]:
+    # Случайные байты: видео и PDF почти не сжимаются
+    return {size: os.urandom(size * MB) for size in SIZES_MB}
+
+
+# Как в download: весь файл в памяти, upload_fileobj с настройками s3transfer по умолчанию
+@pytest.mark.benchmark(group="s3-upload")
+@pytest.mark.parametrize("size_mb", SIZES_MB)
+def bench_upload_fileobj(benchmark, download, s3_client, s3_stand_in, buffers, size_mb):
+    client = download["tracing"].instrument_boto_client(s3_client)
+    data = buffers[size_mb]
+    key = f"video/bench-{size_mb}"
+    benchmark.pedantic(lambda: client.upload_fileobj(BytesIO(data), BUCKET, key,
+                                                     ExtraArgs={"ContentType": "video/mp4"}),
+                       rounds=5, warmup_rounds=1)
+    assert s3_stand_in.object_size(BUCKET, key) == size_mb * MB
+
+
+# Как в summary: PDF пишется кусками, части уходят в S3 по мере заполнения буфера
+@pytest.mark.benchmark(group="s3-upload")
+@pytest.mark.parametrize("size_mb", SIZES_MB)
+def bench_multipart_upload_writer(benchmark, summary, s3_client, s3_stand_in, buffers, size_mb):
+    pdf_renderer = summary["pdf_renderer"]
+    client = summary["tracing"].instrument_boto_client(s3_client)
+    data = memoryview(buffers[size_mb])
+    key = f"pdf/bench-{size_mb}/lecture.pdf"
+
+    def upload():
+        writer = pdf_renderer.MultipartUploadWriter(client, BUCKET, key, "application/pdf")
+        for offset in range(0, len(data), PDF_WRITE_CHUNK):
+            writer.write(data[offset:offset + PDF_WRITE_CHUNK])
+        writer.close()
+
+    benchmark.pedantic(upload, rounds=5, warmup_rounds=1)
+    assert s3_stand_in.object_size(BUCKET, key) == size_mb * MB
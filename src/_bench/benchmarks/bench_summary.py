@@ -0,0 +1,86 @@
+import io
+
+import pytest
+
+from support import BUCKET, load_json_fixture, read_fixture
+
+LECTURE_NAME = "Алгоритмы на графах"
+
+
+@pytest.fixture(scope="module")
+def speech_summary() -> str:
+    return read_fixture("speech_summary.json").decode("utf-8")
+
+
+@pytest.fixture(scope="module")
+def lecture_html() -> str:
+    return read_fixture("lecture.html").decode("utf-8")
+
+
+@pytest.fixture
+def summary_main(summary, s3_client, monkeypatch):
+    main = summary["main"]
+    monkeypatch.setattr(main, "_s3_client", main.instrument_boto_client(s3_client))
+    # Лимитер запросов к LLM живёт в YDB, в замере конвертации он не нужен
+    monkeypatch.setattr(main, "acquire", lambda *args, **kwargs: None)
+    return main
+
+
+@pytest.mark.benchmark(group="summary-cache")
+def bench_make_cache_key(benchmark, summary, speech_summary):
+    llm_cache = summary["llm_cache"]
+    main = summary["main"]
+    key = benchmark(llm_cache.make_cache_key, main.LLM_MODEL_NAME, main.LLM_MODEL_VERSION,
+                    main.LLM_TEMPERATURE, "instruction", speech_summary)
+    assert len(key) == 64
+
+
+# JSON конспекта -> HTML: ответ модели из фикстуры, запрос, разбор ответа и запись в кэш
+@pytest.mark.benchmark(group="summary-html")
+def bench_ai_html_summary_llm(benchmark, summary_main, s3_stand_in, config, recorded_http, speech_summary):
+    recorded_http.add("POST", summary_main.LLM_COMPLETION_URL, 200,
+                      read_fixture("llm_completion.json"), "application/json")
+
+    def clear_cache():
+        for key, _ in s3_stand_in.list_objects(BUCKET, "llm-cache/", ""):
+            s3_stand_in.delete(BUCKET, key)
+
+    html = benchmark.pedantic(summary_main.get_ai_html_summary,
+                              args=(config, LECTURE_NAME, speech_summary, "medium"),
+                              setup=clear_cache, rounds=50, warmup_rounds=2)
+    assert html == load_json_fixture("llm_completion.json")["result"]["alternatives"][0]["message"]["text"]
+
+
+@pytest.mark.benchmark(group="summary-html")
+def bench_ai_html_summary_cached(benchmark, summary_main, config, recorded_http, speech_summary):
+    recorded_http.add("POST", summary_main.LLM_COMPLETION_URL, 200,
+                      read_fixture("llm_completion.json"), "application/json")
+    summary_main.get_ai_html_summary(config, LECTURE_NAME, speech_summary, "medium")
+    # Без записанного ответа промах кэша упадёт, так что все раунды идут из кэша
+    recorded_http.responses.clear()
+    html = benchmark(summary_main.get_ai_html_summary, config, LECTURE_NAME, speech_summary, "medium")
+    assert html.startswith("<!DOCTYPE html>")
+
+
+@pytest.fixture(scope="module")
+def weasyprint():
+    try:
+        import weasyprint
+    except (ImportError, OSError) as e:
+        # Без pango/harfbuzz weasyprint не загружается; в облаке они есть в образе
+        pytest.skip(f"weasyprint is not available: {e}")
+    return weasyprint
+
+
+@pytest.mark.benchmark(group="pdf")
+def bench_write_pdf_fresh(benchmark, weasyprint, lecture_html):
+    pdf = benchmark.pedantic(lambda: weasyprint.HTML(string=lecture_html).write_pdf(io.BytesIO()),
+                             rounds=5, warmup_rounds=1)
+    assert pdf is None
+
+
+@pytest.mark.benchmark(group="pdf")
+def bench_pdf_renderer_warm(benchmark, weasyprint, summary, lecture_html):
+    renderer = summary["pdf_renderer"].PdfRenderer(warm_up=True)
+    benchmark.pedantic(lambda: renderer.render(lecture_html, io.BytesIO()), rounds=5, warmup_rounds=1)
+
@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+
+import pytest
+
+from s3_stand_in import S3StandIn
+from support import BUCKET, load_function
+
+# Запуск из src/_bench:
+#   pytest                                  — прогон, результаты сохраняются в results/
+#   pytest --benchmark-compare              — сравнение с последним сохранённым прогоном
+#   pytest --benchmark-compare=0001 --benchmark-compare-fail=median:15%
+#                                           — упасть, если медиана выросла больше чем на 15%
+#   pytest-benchmark compare results/*/0001_*.json results/*/0002_*.json
+#                                           — таблица по двум релизам без перезапуска
+
+
+@pytest.fixture(scope="session")
+def form_receiver():
+    return load_function("form-receiver")
+
+
+@pytest.fixture(scope="session")
+def recognize_speech():
+    return load_function("recognize-speech")
+
+
+@pytest.fixture(scope="session")
+def recognize_speech_cron():
+    return load_function("recognize-speech-cron")
+
+
+@pytest.fixture(scope="session")
+def download():
+    return load_function("download")
+
+
+@pytest.fixture(scope="session")
+def summary():
+    return load_function("summary")
+
+
+@pytest.fixture(scope="session")
+def config():
+    # Только то, что читают функции под замером; окружение функций не нужно
+    return SimpleNamespace(
+        s3_bucket_name=BUCKET,
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        ya_api_key="bench",
+        folder_id="bench-folder",
+        llm_rate_per_second=1000.0,
+        llm_burst=1000.0,
+        rate_limit_wait_seconds=0.0,
+        llm_cache_ttl_seconds=86400,
+        llm_cache_max_bytes=256 * 1024 * 1024,
+        llm_cache_evict_probability=0.05,
+    )
+
+
+@pytest.fixture(scope="session")
+def s3_stand_in():
+    server = S3StandIn().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def s3_client(s3_stand_in, config):
+    import boto3
+    from botocore.config import Config as BotoConfig
+
+    # Те же параметры, что у клиентов в функциях, кроме адреса
+    return boto3.client(
+        "s3",
+        endpoint_url=s3_stand_in.endpoint_url,
+        region_name="ru-central1",
+        aws_access_key_id=config.aws_access_key_id,
+        aws_secret_access_key=config.aws_secret_access_key,
+        config=BotoConfig(s3={"addressing_style": "path"}),
+    )
+
+
+class RecordedTransport:
+    def __init__(self):
+        self.responses = {}
+
+    def add(self, method: str, url: str, status: int, body: bytes, content_type: str):
+        self.responses[(method, url)] = (status, body, content_type)
+
+    def send(self, adapter, request, **kwargs):
+        from requests.models import Response
+        from requests.structures import CaseInsensitiveDict
+
+        status, body, content_type = self.responses[(request.method, request.url.split("?", 1)[0])]
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({"Content-Type": content_type, "Content-Length": str(len(body))})
+        response._content = body
+        response.encoding = None
+        response.url = request.url
+        response.request = request
+        response.connection = adapter
+        return response
+
+
+# Ответы внешних API подставляются на уровне транспорта requests: код функции,
+# сборка запроса и разбор ответа выполняются полностью, без сети
+@pytest.fixture
+def recorded_http(monkeypatch):
+    import requests.adapters
+
+    transport = RecordedTransport()
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send",
+                        lambda adapter, request, **kwargs: transport.send(adapter, request, **kwargs))
+    return transport
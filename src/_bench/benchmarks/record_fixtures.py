@@ -0,0 +1,217 @@
+import base64
+import gzip
+import json
+import os
+import random
+import uuid
+from urllib.parse import urlencode
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Фикстуры повторяют форму настоящих событий API Gateway, триггера Message Queue
+# и ответов SpeechKit/YandexGPT. Генерация детерминированная: перезапись файлов
+# не меняет их, пока не поменяется этот скрипт, и результаты остаются сравнимыми.
+SEED = 20251019
+LECTURE_MINUTES = 90
+QUEUE_BATCH_SIZE = 10
+BULK_LINKS = 200
+
+WORDS = ("лекция", "пример", "функция", "определение", "теорема", "доказательство", "задача",
+         "множество", "значение", "алгоритм", "сложность", "память", "данные", "модель",
+         "граф", "вершина", "ребро", "матрица", "вектор", "оценка", "сумма", "предел")
+
+
+def make_sentence(rnd: random.Random, words: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_traceparent(rnd: random.Random) -> str:
+    return f"00-{rnd.getrandbits(128):032x}-{rnd.getrandbits(64):016x}-01"
+
+
+def make_form_event(rnd: random.Random) -> dict:
+    body = urlencode({
+        "lecture-title": "Алгоритмы и структуры данных, лекция 7: " + make_sentence(rnd, 6),
+        "yandex-link": "https://disk.yandex.ru/i/" + base64.urlsafe_b64encode(rnd.randbytes(12)).decode(),
+    })
+    return {
+        "httpMethod": "POST",
+        "url": "/upload",
+        "path": "/upload",
+        "headers": {
+            "Accept": "text/html,application/xhtml+xml",
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Origin": "https://lectures.example.ru",
+            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/131.0",
+            "X-Real-Remote-Address": "[203.0.113.7]:51234",
+        },
+        "queryStringParameters": {},
+        "requestContext": {
+            "identity": {"sourceIp": "203.0.113.7", "userAgent": "Mozilla/5.0"},
+            "httpMethod": "POST",
+            "requestId": str(uuid.UUID(int=rnd.getrandbits(128))),
+            "requestTime": "19/Oct/2025:10:00:00 +0000",
+            "requestTimeEpoch": 1760868000,
+        },
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+def make_base64_form_event(rnd: random.Random) -> dict:
+    event = make_form_event(rnd)
+    event["body"] = base64.b64encode(event["body"].encode("utf-8")).decode("ascii")
+    event["isBase64Encoded"] = True
+    return event
+
+
+def make_bulk_event(rnd: random.Random) -> dict:
+    event = make_form_event(rnd)
+    event["url"] = event["path"] = "/upload/bulk"
+    event["headers"]["Content-Type"] = "application/json"
+    event["body"] = json.dumps({
+        "lecture_title": "Курс по алгоритмам",
+        "links": ["https://disk.yandex.ru/i/" + base64.urlsafe_b64encode(rnd.randbytes(12)).decode()
+                  for _ in range(BULK_LINKS)],
+    }, ensure_ascii=False)
+    return event
+
+
+def make_queue_event(rnd: random.Random) -> dict:
+    messages = []
+    for _ in range(QUEUE_BATCH_SIZE):
+        task_id = str(uuid.UUID(int=rnd.getrandbits(128)))
+        body = {"task_id": task_id, "object_name": f"audio/{task_id}", "lane": rnd.choice(["short", "medium", "long"]),
+                "stage_event": {"stage": "extract-audio", "started_at": "2025-10-19T10:00:00.000+00:00",
+                                "finished_at": "2025-10-19T10:01:12.345+00:00",
+                                "bytes_in": rnd.randint(10**8, 10**9), "bytes_out": rnd.randint(10**6, 10**8)}}
+        messages.append({
+            "event_metadata": {
+                "event_id": str(uuid.UUID(int=rnd.getrandbits(128))),
+                "event_type": "yandex.cloud.events.messagequeue.QueueMessage",
+                "created_at": "2025-10-19T10:01:12.500Z",
+                "cloud_id": "b1gexamplecloud00000",
+                "folder_id": "b1gexamplefolder0000",
+            },
+            "details": {
+                "queue_id": "yrn:yc:ymq:ru-central1:b1gexamplefolder0000:recognize-speech-queue-medium",
+                "message": {
+                    "message_id": str(uuid.UUID(int=rnd.getrandbits(128))),
+                    "md5_of_body": f"{rnd.getrandbits(128):032x}",
+                    "body": json.dumps(body, ensure_ascii=False),
+                    "attributes": {"SentTimestamp": "1760868072500"},
+                    "message_attributes": {
+                        "Source": {"dataType": "String", "stringValue": "cloud-function"},
+                        "traceparent": {"dataType": "String", "stringValue": make_traceparent(rnd)},
+                    },
+                    "md5_of_message_attributes": f"{rnd.getrandbits(128):032x}",
+                },
+            },
+        })
+    return {"messages": messages}
+
+
+def make_summary(rnd: random.Random, sections: int) -> dict:
+    # Конспект, который SpeechKit возвращает в summarization и который лежит в speech/
+    return {
+        "title": "Алгоритмы на графах",
+        "sections": [
+            {
+                "title": make_sentence(rnd, 4),
+                "content": " ".join(make_sentence(rnd, 12) for _ in range(6)),
+                "examples": [make_sentence(rnd, 10) for _ in range(3)],
+                "key_points": [make_sentence(rnd, 6) for _ in range(5)],
+            }
+            for _ in range(sections)
+        ],
+        "conclusion": " ".join(make_sentence(rnd, 10) for _ in range(3)),
+    }
+
+
+# Ответ getRecognition: NDJSON со всеми промежуточными результатами распознавания,
+# резюме только в последней строке
+def make_recognition_ndjson(rnd: random.Random, minutes: int, summary: dict) -> bytes:
+    lines = []
+    t = 0
+    for i in range(minutes * 10):
+        words = []
+        for _ in range(13):
+            words.append({"text": rnd.choice(WORDS), "startTimeMs": str(t), "endTimeMs": str(t + 350)})
+            t += 460
+        text = " ".join(w["text"] for w in words)
+        start, end = words[0]["startTimeMs"], words[-1]["endTimeMs"]
+        cursors = {"receivedDataMs": end, "resetTimeMs": "0", "partialTimeMs": end, "finalTimeMs": end,
+                   "finalIndex": str(i), "eouTimeMs": "0"}
+        lines.append({"result": {
+            "sessionUuid": {"uuid": "0f8e7c1a-5d2b-4c3e-9a6f-123456789abc", "userRequestId": ""},
+            "audioCursors": cursors,
+            "responseWallTimeMs": str(t + 120),
+            "final": {"alternatives": [{"words": words, "text": text, "startTimeMs": start, "endTimeMs": end,
+                                        "confidence": 0, "languages": [{"languageCode": "ru-RU", "probability": 1}]}],
+                      "channelTag": "0"},
+            "channelTag": "0",
+        }})
+        lines.append({"result": {
+            "sessionUuid": {"uuid": "0f8e7c1a-5d2b-4c3e-9a6f-123456789abc", "userRequestId": ""},
+            "audioCursors": cursors,
+            "responseWallTimeMs": str(t + 180),
+            "finalRefinement": {"finalIndex": str(i), "normalizedText": {"alternatives": [
+                {"words": words, "text": text.capitalize() + ".", "startTimeMs": start, "endTimeMs": end,
+                 "confidence": 0, "languages": [{"languageCode": "ru-RU", "probability": 1}]}]}},
+            "channelTag": "0",
+        }})
+    lines.append({"result": {
+        "sessionUuid": {"uuid": "0f8e7c1a-5d2b-4c3e-9a6f-123456789abc", "userRequestId": ""},
+        "summarization": {"results": [{"response": json.dumps(summary, ensure_ascii=False)}],
+                          "contentUsage": {"inputTextTokens": "41234", "completionTokens": "2345",
+                                           "totalTokens": "43579"}},
+        "channelTag": "0",
+    }})
+    return "\n".join(json.dumps(line, ensure_ascii=False) for line in lines).encode("utf-8")
+
+
+def render_html(title: str, summary: dict) -> str:
+    parts = [f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"></head><body><h1>{title}</h1>"]
+    for section in summary["sections"]:
+        parts.append(f"<h2>{section['title']}</h2><p>{section['content']}</p>")
+        parts.append("<h3>Примеры</h3><ul>" + "".join(f"<li>{e}</li>" for e in section["examples"]) + "</ul>")
+        parts.append("<h3>Главное</h3><ol>" + "".join(f"<li>{p}</li>" for p in section["key_points"]) + "</ol>")
+    parts.append(f"<h2>Заключение</h2><p>{summary['conclusion']}</p></body></html>")
+    return "".join(parts)
+
+
+def make_llm_completion(html: str) -> dict:
+    return {"result": {
+        "alternatives": [{"message": {"role": "assistant", "text": html}, "status": "ALTERNATIVE_STATUS_FINAL"}],
+        "usage": {"inputTextTokens": "6120", "completionTokens": str(len(html) // 3),
+                  "totalTokens": str(6120 + len(html) // 3)},
+        "modelVersion": "23.10.2024",
+    }}
+
+
+def write_json(name: str, obj):
+    with open(os.path.join(FIXTURES_DIR, name), "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    rnd = random.Random(SEED)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+
+    write_json("form_event.json", make_form_event(rnd))
+    write_json("form_event_base64.json", make_base64_form_event(rnd))
+    write_json("bulk_event.json", make_bulk_event(rnd))
+    write_json("queue_event.json", make_queue_event(rnd))
+
+    summary = make_summary(rnd, 40)
+    write_json("speech_summary.json", summary)
+    with open(os.path.join(FIXTURES_DIR, "get_recognition.ndjson.gz"), "wb") as f:
+        f.write(gzip.compress(make_recognition_ndjson(rnd, LECTURE_MINUTES, summary), mtime=0))
+
+    html = render_html(summary["title"], summary)
+    with open(os.path.join(FIXTURES_DIR, "lecture.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+    write_json("llm_completion.json", make_llm_completion(html))
+
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        print(f"{name:<28}{os.path.getsize(os.path.join(FIXTURES_DIR, name)):>10} bytes")
@@ -0,0 +1,238 @@
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+# Локальный S3 по HTTP: boto3 работает с ним как с Object Storage, поэтому в замер
+# попадают сериализация, подпись, контрольные суммы и multipart из s3transfer.
+# Поддержано только то, чем пользуются функции.
+
+STORED_HEADERS = ("content-type", "content-encoding")
+
+
+class StoredObject:
+    def __init__(self, body: bytes, headers: dict):
+        self.body = body
+        self.headers = headers
+        self.etag = hashlib.md5(body).hexdigest()
+        self.last_modified = datetime.now(timezone.utc)
+
+
+def decode_aws_chunked(data: bytes) -> bytes:
+    # <размер в hex>[;подпись]\r\n<данные>\r\n ... 0\r\n<трейлеры с контрольной суммой>\r\n\r\n
+    body = bytearray()
+    pos = 0
+    while True:
+        line_end = data.index(b"\r\n", pos)
+        size = int(data[pos:line_end].split(b";", 1)[0], 16)
+        pos = line_end + 2
+        if size == 0:
+            return bytes(body)
+        body += data[pos:pos + size]
+        pos += size + 2
+
+
+class S3RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def store(self) -> "S3StandIn":
+        return self.server.store
+
+    def _split_path(self) -> tuple[str, str, dict]:
+        url = urlparse(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        return bucket, key, parse_qs(url.query, keep_blank_values=True)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            data = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b";", 1)[0], 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                data += self.rfile.read(size)
+                self.rfile.readline()
+            data = bytes(data)
+        else:
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if "aws-chunked" in self.headers.get("Content-Encoding", "") or \
+                self.headers.get("x-amz-content-sha256", "").startswith("STREAMING-"):
+            data = decode_aws_chunked(data)
+        return data
+
+    def _send(self, status: int, body: bytes = b"", headers: dict | None = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_xml(self, status: int, xml: str):
+        self._send(status, ('<?xml version="1.0" encoding="UTF-8"?>' + xml).encode("utf-8"),
+                   {"Content-Type": "application/xml"})
+
+    def _send_error(self, status: int, code: str, message: str):
+        self._send_xml(status, f"<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>")
+
+    def do_PUT(self):
+        bucket, key, query = self._split_path()
+        body = self._read_body()
+        if "uploadId" in query:
+            etag = self.store.put_part(query["uploadId"][0], int(query["partNumber"][0]), body)
+            if etag is None:
+                return self._send_error(404, "NoSuchUpload", query["uploadId"][0])
+            return self._send(200, headers={"ETag": f'"{etag}"'})
+        headers = {name: value for name, value in self.headers.items()
+                   if name.lower() in STORED_HEADERS or name.lower().startswith("x-amz-meta-")}
+        headers["content-encoding"] = ", ".join(
+            e.strip() for e in headers.get("content-encoding", "").split(",") if e.strip() not in ("", "aws-chunked"))
+        obj = self.store.put(bucket, key, body, {k: v for k, v in headers.items() if v})
+        self._send(200, headers={"ETag": f'"{obj.etag}"'})
+
+    def do_POST(self):
+        bucket, key, query = self._split_path()
+        body = self._read_body()
+        if "uploads" in query:
+            upload_id = self.store.create_upload(bucket, key, self.headers.get("Content-Type"))
+            return self._send_xml(200, f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket>"
+                                       f"<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                                       f"</InitiateMultipartUploadResult>")
+        if "uploadId" in query:
+            obj = self.store.complete_upload(query["uploadId"][0])
+            if obj is None:
+                return self._send_error(404, "NoSuchUpload", query["uploadId"][0])
+            return self._send_xml(200, f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket>"
+                                       f"<Key>{escape(key)}</Key><ETag>\"{obj.etag}\"</ETag>"
+                                       f"</CompleteMultipartUploadResult>")
+        if "delete" in query:
+            keys = [unquote(part.split("</Key>", 1)[0]) for part in body.decode("utf-8").split("<Key>")[1:]]
+            for k in keys:
+                self.store.delete(bucket, k)
+            deleted = "".join(f"<Deleted><Key>{escape(k)}</Key></Deleted>" for k in keys)
+            return self._send_xml(200, f"<DeleteResult>{deleted}</DeleteResult>")
+        self._send_error(400, "InvalidRequest", "Unsupported POST")
+
+    def do_GET(self):
+        bucket, key, query = self._split_path()
+        if not key:
+            return self._list(bucket, query)
+        obj = self.store.get(bucket, key)
+        if obj is None:
+            return self._send_error(404, "NoSuchKey", "The specified key does not exist.")
+        headers = dict(obj.headers)
+        headers["ETag"] = f'"{obj.etag}"'
+        headers["Last-Modified"] = format_datetime(obj.last_modified, usegmt=True)
+        self._send(200, obj.body, headers)
+
+    do_HEAD = do_GET
+
+    def do_DELETE(self):
+        bucket, key, query = self._split_path()
+        if "uploadId" in query:
+            self.store.abort_upload(query["uploadId"][0])
+        else:
+            self.store.delete(bucket, key)
+        self._send(204)
+
+    def _list(self, bucket: str, query: dict):
+        prefix = query.get("prefix", [""])[0]
+        start_after = query.get("continuation-token", query.get("start-after", [""]))[0]
+        max_keys = int(query.get("max-keys", ["1000"])[0])
+        items = self.store.list_objects(bucket, prefix, start_after)
+        page = items[:max_keys]
+        truncated = len(items) > max_keys
+        contents = "".join(
+            f"<Contents><Key>{escape(k)}</Key><Size>{len(obj.body)}</Size><ETag>\"{obj.etag}\"</ETag>"
+            f"<LastModified>{obj.last_modified.strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified></Contents>"
+            for k, obj in page
+        )
+        token = f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>" if truncated else ""
+        self._send_xml(200, f"<ListBucketResult><Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix>"
+                            f"<KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+                            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+                            f"{contents}{token}</ListBucketResult>")
+
+
+class S3StandIn:
+    def __init__(self):
+        self._objects = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), S3RequestHandler)
+        self._server.store = self
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="s3-stand-in", daemon=True)
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def put(self, bucket: str, key: str, body: bytes, headers: dict) -> StoredObject:
+        obj = StoredObject(body, headers)
+        with self._lock:
+            self._objects[(bucket, key)] = obj
+        return obj
+
+    def get(self, bucket: str, key: str) -> StoredObject | None:
+        with self._lock:
+            return self._objects.get((bucket, key))
+
+    def delete(self, bucket: str, key: str):
+        with self._lock:
+            self._objects.pop((bucket, key), None)
+
+    def list_objects(self, bucket: str, prefix: str, start_after: str) -> list[tuple[str, StoredObject]]:
+        with self._lock:
+            items = [(k, obj) for (b, k), obj in self._objects.items()
+                     if b == bucket and k.startswith(prefix) and k > start_after]
+        return sorted(items, key=lambda item: item[0])
+
+    def create_upload(self, bucket: str, key: str, content_type: str | None) -> str:
+        upload_id = hashlib.md5(f"{bucket}/{key}/{datetime.now().timestamp()}".encode()).hexdigest()
+        with self._lock:
+            self._uploads[upload_id] = (bucket, key, {"content-type": content_type} if content_type else {}, {})
+        return upload_id
+
+    def put_part(self, upload_id: str, part_number: int, body: bytes) -> str | None:
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                return None
+            upload[3][part_number] = body
+        return hashlib.md5(body).hexdigest()
+
+    def complete_upload(self, upload_id: str) -> StoredObject | None:
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is None:
+            return None
+        bucket, key, headers, parts = upload
+        return self.put(bucket, key, b"".join(parts[n] for n in sorted(parts)), headers)
+
+    def abort_upload(self, upload_id: str):
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+
+    def object_size(self, bucket: str, key: str) -> int | None:
+        obj = self.get(bucket, key)
+        return None if obj is None else len(obj.body)
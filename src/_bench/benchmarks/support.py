@@ -0,0 +1,41 @@
+import gzip
+import importlib
+import json
+import logging
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+BUCKET = "bench-bucket"
+
+
+# У функций одноимённые модули (main, config, tracing...), поэтому каждая
+# импортируется в свой набор модулей, как в облаке
+def load_function(function_name: str) -> dict:
+    function_dir = os.path.join(SRC_DIR, function_name)
+    names = [f[:-3] for f in os.listdir(function_dir) if f.endswith(".py")]
+    saved = {name: sys.modules.pop(name) for name in names if name in sys.modules}
+    sys.path.insert(0, function_dir)
+    try:
+        importlib.import_module("main")
+        return {name: sys.modules[name] for name in names if name in sys.modules}
+    finally:
+        sys.path.remove(function_dir)
+        for name in names:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+        # main выставляет корневому логгеру INFO, и тогда в замер попадает
+        # перехват логов pytest. f-строки сообщений всё равно вычисляются.
+        logging.getLogger().setLevel(logging.WARNING)
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        data = f.read()
+    return gzip.decompress(data) if name.endswith(".gz") else data
+
+
+def load_json_fixture(name: str):
+    return json.loads(read_fixture(name))
@@ -0,0 +1,101 @@
+import os
+import re
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Модули, которые handler импортирует при первом вызове
+FUNCTIONS = {
+    "download": ["boto3.session", "requests", "ydb"],
+    "fetch-ydb": ["ydb"],
+    "form-receiver": ["boto3.session", "ydb"],
+    "recognize-speech": ["boto3", "requests", "ydb", "zstandard"],
+    "recognize-speech-cron": ["boto3", "requests", "ydb", "zstandard"],
+    "summary": ["boto3", "requests", "ydb", "weasyprint", "zstandard"],
+}
+
+# Бюджет в миллисекундах: (импорт main, импорт main + зависимости handler)
+COLD_START_BUDGET_MS = {
+    "download": (100, 2500),
+    "fetch-ydb": (100, 1500),
+    "form-receiver": (100, 2500),
+    "recognize-speech": (100, 2000),
+    "recognize-speech-cron": (100, 2000),
+    "summary": (100, 3500),
+}
+
+DUMMY_ENV = {
+    "YDB_ENDPOINT": "grpcs://localhost:2135",
+    "YDB_DATABASE": "/local",
+    "YDB_TASKS_TABLE_NAME": "tasks_table",
+    "YDB_LEDGER_TABLE_NAME": "stage_ledger",
+    "YDB_STAGE_EVENTS_TABLE_NAME": "stage_events",
+    "S3_BUCKET_NAME": "bucket",
+    "AWS_ACCESS_KEY_ID": "key",
+    "AWS_SECRET_ACCESS_KEY": "secret",
+    "DOWNLOAD_QUEUE_URL_SHORT": "http://localhost/download-short",
+    "DOWNLOAD_QUEUE_URL_MEDIUM": "http://localhost/download-medium",
+    "DOWNLOAD_QUEUE_URL_LONG": "http://localhost/download-long",
+    "EXTRACT_AUDIO_QUEUE_URL_SHORT": "http://localhost/extract-audio-short",
+    "EXTRACT_AUDIO_QUEUE_URL_MEDIUM": "http://localhost/extract-audio-medium",
+    "EXTRACT_AUDIO_QUEUE_URL_LONG": "http://localhost/extract-audio-long",
+    "RECOGNIZE_SPEECH_QUEUE_URL_SHORT": "http://localhost/recognize-speech-short",
+    "RECOGNIZE_SPEECH_QUEUE_URL_MEDIUM": "http://localhost/recognize-speech-medium",
+    "RECOGNIZE_SPEECH_QUEUE_URL_LONG": "http://localhost/recognize-speech-long",
+    "SUMMARY_QUEUE_URL_SHORT": "http://localhost/summary-short",
+    "SUMMARY_QUEUE_URL_MEDIUM": "http://localhost/summary-medium",
+    "SUMMARY_QUEUE_URL_LONG": "http://localhost/summary-long",
+    "FOLDER_ID": "folder",
+    "YA_API_KEY": "api-key",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import_ms(function_dir: str, modules: list[str]) -> float:
+    code = "; ".join(f"import {m}" for m in modules) or "pass"
+    env = dict(os.environ, **DUMMY_ENV, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=function_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        # Считаем только модули верхнего уровня, вложенные уже входят в cumulative
+        if m and len(m.group(3)) == 1:
+            total_us += int(m.group(2))
+    return total_us / 1000
+
+
+if __name__ == "__main__":
+    over_budget = False
+    # Импорты самого интерпретатора (site, encodings) не зависят от функции
+    startup_ms = measure_import_ms(SRC_DIR, [])
+    print(f"Interpreter startup imports: {startup_ms:.1f} ms (subtracted below)")
+    print(f"{'function':<24}{'main, ms':>10}{'budget':>8}{'handler path, ms':>18}{'budget':>8}")
+    for name, deps in FUNCTIONS.items():
+        function_dir = os.path.join(SRC_DIR, name)
+        main_budget, path_budget = COLD_START_BUDGET_MS[name]
+        try:
+            main_ms = measure_import_ms(function_dir, ["main"]) - startup_ms
+            path_ms = measure_import_ms(function_dir, ["main"] + deps) - startup_ms
+        except RuntimeError as e:
+            print(f"{name:<24}failed: {e}")
+            over_budget = True
+            continue
+
+        flag = ""
+        if main_ms > main_budget or path_ms > path_budget:
+            flag = "  OVER BUDGET"
+            over_budget = True
+        print(f"{name:<24}{main_ms:>10.1f}{main_budget:>8}{path_ms:>18.1f}{path_budget:>8}{flag}")
+
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,57 @@
+import io
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "summary"))
+
+from pdf_renderer import PdfRenderer
+
+REPEATS = 5
+
+
+def make_lecture_html(sections: int) -> str:
+    parts = ["<!DOCTYPE html><html><body><h1>Лекция</h1>"]
+    for i in range(sections):
+        parts.append(f"<h2>Раздел {i + 1}</h2>")
+        parts.append("<p>" + "Текст конспекта лекции с примерами и определениями. " * 20 + "</p>")
+        parts.append("<ul>" + "".join(f"<li>Пункт {j + 1}: пример</li>" for j in range(8)) + "</ul>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def time_call(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_naive(html_str: str) -> list[float]:
+    from weasyprint import HTML
+    return [time_call(lambda: HTML(string=html_str).write_pdf(io.BytesIO())) for _ in range(REPEATS)]
+
+
+def bench_engine(renderer: PdfRenderer, html_str: str) -> list[float]:
+    return [time_call(lambda: renderer.render(html_str, io.BytesIO())) for _ in range(REPEATS)]
+
+
+def report(name: str, timings: list[float]):
+    print(f"{name:<28} median {statistics.median(timings) * 1000:8.1f} ms   "
+          f"min {min(timings) * 1000:8.1f} ms   max {max(timings) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    lectures = {
+        "small (10 sections)": make_lecture_html(10),
+        "large (300 sections)": make_lecture_html(300),
+    }
+
+    init_time = time_call(lambda: PdfRenderer(warm_up=True))
+    print(f"Engine startup (fonts + stylesheet + warm-up): {init_time * 1000:.1f} ms")
+    renderer = PdfRenderer(warm_up=True)
+
+    for name, html_str in lectures.items():
+        print(f"\n{name}, {len(html_str)} bytes of HTML")
+        report("fresh HTML().write_pdf", bench_naive(html_str))
+        report("warm PdfRenderer", bench_engine(renderer, html_str))
@@ -0,0 +1,237 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+STATUS_DONE = "Успешно завершено"
+STATUS_ERROR = "Ошибка"
+
+# Сроки хранения по умолчанию, дни. pdf/ — результат для пользователя,
+# llm-cache/ вытесняет сам summary, поэтому их GC не трогает. transcript/
+# нужен для переиндексации поиска и хранится дольше.
+DEFAULT_RETENTION_DAYS = {
+    "video/": 1,
+    "audio/": 1,
+    "speech-tasks/": 1,
+    "speech/": 7,
+    "transcript/": 30,
+}
+
+# Ключи артефактов — <prefix><task_id>, task_id — UUID в нижнем регистре,
+# поэтому префикс делится на 16 непересекающихся диапазонов по первой цифре
+SHARD_CHARS = "0123456789abcdef"
+DELETE_BATCH_SIZE = 1000
+YDB_LOOKUP_BATCH_SIZE = 500
+
+
+def get_task_id(key: str, prefix: str) -> str | None:
+    try:
+        return str(uuid.UUID(key[len(prefix):].split("/", 1)[0]))
+    except ValueError:
+        return None
+
+
+class PrefixStats:
+    def __init__(self, prefix: str, retention: timedelta):
+        self.prefix = prefix
+        self.retention = retention
+        self.listed = 0
+        self.listed_bytes = 0
+        self.too_young = 0
+        self.unfinished = 0
+        self.unknown = 0
+        self.deleted = 0
+        self.deleted_bytes = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+
+# Статусы задач из YDB. Один task_id встречается в нескольких префиксах,
+# поэтому ответ кэшируется на весь прогон.
+class TaskStatuses:
+    def __init__(self, pool, table_name: str, finished_statuses: tuple[str, ...]):
+        self.pool = pool
+        self.table_name = table_name
+        self.finished_statuses = finished_statuses
+        self.queries = 0
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def _query(self, task_ids: list[str]) -> dict[str, str]:
+        import ydb
+
+        result_sets = self.pool.execute_with_retries(
+            f"""
+            DECLARE $taskIds AS List<Uuid>;
+
+            SELECT task_id, status
+            FROM `{self.table_name}`
+            WHERE task_id IN $taskIds
+            """,
+            {"$taskIds": ([uuid.UUID(t) for t in task_ids], ydb.ListType(ydb.PrimitiveType.UUID))},
+        )
+        return {str(row.task_id): row.status for result_set in result_sets for row in result_set.rows}
+
+    # None — задачи нет в таблице
+    def get(self, task_ids: set[str]) -> dict[str, str | None]:
+        with self._lock:
+            missing = [t for t in task_ids if t not in self._statuses]
+        for i in range(0, len(missing), YDB_LOOKUP_BATCH_SIZE):
+            batch = missing[i:i + YDB_LOOKUP_BATCH_SIZE]
+            found = self._query(batch)
+            with self._lock:
+                self.queries += 1
+                for task_id in batch:
+                    self._statuses[task_id] = found.get(task_id)
+        with self._lock:
+            return {t: self._statuses[t] for t in task_ids}
+
+
+class ArtifactCollector:
+    def __init__(self, s3, bucket: str, statuses: TaskStatuses, retention_days: dict[str, float],
+                 dry_run: bool, list_workers: int, delete_workers: int):
+        self.s3 = s3
+        self.bucket = bucket
+        self.statuses = statuses
+        self.dry_run = dry_run
+        self.list_workers = list_workers
+        self.delete_workers = delete_workers
+        self.stats = {prefix: PrefixStats(prefix, timedelta(days=days)) for prefix, days in retention_days.items()}
+        self.started_at = datetime.now(timezone.utc)
+        self.delete_requests = 0
+        self._delete_executor = None
+        self._delete_futures = []
+        self._futures_lock = threading.Lock()
+
+    def _submit_delete(self, stats: PrefixStats, batch: list[dict]):
+        with self._futures_lock:
+            self.delete_requests += 1
+        if self.dry_run:
+            with stats.lock:
+                stats.deleted += len(batch)
+                stats.deleted_bytes += sum(obj["Size"] for obj in batch)
+            return
+        future = self._delete_executor.submit(self._delete_batch, stats, batch)
+        with self._futures_lock:
+            self._delete_futures.append(future)
+
+    def _delete_batch(self, stats: PrefixStats, batch: list[dict]):
+        sizes = {obj["Key"]: obj["Size"] for obj in batch}
+        try:
+            resp = self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": obj["Key"]} for obj in batch], "Quiet": True},
+            )
+            errors = resp.get("Errors", [])
+        except Exception as e:
+            print(f"Failed to delete {len(batch)} objects under {stats.prefix}: {e}")
+            errors = batch
+        failed = {err["Key"] for err in errors}
+        with stats.lock:
+            stats.errors += len(failed)
+            stats.deleted += len(batch) - len(failed)
+            stats.deleted_bytes += sum(size for key, size in sizes.items() if key not in failed)
+
+    def _collect_page(self, stats: PrefixStats, contents: list[dict]) -> list[dict]:
+        cutoff = self.started_at - stats.retention
+        old = []
+        too_young = 0
+        for obj in contents:
+            if obj["LastModified"] > cutoff:
+                too_young += 1
+            else:
+                old.append((obj, get_task_id(obj["Key"], stats.prefix)))
+
+        statuses = self.statuses.get({task_id for _, task_id in old if task_id is not None})
+        candidates = []
+        unfinished = unknown = 0
+        for obj, task_id in old:
+            status = statuses.get(task_id) if task_id is not None else None
+            if status is None:
+                # Задачи нет в YDB или ключ не по схеме — не наш артефакт, не трогаем
+                unknown += 1
+            elif status not in self.statuses.finished_statuses:
+                unfinished += 1
+            else:
+                candidates.append({"Key": obj["Key"], "Size": obj["Size"]})
+
+        with stats.lock:
+            stats.listed += len(contents)
+            stats.listed_bytes += sum(obj["Size"] for obj in contents)
+            stats.too_young += too_young
+            stats.unfinished += unfinished
+            stats.unknown += unknown
+        return candidates
+
+    def _collect_shard(self, stats: PrefixStats, shard_prefix: str):
+        pending = []
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=shard_prefix, PaginationConfig={"PageSize": 1000}):
+            pending.extend(self._collect_page(stats, page.get("Contents", [])))
+            while len(pending) >= DELETE_BATCH_SIZE:
+                self._submit_delete(stats, pending[:DELETE_BATCH_SIZE])
+                pending = pending[DELETE_BATCH_SIZE:]
+        if pending:
+            self._submit_delete(stats, pending)
+
+    def run(self) -> float:
+        started = time.perf_counter()
+        shards = [(stats, stats.prefix + c) for stats in self.stats.values() for c in SHARD_CHARS]
+        with ThreadPoolExecutor(max_workers=self.delete_workers, thread_name_prefix="delete") as delete_executor:
+            self._delete_executor = delete_executor
+            with ThreadPoolExecutor(max_workers=self.list_workers, thread_name_prefix="list") as list_executor:
+                for future in [list_executor.submit(self._collect_shard, stats, shard) for stats, shard in shards]:
+                    future.result()
+            for future in self._delete_futures:
+                future.result()
+        return time.perf_counter() - started
+
+
+def format_bytes(count: int) -> str:
+    value = float(count)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if value < 1024 or unit == "TB":
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+
+def print_report(collector: ArtifactCollector, elapsed: float):
+    action = "Would delete" if collector.dry_run else "Deleted"
+    print(f"\n{'prefix':<15}{'retention':>10}{'listed':>10}{'too young':>11}{'unfinished':>12}"
+          f"{'unknown':>9}{action.lower():>14}{'size':>12}{'errors':>8}")
+    totals = PrefixStats("total", timedelta())
+    for stats in collector.stats.values():
+        print(f"{stats.prefix:<15}{stats.retention.total_seconds() / 86400:>9g}d{stats.listed:>10}"
+              f"{stats.too_young:>11}{stats.unfinished:>12}{stats.unknown:>9}{stats.deleted:>14}"
+              f"{format_bytes(stats.deleted_bytes):>12}{stats.errors:>8}")
+        for name in ("listed", "listed_bytes", "too_young", "unfinished", "unknown", "deleted", "deleted_bytes", "errors"):
+            setattr(totals, name, getattr(totals, name) + getattr(stats, name))
+
+    print(f"\nListed {totals.listed} objects ({format_bytes(totals.listed_bytes)}) in {elapsed:.1f}s: "
+          f"{totals.listed / elapsed if elapsed else 0:.0f} objects/s")
+    print(f"{action} {totals.deleted} objects ({format_bytes(totals.deleted_bytes)}): "
+          f"{totals.deleted / elapsed if elapsed else 0:.0f} objects/s, "
+          f"{collector.delete_requests} delete_objects requests, {collector.statuses.queries} YDB lookups")
+    if totals.errors:
+        print(f"Failed to delete {totals.errors} objects, they will be retried on the next run")
+
+
+def create_ydb_pool():
+    import ydb
+
+    driver_config = ydb.DriverConfig(
+        os.environ["YDB_ENDPOINT"],
+        os.environ["YDB_DATABASE"],
+        credentials=ydb.credentials_from_env_variables(),
+        root_certificates=ydb.load_ydb_root_certificate(),
+    )
+    driver = ydb.Driver(driver_config)
+    try:
+        driver.wait(timeout=5, fail_fast=True)
+    except TimeoutError:
+        print(f"Connect failed to YDB. Last reported errors by discovery: {driver.discovery_debug_details()}")
+        driver.stop()
+        raise
+    return driver, ydb.QuerySessionPool(driver)
@@ -1,8 +1,12 @@
+import argparse
 import os
 import boto3
 import boto3.session
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
+from artifact_gc import DEFAULT_RETENTION_DAYS, STATUS_DONE, STATUS_ERROR, ArtifactCollector, TaskStatuses, \
+    create_ydb_pool, print_report
 
 class Config:
     def __init__(self):
@@ -10,16 +14,19 @@ class Config:
         self.aws_access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
         self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
 
-def delete_all_objects_in_bucket():
-    config = Config()
-    
+def get_s3_client(config: Config, max_connections: int = 10):
     session = boto3.session.Session()
-    s3 = session.client(
+    return session.client(
         service_name='s3',
         endpoint_url="https://storage.yandexcloud.net",
         aws_access_key_id=config.aws_access_key_id,
         aws_secret_access_key=config.aws_secret_access_key,
+        config=BotoConfig(max_pool_connections=max_connections),
     )
+
+def delete_all_objects_in_bucket():
+    config = Config()
+    s3 = get_s3_client(config)
     
     bucket_name = config.s3_bucket_name
     print(f"Starting deletion of all objects in bucket: {bucket_name}")
@@ -70,12 +77,75 @@ def delete_all_objects_in_bucket():
             print(f"An error occurred: {e}")
         return 0
 
+def parse_retention(values: list[str]) -> dict[str, float]:
+    retention = dict(DEFAULT_RETENTION_DAYS)
+    for value in values:
+        prefix, _, days = value.partition("=")
+        prefix = prefix.rstrip("/") + "/"
+        if prefix not in DEFAULT_RETENTION_DAYS:
+            raise ValueError(f"Unknown prefix {prefix}, expected one of {', '.join(DEFAULT_RETENTION_DAYS)}")
+        if days == "off":
+            retention.pop(prefix, None)
+        else:
+            retention[prefix] = float(days)
+    return retention
+
+def collect_artifacts(args):
+    config = Config()
+    try:
+        retention = parse_retention(args.retention)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    finished_statuses = (STATUS_DONE, STATUS_ERROR) if args.include_failed else (STATUS_DONE,)
+    print(f"{'Dry run' if args.dry_run else 'Collecting'} artifacts of finished tasks in bucket {config.s3_bucket_name}: "
+          + ", ".join(f"{prefix} older than {days:g}d" for prefix, days in retention.items()))
+
+    driver, pool = create_ydb_pool()
+    try:
+        collector = ArtifactCollector(
+            get_s3_client(config, args.list_workers + args.delete_workers),
+            config.s3_bucket_name,
+            TaskStatuses(pool, os.environ["YDB_TASKS_TABLE_NAME"], finished_statuses),
+            retention,
+            args.dry_run,
+            args.list_workers,
+            args.delete_workers,
+        )
+        elapsed = collector.run()
+        print_report(collector, elapsed)
+    except ClientError as e:
+        print(f"An error occurred: {e}")
+    finally:
+        pool.stop()
+        driver.stop()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bucket maintenance")
+    parser.set_defaults(command="wipe")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("wipe", help="delete every object in the bucket (default)")
+    gc_parser = subparsers.add_parser("gc", help="delete intermediate artifacts of finished tasks")
+    gc_parser.add_argument("--retention", action="append", default=[], metavar="PREFIX=DAYS",
+                           help="retention of a prefix in days or 'off', can be repeated (default: "
+                                + ", ".join(f"{p.rstrip('/')}={d}" for p, d in DEFAULT_RETENTION_DAYS.items()) + ")")
+    gc_parser.add_argument("--include-failed", action="store_true",
+                           help=f"also collect tasks with status '{STATUS_ERROR}', they can no longer be redriven")
+    gc_parser.add_argument("--dry-run", action="store_true", help="only list and report what would be deleted")
+    gc_parser.add_argument("--list-workers", type=int, default=16, help="concurrent listings of prefix shards")
+    gc_parser.add_argument("--delete-workers", type=int, default=8, help="concurrent delete_objects requests")
+    args = parser.parse_args()
+
     load_dotenv('.env')
     required_env_vars = ["S3_BUCKET_NAME", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"]
+    if args.command == "gc":
+        required_env_vars += ["YDB_ENDPOINT", "YDB_DATABASE", "YDB_TASKS_TABLE_NAME"]
     for var in required_env_vars:
         if var not in os.environ:
             print(f"Error: Environment variable {var} is not set")
             exit(1)
     
-    delete_all_objects_in_bucket()
\ No newline at end of file
+    if args.command == "gc":
+        collect_artifacts(args)
+    else:
+        delete_all_objects_in_bucket()
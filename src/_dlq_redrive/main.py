@@ -0,0 +1,84 @@
+import argparse
+import os
+import boto3
+import boto3.session
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+from redrive import LANES, PIPELINE, DeadLetterRedriver, create_ydb_pool, print_report
+
+class Config:
+    def __init__(self):
+        self.s3_bucket_name = os.environ["S3_BUCKET_NAME"]
+        self.aws_access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
+        self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
+        self.dead_letter_queue_url = os.environ["DEAD_LETTER_QUEUE_URL"]
+
+def get_client(config: Config, service_name: str, endpoint_url: str, max_connections: int):
+    session = boto3.session.Session()
+    return session.client(
+        service_name=service_name,
+        endpoint_url=endpoint_url,
+        region_name='ru-central1',
+        aws_access_key_id=config.aws_access_key_id,
+        aws_secret_access_key=config.aws_secret_access_key,
+        config=BotoConfig(max_pool_connections=max_connections),
+    )
+
+def redrive(args):
+    config = Config()
+    print(f"{'Dry run of redrive' if args.dry_run else 'Redriving'} {config.dead_letter_queue_url}")
+
+    driver, pool = create_ydb_pool()
+    try:
+        redriver = DeadLetterRedriver(
+            get_client(config, 's3', "https://storage.yandexcloud.net", args.check_workers),
+            get_client(config, 'sqs', "https://message-queue.api.cloud.yandex.net",
+                       args.receive_workers + args.send_workers),
+            pool,
+            config.s3_bucket_name,
+            config.dead_letter_queue_url,
+            {
+                'tasks': os.environ["YDB_TASKS_TABLE_NAME"],
+                'ledger': os.environ["YDB_LEDGER_TABLE_NAME"],
+                'stage_events': os.environ["YDB_STAGE_EVENTS_TABLE_NAME"],
+            },
+            args.dry_run,
+            args.receive_workers,
+            args.check_workers,
+            args.send_workers,
+            args.visibility_timeout,
+            args.max_messages,
+        )
+        elapsed = redriver.run()
+        print_report(redriver, redriver.get_stage_latency_ms(), elapsed)
+    except ClientError as e:
+        print(f"An error occurred: {e}")
+    finally:
+        pool.stop()
+        driver.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Return dead-lettered tasks to the earliest pipeline stage whose input is missing")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only report where each task would resume, messages stay in the DLQ")
+    parser.add_argument("--max-messages", type=int, default=None, help="stop after receiving this many messages")
+    parser.add_argument("--receive-workers", type=int, default=8, help="concurrent receive_message loops")
+    parser.add_argument("--check-workers", type=int, default=32, help="concurrent artifact checks in S3")
+    parser.add_argument("--send-workers", type=int, default=8, help="concurrent send_message_batch requests")
+    parser.add_argument("--visibility-timeout", type=int, default=600,
+                        help="seconds received messages stay hidden in the DLQ while the redrive runs")
+    args = parser.parse_args()
+
+    load_dotenv('.env')
+    required_env_vars = ["S3_BUCKET_NAME", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "DEAD_LETTER_QUEUE_URL",
+                         "YDB_ENDPOINT", "YDB_DATABASE", "YDB_TASKS_TABLE_NAME", "YDB_LEDGER_TABLE_NAME",
+                         "YDB_STAGE_EVENTS_TABLE_NAME"]
+    required_env_vars += [f"{stage.queue_env_prefix}_{lane.upper()}" for stage in PIPELINE for lane in LANES]
+    for var in required_env_vars:
+        if var not in os.environ:
+            print(f"Error: Environment variable {var} is not set")
+            exit(1)
+
+    redrive(args)
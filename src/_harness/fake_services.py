@@ -0,0 +1,269 @@
+import io
+import json
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, unquote, urlparse
+from stand_ins import Clock, FakeS3
+
+# Средний битрейт записи лекции и MP3 после extract-audio, байт в секунду
+VIDEO_BYTES_PER_SECOND = 250_000
+AUDIO_BYTES_PER_SECOND = 16_000
+
+
+# Задержки внешних сервисов в секундах симуляции, меняются через --latency KEY=VALUE
+class LatencyProfile:
+    def __init__(self):
+        self.disk_api_ms = 150.0
+        self.disk_mb_per_second = 40.0
+        self.storage_ms = 0.0
+        self.queue_ms = 0.0
+        self.ffmpeg_speed = 40.0
+        self.speechkit_api_ms = 200.0
+        self.speechkit_base_seconds = 20.0
+        self.speechkit_realtime_factor = 0.1
+        self.llm_base_ms = 1500.0
+        self.llm_chars_per_second = 400.0
+        self.pdf_base_ms = 300.0
+        self.pdf_ms_per_kb = 15.0
+
+    def update(self, key: str, value: str):
+        if not hasattr(self, key):
+            raise ValueError(f"Unknown latency parameter {key}, known: {', '.join(vars(self))}")
+        setattr(self, key, float(value))
+
+
+def json_response(status: int, obj) -> tuple[int, dict, bytes]:
+    return status, {"Content-Type": "application/json"}, json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+# Публичные ссылки Яндекс.Диска: метаданные, ссылка на скачивание и само видео.
+# Размер видео в метаданных настоящий, а отдаётся в byte_scale раз меньше байтов.
+class FakeDisk:
+    API_HOST = "cloud-api.yandex.net"
+    DOWNLOAD_HOST = "downloader.disk.yandex.ru"
+
+    def __init__(self, clock: Clock, profile: LatencyProfile, byte_scale: int):
+        self.clock = clock
+        self.profile = profile
+        self.byte_scale = byte_scale
+        self._videos = {}
+        self._links = {}
+        self._lock = threading.Lock()
+
+    def add_video(self, link: str, name: str, size: int):
+        video_id = uuid.uuid4().hex
+        with self._lock:
+            self._videos[video_id] = {"name": name, "size": size}
+            self._links[link] = video_id
+
+    def _find(self, query: dict) -> tuple[str | None, dict | None]:
+        # Функции сами кодируют public_key через quote, и requests кодирует его ещё раз
+        link = unquote(query.get("public_key", [""])[0])
+        with self._lock:
+            video_id = self._links.get(link)
+            return video_id, self._videos.get(video_id)
+
+    def handle(self, method: str, host: str, path: str, query: dict, body: bytes) -> tuple[int, dict, bytes]:
+        if host == self.DOWNLOAD_HOST:
+            video = self._videos.get(path.rsplit("/", 1)[-1])
+            if video is None:
+                return json_response(404, {"error": "DiskNotFoundError"})
+            self.clock.sleep(self.profile.disk_api_ms / 1000 + video["size"] / (self.profile.disk_mb_per_second * 1e6))
+            return 200, {"Content-Type": "video/mp4"}, bytes(video["size"] // self.byte_scale)
+
+        self.clock.sleep(self.profile.disk_api_ms / 1000)
+        video_id, video = self._find(query)
+        if video is None:
+            return json_response(404, {"error": "DiskNotFoundError", "description": "Resource not found."})
+        if path == "/v1/disk/public/resources":
+            return json_response(200, {
+                "type": "file",
+                "name": video["name"],
+                "path": "/",
+                "mime_type": "video/mp4",
+                "size": video["size"],
+            })
+        if path == "/v1/disk/public/resources/download":
+            return json_response(200, {
+                "href": f"https://{self.DOWNLOAD_HOST}/disk/{video_id}",
+                "method": "GET",
+                "templated": False,
+            })
+        return json_response(404, {"error": "NotFound"})
+
+
+# Асинхронное распознавание: операция готова через base + длительность аудио * realtime_factor.
+# Ответ getRecognition — NDJSON, резюме в последней строке, как у настоящего API.
+class FakeSpeechKit:
+    HOST = "stt.api.cloud.yandex.net"
+
+    def __init__(self, clock: Clock, profile: LatencyProfile, s3: FakeS3, byte_scale: int):
+        self.clock = clock
+        self.profile = profile
+        self.s3 = s3
+        self.byte_scale = byte_scale
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def _audio_seconds(self, uri: str) -> float:
+        bucket, key = unquote(urlparse(uri).path).lstrip("/").split("/", 1)
+        obj = self.s3.get(bucket, key)
+        if obj is None:
+            return 0.0
+        return len(obj.body) * self.byte_scale / AUDIO_BYTES_PER_SECOND
+
+    def handle(self, method: str, host: str, path: str, query: dict, body: bytes) -> tuple[int, dict, bytes]:
+        self.clock.sleep(self.profile.speechkit_api_ms / 1000)
+
+        if method == "POST" and path == "/stt/v3/recognizeFileAsync":
+            uri = json.loads(body)["uri"]
+            seconds = self._audio_seconds(uri)
+            processing = self.profile.speechkit_base_seconds + seconds * self.profile.speechkit_realtime_factor
+            operation_id = uuid.uuid4().hex
+            with self._lock:
+                self._operations[operation_id] = {
+                    "ready_at": time.monotonic() + self.clock.to_real(processing),
+                    "seconds": seconds,
+                }
+            return json_response(200, {"id": operation_id, "done": False})
+
+        if method == "GET" and path == "/stt/v3/getRecognition":
+            with self._lock:
+                operation = self._operations.get(query.get("operationId", [""])[0])
+            if operation is None or operation["ready_at"] > time.monotonic():
+                return json_response(404, {"error": {"grpcCode": 5, "message": "Operation is not ready yet"}})
+            return 200, {"Content-Type": "application/json"}, make_recognition_ndjson(operation["seconds"])
+
+        return json_response(404, {"error": {"message": "Not found"}})
+
+
+def make_lecture_summary(seconds: float) -> dict:
+    sections = max(1, int(seconds // 300))
+    return {
+        "title": "Конспект лекции",
+        "sections": [
+            {
+                "heading": f"Раздел {i + 1}",
+                "points": [f"Тезис {j + 1} раздела {i + 1}: определение, пример и вывод." for j in range(4)],
+                "examples": [f"Пример {i + 1}.{j + 1}" for j in range(2)],
+            }
+            for i in range(sections)
+        ],
+        "conclusion": "Итоги лекции.",
+    }
+
+
+def make_recognition_ndjson(seconds: float) -> bytes:
+    lines = []
+    # Промежуточные результаты: по строке на каждые 30 секунд аудио
+    for i in range(max(1, int(seconds // 30))):
+        lines.append({"result": {
+            "channelTag": "0",
+            "final": {"alternatives": [{"text": f"фрагмент речи номер {i + 1}", "startTimeMs": str(i * 30000),
+                                        "endTimeMs": str((i + 1) * 30000)}]},
+        }})
+    lines.append({"result": {
+        "channelTag": "0",
+        "summarization": {"results": [{"response": json.dumps(make_lecture_summary(seconds), ensure_ascii=False)}]},
+    }})
+    return "\n".join(json.dumps(line, ensure_ascii=False) for line in lines).encode("utf-8")
+
+
+def render_summary_html(title: str, value) -> str:
+    if isinstance(value, dict):
+        return "".join(f"<h2>{key}</h2>{render_summary_html(title, item)}" for key, item in value.items())
+    if isinstance(value, list):
+        return "<ul>" + "".join(f"<li>{render_summary_html(title, item)}</li>" for item in value) + "</ul>"
+    return f"<p>{value}</p>"
+
+
+# Completion API YandexGPT: время ответа растёт с длиной сгенерированного HTML
+class FakeYandexGpt:
+    HOST = "llm.api.cloud.yandex.net"
+
+    def __init__(self, clock: Clock, profile: LatencyProfile):
+        self.clock = clock
+        self.profile = profile
+
+    def handle(self, method: str, host: str, path: str, query: dict, body: bytes) -> tuple[int, dict, bytes]:
+        if method != "POST" or path != "/foundationModels/v1/completion":
+            return json_response(404, {"error": {"message": "Not found"}})
+
+        request = json.loads(body)
+        instruction = request["messages"][0]["text"]
+        text = request["messages"][-1]["text"]
+        title = instruction.split("<h1>", 1)[-1].split("</h1>", 1)[0] if "<h1>" in instruction else ""
+        try:
+            content = render_summary_html(title, json.loads(text))
+        except ValueError:
+            content = f"<p>{text}</p>"
+        html = f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"></head><body><h1>{title}</h1>{content}</body></html>"
+
+        self.clock.sleep(self.profile.llm_base_ms / 1000 + len(html) / self.profile.llm_chars_per_second)
+        return json_response(200, {"result": {
+            "alternatives": [{"message": {"role": "assistant", "text": html}, "status": "ALTERNATIVE_STATUS_FINAL"}],
+            "usage": {
+                "inputTextTokens": str((len(instruction) + len(text)) // 4),
+                "completionTokens": str(len(html) // 4),
+                "totalTokens": str((len(instruction) + len(text) + len(html)) // 4),
+            },
+            "modelVersion": "harness",
+        }})
+
+
+# Рендер PDF без weasyprint: задержка и размер растут с размером HTML
+class FakePdfRenderer:
+    def __init__(self, clock: Clock, profile: LatencyProfile):
+        self.clock = clock
+        self.profile = profile
+
+    def render(self, html_str: str, target):
+        size = len(html_str.encode("utf-8"))
+        self.clock.sleep((self.profile.pdf_base_ms + size / 1024 * self.profile.pdf_ms_per_kb) / 1000)
+        target.write(b"%PDF-1.7\n" + bytes(max(1024, size * 3)) + b"\n%%EOF\n")
+
+
+# Маршрутизация HTTP-запросов requests по хосту к подставным сервисам.
+# Запрос к любому другому хосту — ошибка соединения: сети у стенда нет.
+class FakeInternet:
+    def __init__(self):
+        self._services = {}
+
+    def register(self, host: str, service):
+        self._services[host] = service
+
+    def send(self, request):
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        url = urlparse(request.url)
+        service = self._services.get(url.hostname)
+        if service is None:
+            raise requests.exceptions.ConnectionError(f"No network in harness: {url.hostname}", request=request)
+
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        status, headers, content = service.handle(request.method, url.hostname, url.path, parse_qs(url.query), body)
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.raw = io.BytesIO(content)
+        response._content = content
+        response._content_consumed = True
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.reason = "OK" if status < 400 else "Error"
+        return response
+
+
+def install_requests(internet: FakeInternet):
+    import requests.adapters
+
+    def send(adapter, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        return internet.send(request)
+
+    requests.adapters.HTTPAdapter.send = send
@@ -0,0 +1,487 @@
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from fake_services import (FakeDisk, FakeInternet, FakePdfRenderer, FakeSpeechKit, FakeYandexGpt,
+                           LatencyProfile, install_requests)
+from stages import Container, CronTrigger, ExtractAudioEmulator, QueueTrigger, create_container
+from stand_ins import (DEAD_LETTER_QUEUE_URL, STATUS_DONE, STATUS_ERROR, TERMINAL_STATUSES, Clock,
+                       FakeS3, FakeSqs, FakeYdb, install_boto)
+
+logger = logging.getLogger()
+
+LANES = ["short", "medium", "long"]
+MB = 1024 * 1024
+
+QUEUE_ENV_PREFIXES = {
+    "download": "DOWNLOAD_QUEUE_URL",
+    "extract-audio": "EXTRACT_AUDIO_QUEUE_URL",
+    "recognize-speech": "RECOGNIZE_SPEECH_QUEUE_URL",
+    "summary": "SUMMARY_QUEUE_URL",
+}
+STAGE_EVENT_NAMES = ["download", "extract-audio", "recognize-speech", "speechkit", "llm", "pdf"]
+
+# Память функций из terraform, попадает в context.memory_limit_in_mb
+MEMORY_LIMIT_MB = {
+    "form-receiver": 128,
+    "download": 1024,
+    "extract-audio": 128,
+    "recognize-speech": 1024,
+    "recognize-speech-cron": 256,
+    "summary": 1024,
+}
+
+# Размеры видео по полосам при пороге 200 МБ / 1 ГБ, как в terraform
+LANE_VIDEO_SIZES = {
+    "short": (20 * MB, 200 * MB),
+    "medium": (200 * MB + 1, 1024 * MB),
+    "long": (1024 * MB + 1, 3 * 1024 * MB),
+}
+
+# Таймаут видимости и maxReceiveCount очередей из terraform, секунды симуляции
+VISIBILITY_TIMEOUT_SECONDS = 600
+MAX_RECEIVE_COUNT = 3
+CRON_INTERVAL_SECONDS = 60
+
+HARNESS_ENV = {
+    "YDB_ENDPOINT": "grpcs://harness:2135",
+    "YDB_DATABASE": "/harness",
+    "YDB_TASKS_TABLE_NAME": "tasks_table",
+    "YDB_LEDGER_TABLE_NAME": "stage_ledger",
+    "YDB_STAGE_EVENTS_TABLE_NAME": "stage_events",
+    "YDB_RATE_LIMITS_TABLE_NAME": "rate_limits",
+    "S3_BUCKET_NAME": "harness-bucket",
+    "AWS_ACCESS_KEY_ID": "harness",
+    "AWS_SECRET_ACCESS_KEY": "harness",
+    "FOLDER_ID": "harness-folder",
+    "YA_API_KEY": "harness-api-key",
+    "ARTIFACT_ENCODING": "zstd",
+    **{f"{prefix}_{lane.upper()}": f"harness://{stage}-{lane}"
+       for stage, prefix in QUEUE_ENV_PREFIXES.items() for lane in LANES},
+    # search-index на стенде не запускается: поисковых таблиц в FakeYdb нет,
+    # сообщения summary остаются в этих очередях
+    **{f"SEARCH_INDEX_QUEUE_URL_{lane.upper()}": f"harness://search-index-{lane}" for lane in LANES},
+}
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+# Квоты и аренды заданы в секундах, стенд переводит их в масштаб времени,
+# иначе лимитер SpeechKit в 1 запрос/с оказался бы в 1/scale раз строже
+def build_env(clock: Clock, overrides: dict) -> dict:
+    env = dict(HARNESS_ENV)
+    env["SPEECHKIT_RATE_PER_SECOND"] = str(1 / clock.scale)
+    env["LLM_RATE_PER_SECOND"] = str(1 / clock.scale)
+    env["RATE_LIMIT_WAIT_SECONDS"] = str(10 * clock.scale)
+    env["STAGE_LEASE_SECONDS"] = str(max(1, math.ceil(900 * clock.scale)))
+    env.update(overrides)
+    return env
+
+
+class Lecture:
+    def __init__(self, index: int, lane: str, size: int):
+        self.title = f"Лекция {index + 1}"
+        self.link = f"https://disk.yandex.ru/i/harness-{index + 1:05d}"
+        self.lane = lane
+        self.size = size
+        self.submitted_at = None
+        self.response = None
+
+
+def parse_pairs(value: str) -> dict[str, str]:
+    pairs = {}
+    for item in filter(None, value.split(",")):
+        key, _, val = item.partition("=")
+        pairs[key.strip()] = val.strip()
+    return pairs
+
+
+def generate_lectures(count: int, mix: dict[str, float], rng: random.Random) -> list[Lecture]:
+    lanes = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [Lecture(i, lane, rng.randint(*LANE_VIDEO_SIZES[lane])) for i, lane in enumerate(lanes)]
+
+
+def make_form_event(lecture: Lecture) -> dict:
+    return {
+        "httpMethod": "POST",
+        "headers": {"Content-Type": "application/x-www-form-urlencoded"},
+        "body": urlencode({"lecture-title": lecture.title, "yandex-link": lecture.link}),
+        "isBase64Encoded": False,
+    }
+
+
+# Генератор нагрузки: лекции уходят через handler form-receiver с пуассоновскими
+# интервалами rate_per_minute (0 — все сразу), как если бы их отправляли из формы
+class LoadGenerator(threading.Thread):
+    def __init__(self, clock: Clock, lectures: list[Lecture], containers: list[Container],
+                 rate_per_minute: float, rng: random.Random):
+        super().__init__(name="load-generator", daemon=True)
+        self.clock = clock
+        self.lectures = lectures
+        self.containers = containers
+        self.rate_per_minute = rate_per_minute
+        self.rng = rng
+
+    def _submit(self, free: queue.Queue, lecture: Lecture):
+        container = free.get()
+        try:
+            lecture.submitted_at = time.time()
+            lecture.response = container.invoke(make_form_event(lecture))
+        finally:
+            free.put(container)
+
+    def run(self):
+        free = queue.Queue()
+        for container in self.containers:
+            free.put(container)
+
+        next_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(self.containers)) as executor:
+            for lecture in self.lectures:
+                if self.rate_per_minute > 0:
+                    next_at += self.clock.to_real(self.rng.expovariate(self.rate_per_minute / 60))
+                    time.sleep(max(0.0, next_at - time.monotonic()))
+                executor.submit(self._submit, free, lecture)
+
+
+# Глубина очередей по этапам: ждут (видимые и отложенные) и в обработке,
+# для SpeechKit — незавершённые задачи в speech-tasks/
+class DepthSampler(threading.Thread):
+    def __init__(self, clock: Clock, sqs: FakeSqs, s3: FakeS3, bucket: str, interval_seconds: float,
+                 stop_event: threading.Event):
+        super().__init__(name="depth-sampler", daemon=True)
+        self.clock = clock
+        self.sqs = sqs
+        self.s3 = s3
+        self.bucket = bucket
+        self.interval_seconds = interval_seconds
+        self.stop_event = stop_event
+        self.started = time.monotonic()
+        self.samples = []
+
+    def sample(self):
+        row = {"t": round(self.clock.to_simulated(time.monotonic() - self.started), 3)}
+        for stage in QUEUE_ENV_PREFIXES:
+            waiting = in_flight = 0
+            for lane in LANES:
+                depth = self.sqs.depth(HARNESS_ENV[f"{QUEUE_ENV_PREFIXES[stage]}_{lane.upper()}"])
+                waiting += depth["visible"] + depth["delayed"]
+                in_flight += depth["in_flight"]
+            row[stage] = {"waiting": waiting, "in_flight": in_flight}
+        row["speechkit"] = {"waiting": self.s3.count(self.bucket, "speech-tasks/"), "in_flight": 0}
+        dead_letter = self.sqs.depth(DEAD_LETTER_QUEUE_URL)
+        row["dead-letter"] = {"waiting": sum(dead_letter.values()), "in_flight": 0}
+        self.samples.append(row)
+
+    def run(self):
+        self.sample()
+        while not self.stop_event.wait(self.clock.to_real(self.interval_seconds)):
+            self.sample()
+        self.sample()
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def distribution(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values, default=0.0), 3),
+    }
+
+
+def sparkline(values: list[int], width: int) -> str:
+    if not values:
+        return ""
+    step = max(1.0, len(values) / width)
+    buckets = []
+    i = 0.0
+    while int(i) < len(values):
+        buckets.append(max(values[int(i):max(int(i + step), int(i) + 1)]))
+        i += step
+    top = max(buckets) or 1
+    return "".join(" " if v == 0 else SPARK_CHARS[min(len(SPARK_CHARS) - 1, int(v / top * len(SPARK_CHARS)))]
+                   for v in buckets)
+
+
+def dead_lettered_task_ids(sqs: FakeSqs) -> set[str]:
+    task_ids = set()
+    for message in sqs.peek(DEAD_LETTER_QUEUE_URL):
+        try:
+            task_ids.add(json.loads(message.body)["task_id"])
+        except (ValueError, KeyError):
+            continue
+    return task_ids
+
+
+def wait_for_completion(ydb: FakeYdb, sqs: FakeSqs, generator: LoadGenerator, timeout_seconds: float) -> bool:
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        if not generator.is_alive():
+            submitted = sum(1 for lecture in generator.lectures if lecture.response is not None)
+            tasks = ydb.task_snapshot()
+            dead = dead_lettered_task_ids(sqs)
+            finished = sum(1 for task in tasks if task["status"] in TERMINAL_STATUSES or task["task_id"] in dead)
+            if submitted == len(generator.lectures) and finished == len(tasks):
+                return True
+        time.sleep(0.1)
+    return False
+
+
+def build_report(args, clock: Clock, lectures: list[Lecture], ydb: FakeYdb, sqs: FakeSqs,
+                 sampler: DepthSampler, containers: dict[str, list[Container]], cron: CronTrigger,
+                 elapsed_real: float, completed: bool) -> dict:
+    by_link = {lecture.link: lecture for lecture in lectures}
+    tasks = ydb.task_snapshot()
+    dead = dead_lettered_task_ids(sqs)
+    download_lanes = {e["task_id"]: e["lane"] for e in ydb.stage_events if e["stage"] == "download" and e["lane"]}
+
+    e2e = {"all": []}
+    for task in tasks:
+        if task["status"] != STATUS_DONE:
+            continue
+        seconds = clock.to_simulated((task["finished_at"] - task["created_at"]).total_seconds())
+        lane = download_lanes.get(task["task_id"]) or by_link[task["video_url"]].lane
+        e2e["all"].append(seconds)
+        e2e.setdefault(lane, []).append(seconds)
+
+    done = sum(1 for task in tasks if task["status"] == STATUS_DONE)
+    elapsed_simulated = clock.to_simulated(elapsed_real)
+
+    stages = {}
+    for stage in STAGE_EVENT_NAMES:
+        events = [e for e in ydb.stage_events if e["stage"] == stage]
+        stages[stage] = {
+            **distribution([clock.to_simulated(e["duration_ms"] / 1000) for e in events]),
+            "errors": sum(1 for e in events if e["status"] != "ok"),
+        }
+
+    queue_waits = {}
+    for stage, prefix in QUEUE_ENV_PREFIXES.items():
+        waits = [w for lane in LANES for w in sqs.waits(HARNESS_ENV[f"{prefix}_{lane.upper()}"])]
+        queue_waits[stage] = distribution([clock.to_simulated(w) for w in waits])
+
+    functions = {}
+    for function_name, function_containers in containers.items():
+        busy = sum(c.busy_seconds for c in function_containers)
+        functions[function_name] = {
+            "containers": len(function_containers),
+            "invocations": sum(c.invocations for c in function_containers),
+            "errors": sum(c.errors for c in function_containers),
+            "utilization": round(busy / (elapsed_real * len(function_containers)), 3) if elapsed_real else 0.0,
+        }
+
+    depth_series = {"t": [row["t"] for row in sampler.samples]}
+    for name in list(QUEUE_ENV_PREFIXES) + ["speechkit", "dead-letter"]:
+        depth_series[name] = {
+            "waiting": [row[name]["waiting"] for row in sampler.samples],
+            "in_flight": [row[name]["in_flight"] for row in sampler.samples],
+        }
+
+    return {
+        "settings": {
+            "lectures": args.lectures,
+            "mix": args.mix,
+            "rate_per_minute": args.rate,
+            "time_scale": clock.scale,
+            "byte_scale": args.byte_scale,
+            "concurrency": args.concurrency_by_stage,
+            "latency": vars(args.profile),
+            "seed": args.seed,
+        },
+        "completed": completed,
+        "elapsed_real_seconds": round(elapsed_real, 3),
+        "elapsed_simulated_seconds": round(elapsed_simulated, 3),
+        "tasks": {
+            "submitted": len(tasks),
+            "done": done,
+            "error": sum(1 for task in tasks if task["status"] == STATUS_ERROR),
+            "dead_lettered": len(dead),
+            "unfinished": sum(1 for task in tasks
+                              if task["status"] not in TERMINAL_STATUSES and task["task_id"] not in dead),
+            "rejected_by_form": sum(1 for lecture in lectures
+                                    if lecture.response is None or lecture.response.get("statusCode", 500) >= 500),
+        },
+        "throughput_per_hour": round(done / elapsed_simulated * 3600, 2) if elapsed_simulated else 0.0,
+        "end_to_end_seconds": {lane: distribution(values) for lane, values in e2e.items()},
+        "stage_seconds": stages,
+        "queue_wait_seconds": queue_waits,
+        "functions": functions,
+        "cron_skipped_ticks": cron.skipped_ticks,
+        "queue_depth": depth_series,
+    }
+
+
+def print_report(report: dict, width: int):
+    tasks = report["tasks"]
+    settings = report["settings"]
+    print(f"Lectures: {tasks['submitted']} submitted, {tasks['done']} done, {tasks['error']} failed, "
+          f"{tasks['dead_lettered']} dead-lettered, {tasks['unfinished']} unfinished"
+          + ("" if report["completed"] else " (timeout)"))
+    print(f"Elapsed: {report['elapsed_simulated_seconds']:.0f} s simulated, "
+          f"{report['elapsed_real_seconds']:.1f} s real (time scale {settings['time_scale']})")
+    print(f"Throughput: {report['throughput_per_hour']:.1f} lectures/hour simulated")
+
+    print("\nEnd-to-end latency, simulated seconds")
+    print(f"{'lane':<18}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for lane, d in report["end_to_end_seconds"].items():
+        print(f"{lane:<18}{d['count']:>7}{d['p50']:>10.1f}{d['p95']:>10.1f}{d['p99']:>10.1f}{d['max']:>10.1f}")
+
+    print("\nStage duration, simulated seconds")
+    print(f"{'stage':<18}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'errors':>8}")
+    for stage, d in report["stage_seconds"].items():
+        print(f"{stage:<18}{d['count']:>7}{d['p50']:>10.1f}{d['p95']:>10.1f}{d['p99']:>10.1f}{d['max']:>10.1f}"
+              f"{d['errors']:>8}")
+
+    print("\nQueue wait before first delivery, simulated seconds")
+    print(f"{'queue':<18}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for stage, d in report["queue_wait_seconds"].items():
+        print(f"{stage:<18}{d['count']:>7}{d['p50']:>10.1f}{d['p95']:>10.1f}{d['p99']:>10.1f}{d['max']:>10.1f}")
+
+    print("\nFunctions")
+    print(f"{'function':<24}{'containers':>11}{'calls':>8}{'errors':>8}{'busy':>7}")
+    for name, f in report["functions"].items():
+        print(f"{name:<24}{f['containers']:>11}{f['invocations']:>8}{f['errors']:>8}{f['utilization']:>7.0%}")
+    if report["cron_skipped_ticks"]:
+        print(f"Cron ticks skipped, all containers busy: {report['cron_skipped_ticks']}")
+
+    depth = report["queue_depth"]
+    print(f"\nQueue depth over {depth['t'][-1] if depth['t'] else 0:.0f} simulated seconds (waiting messages)")
+    print(f"{'queue':<18}{'max':>6}{'mean':>8}  timeline")
+    for name, series in depth.items():
+        if name == "t":
+            continue
+        waiting = series["waiting"]
+        mean = sum(waiting) / len(waiting) if waiting else 0.0
+        print(f"{name:<18}{max(waiting, default=0):>6}{mean:>8.1f}  {sparkline(waiting, width)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local end-to-end run of the pipeline against in-process S3/SQS/YDB stand-ins "
+                    "and fake Disk/SpeechKit/YandexGPT, without network")
+    parser.add_argument("--lectures", type=int, default=50, help="number of lectures to submit")
+    parser.add_argument("--mix", default="short=0.5,medium=0.35,long=0.15", help="share of lectures per lane")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="arrival rate, lectures per simulated minute; 0 submits everything at once")
+    parser.add_argument("--time-scale", type=float, default=0.01,
+                        help="real seconds per simulated second for all stand-in latencies")
+    parser.add_argument("--byte-scale", type=int, default=1000,
+                        help="videos and audio are stored this many times smaller than their nominal size")
+    parser.add_argument("--concurrency", default="download=3,extract-audio=3,recognize-speech=3,summary=3",
+                        help="containers per lane trigger for each queue-triggered stage")
+    parser.add_argument("--form-containers", type=int, default=4, help="form-receiver containers")
+    parser.add_argument("--cron-containers", type=int, default=2, help="recognize-speech-cron containers")
+    parser.add_argument("--latency", action="append", default=[], metavar="KEY=VALUE",
+                        help=f"stand-in latency, simulated units: {', '.join(vars(LatencyProfile()))}")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="function environment override, passed as is")
+    parser.add_argument("--real-pdf", action="store_true", help="render PDF with weasyprint instead of a stand-in")
+    parser.add_argument("--sample-interval", type=float, default=5, help="queue depth sampling, simulated seconds")
+    parser.add_argument("--timeout", type=float, default=600, help="wall-clock limit of the run, seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the full report with depth time series to this file")
+    parser.add_argument("--log-level", default="WARNING", help="log level of the functions")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+
+    clock = Clock(args.time_scale)
+    args.profile = LatencyProfile()
+    for item in args.latency:
+        args.profile.update(*item.split("=", 1))
+    mix = {lane: float(share) for lane, share in parse_pairs(args.mix).items()}
+    args.concurrency_by_stage = {stage: int(n) for stage, n in parse_pairs(args.concurrency).items()}
+    for name in list(mix) + list(args.concurrency_by_stage):
+        if name not in LANES and name not in QUEUE_ENV_PREFIXES:
+            parser.error(f"Unknown lane or stage: {name}")
+
+    os.environ.update(build_env(clock, dict(item.split("=", 1) for item in args.env)))
+    bucket = os.environ["S3_BUCKET_NAME"]
+    rng = random.Random(args.seed)
+
+    s3 = FakeS3(clock, args.profile.storage_ms)
+    sqs = FakeSqs(clock, VISIBILITY_TIMEOUT_SECONDS, MAX_RECEIVE_COUNT, args.profile.queue_ms)
+    ydb = FakeYdb()
+    disk = FakeDisk(clock, args.profile, args.byte_scale)
+    internet = FakeInternet()
+    internet.register(FakeDisk.API_HOST, disk)
+    internet.register(FakeDisk.DOWNLOAD_HOST, disk)
+    internet.register(FakeSpeechKit.HOST, FakeSpeechKit(clock, args.profile, s3, args.byte_scale))
+    internet.register(FakeYandexGpt.HOST, FakeYandexGpt(clock, args.profile))
+    install_boto(s3, sqs)
+    install_requests(internet)
+
+    lectures = generate_lectures(args.lectures, mix, rng)
+    for lecture in lectures:
+        disk.add_video(lecture.link, f"{lecture.title}.mp4", lecture.size)
+
+    tmp_dir = tempfile.mkdtemp(prefix="harness-")
+    pdf_renderer = None if args.real_pdf else FakePdfRenderer(clock, args.profile)
+    stop_event = threading.Event()
+    extract_audio = ExtractAudioEmulator(clock, args.profile, s3, sqs, args.byte_scale)
+
+    containers = {"form-receiver": [
+        create_container("form-receiver", "handler", MEMORY_LIMIT_MB["form-receiver"], ydb, tmp_dir)
+        for _ in range(args.form_containers)
+    ]}
+    triggers = []
+    for stage, prefix in QUEUE_ENV_PREFIXES.items():
+        containers[stage] = []
+        for lane in LANES:
+            for _ in range(args.concurrency_by_stage.get(stage, 1)):
+                if stage == "extract-audio":
+                    container = Container(stage, extract_audio.handler, MEMORY_LIMIT_MB[stage])
+                else:
+                    container = create_container(stage, "handler", MEMORY_LIMIT_MB[stage], ydb, tmp_dir, pdf_renderer)
+                containers[stage].append(container)
+                triggers.append(QueueTrigger(sqs, HARNESS_ENV[f"{prefix}_{lane.upper()}"], container, 1, stop_event))
+    containers["recognize-speech-cron"] = [
+        create_container("recognize-speech-cron", "handler", MEMORY_LIMIT_MB["recognize-speech-cron"], ydb, tmp_dir)
+        for _ in range(args.cron_containers)
+    ]
+    cron = CronTrigger(clock, containers["recognize-speech-cron"], CRON_INTERVAL_SECONDS, stop_event)
+
+    # Функции при импорте выставляют корневому логгеру INFO
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    sampler = DepthSampler(clock, sqs, s3, bucket, args.sample_interval, stop_event)
+    generator = LoadGenerator(clock, lectures, containers["form-receiver"], args.rate, rng)
+    for thread in triggers + [cron, sampler]:
+        thread.start()
+
+    started = time.monotonic()
+    generator.start()
+    completed = wait_for_completion(ydb, sqs, generator, args.timeout)
+    elapsed_real = time.monotonic() - started
+    stop_event.set()
+    sampler.join()
+
+    report = build_report(args, clock, lectures, ydb, sqs, sampler, containers, cron, elapsed_real, completed)
+    print_report(report, width=60)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if completed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from fake_services import AUDIO_BYTES_PER_SECOND, VIDEO_BYTES_PER_SECOND, LatencyProfile
+from stand_ins import Clock, FakeS3, FakeSqs, FakeYdb
+
+logger = logging.getLogger()
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+_load_lock = threading.Lock()
+
+
+# Каждый контейнер получает свою копию модулей функции: кэши клиентов,
+# конфиг и корневой спан трассировки у контейнеров не общие, как в облаке
+def load_function(function_name: str) -> dict:
+    function_dir = os.path.join(SRC_DIR, function_name)
+    names = [f[:-3] for f in os.listdir(function_dir) if f.endswith(".py")]
+    with _load_lock:
+        saved = {name: sys.modules.pop(name) for name in names if name in sys.modules}
+        sys.path.insert(0, function_dir)
+        try:
+            importlib.import_module("main")
+            return {name: sys.modules[name] for name in names if name in sys.modules}
+        finally:
+            sys.path.remove(function_dir)
+            for name in names:
+                sys.modules.pop(name, None)
+            sys.modules.update(saved)
+
+
+class InvocationContext:
+    def __init__(self, function_name: str, memory_limit_in_mb: int):
+        self.function_name = function_name
+        self.memory_limit_in_mb = memory_limit_in_mb
+        self.request_id = None
+
+
+class Container:
+    def __init__(self, function_name: str, handler, memory_limit_in_mb: int, modules: dict | None = None):
+        self.function_name = function_name
+        self.handler = handler
+        self.modules = modules or {}
+        self.context = InvocationContext(function_name, memory_limit_in_mb)
+        self.busy_seconds = 0.0
+        self.invocations = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, event: dict):
+        started = time.perf_counter()
+        try:
+            response = self.handler(event, self.context)
+        except Exception as e:
+            logger.error(f"Unhandled error in {self.function_name}: {e}")
+            response = None
+        self.busy_seconds += time.perf_counter() - started
+        self.invocations += 1
+        if is_failed(response):
+            self.errors += 1
+        return response
+
+
+def create_container(function_name: str, handler_name: str, memory_limit_in_mb: int,
+                     ydb: FakeYdb, tmp_dir: str, pdf_renderer=None) -> Container:
+    modules = load_function(function_name)
+    ydb.bind(modules)
+    if "invocation_metrics" in modules:
+        # Иначе каждый вызов обходит весь /tmp машины, на которой запущен стенд
+        modules["invocation_metrics"].TMP_DIR = tmp_dir
+    if pdf_renderer is not None and "pdf_renderer" in modules:
+        modules["pdf_renderer"]._pdf_renderer = pdf_renderer
+    return Container(function_name, getattr(modules["main"], handler_name), memory_limit_in_mb, modules)
+
+
+def is_failed(response) -> bool:
+    return not isinstance(response, dict) or response.get("statusCode", 200) >= 500
+
+
+# Триггер Message Queue: batch_size сообщений на вызов. Ответ 5xx считаем
+# ошибкой вызова: сообщение вернётся после таймаута видимости, а после
+# maxReceiveCount доставок уйдёт в DLQ.
+class QueueTrigger(threading.Thread):
+    POLL_SECONDS = 0.2
+
+    def __init__(self, sqs: FakeSqs, queue_url: str, container: Container, batch_size: int,
+                 stop_event: threading.Event):
+        super().__init__(name=f"{container.function_name}:{queue_url}", daemon=True)
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.container = container
+        self.batch_size = batch_size
+        self.stop_event = stop_event
+
+    def run(self):
+        while not self.stop_event.is_set():
+            messages = self.sqs.receive(self.queue_url, self.batch_size, self.POLL_SECONDS)
+            if not messages:
+                continue
+            response = self.container.invoke(self.sqs.make_trigger_event(self.queue_url, messages))
+            if not is_failed(response):
+                for message in messages:
+                    self.sqs.delete(message.receipt_handle)
+
+
+# Таймер-триггер: вызов раз в interval секунд симуляции. Если все контейнеры
+# заняты прошлыми вызовами, тик пропускается.
+class CronTrigger(threading.Thread):
+    def __init__(self, clock: Clock, containers: list[Container], interval_seconds: float,
+                 stop_event: threading.Event):
+        super().__init__(name=f"{containers[0].function_name}:cron", daemon=True)
+        self.clock = clock
+        self.containers = containers
+        self.interval_seconds = interval_seconds
+        self.stop_event = stop_event
+        self.skipped_ticks = 0
+
+    def _run_on(self, container: Container):
+        try:
+            container.invoke({"messages": [{"event_metadata": {
+                "event_type": "yandex.cloud.events.serverless.triggers.TimerMessage",
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }}]})
+        finally:
+            container.lock.release()
+
+    def run(self):
+        while not self.stop_event.wait(self.clock.to_real(self.interval_seconds)):
+            for container in self.containers:
+                if container.lock.acquire(blocking=False):
+                    threading.Thread(target=self._run_on, args=(container,), daemon=True).start()
+                    break
+            else:
+                self.skipped_ticks += 1
+
+
+def new_child_traceparent(traceparent: str | None) -> str | None:
+    if not traceparent:
+        return None
+    parts = traceparent.split("-")
+    if len(parts) != 4:
+        return None
+    return f"{parts[0]}-{parts[1]}-{os.urandom(8).hex()}-{parts[3]}"
+
+
+# extract-audio написан на bash и зовёт yc, ffmpeg и curl, которых в песочнице нет.
+# Здесь тот же контракт: video/ из S3, audio/ в S3, сообщение с stage_event в
+# очередь recognize-speech полосы; ffmpeg заменён задержкой по длительности видео.
+class ExtractAudioEmulator:
+    def __init__(self, clock: Clock, profile: LatencyProfile, s3: FakeS3, sqs: FakeSqs, byte_scale: int):
+        self.clock = clock
+        self.profile = profile
+        self.s3 = s3
+        self.sqs = sqs
+        self.byte_scale = byte_scale
+        self.bucket = os.environ["S3_BUCKET_NAME"]
+
+    def handler(self, event, context):
+        for message in event["messages"]:
+            body = json.loads(message["details"]["message"]["body"])
+            task_id = body["task_id"]
+            lane = body.get("lane") if body.get("lane") in ("short", "medium", "long") else "medium"
+            started_at = datetime.now(timezone.utc)
+
+            self.s3.delay()
+            video = self.s3.get(self.bucket, body["object_name"])
+            if video is None:
+                return {"statusCode": 500, "body": f"Video {body['object_name']} not found"}
+
+            video_bytes = len(video.body) * self.byte_scale
+            seconds = video_bytes / VIDEO_BYTES_PER_SECOND
+            self.clock.sleep(seconds / self.profile.ffmpeg_speed)
+            audio_bytes = int(seconds * AUDIO_BYTES_PER_SECOND)
+
+            self.s3.delay()
+            self.s3.put(self.bucket, f"audio/{task_id}", bytes(audio_bytes // self.byte_scale), "audio/mpeg")
+
+            notification = {
+                "task_id": task_id,
+                "object_name": f"audio/{task_id}",
+                "lane": lane,
+                "stage_event": {
+                    "stage": "extract-audio",
+                    "started_at": started_at.isoformat(),
+                    "finished_at": datetime.now(timezone.utc).isoformat(),
+                    "bytes_in": video_bytes,
+                    "bytes_out": audio_bytes,
+                },
+            }
+            attributes = {"Source": {"StringValue": "cloud-function", "DataType": "String"}}
+            incoming = message["details"]["message"].get("message_attributes", {}).get("traceparent", {})
+            traceparent = new_child_traceparent(incoming.get("stringValue"))
+            if traceparent:
+                attributes["traceparent"] = {"StringValue": traceparent, "DataType": "String"}
+
+            self.sqs.delay()
+            self.sqs.send(os.environ[f"RECOGNIZE_SPEECH_QUEUE_URL_{lane.upper()}"],
+                          json.dumps(notification, ensure_ascii=False), 0, attributes)
+
+        return {"statusCode": 200}
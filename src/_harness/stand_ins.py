@@ -0,0 +1,656 @@
+import hashlib
+import io
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+STATUS_ERROR = "Ошибка"
+STATUS_DONE = "Успешно завершено"
+TERMINAL_STATUSES = (STATUS_ERROR, STATUS_DONE)
+
+LEDGER_RUNNING = "running"
+LEDGER_DONE = "done"
+
+DEAD_LETTER_QUEUE_URL = "harness://deadletter"
+
+
+# Все задержки стендов задаются в секундах симуляции и умножаются на scale:
+# при 0.01 минута работы SpeechKit проходит за 0.6 секунды
+class Clock:
+    def __init__(self, scale: float):
+        self.scale = scale
+
+    def to_real(self, simulated_seconds: float) -> float:
+        return simulated_seconds * self.scale
+
+    def to_simulated(self, real_seconds: float) -> float:
+        return real_seconds / self.scale
+
+    def sleep(self, simulated_seconds: float):
+        if simulated_seconds > 0:
+            time.sleep(simulated_seconds * self.scale)
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class NoSuchUpload(Exception):
+    pass
+
+
+class S3Object:
+    def __init__(self, body: bytes, content_type: str | None, content_encoding: str | None, metadata: dict | None):
+        self.body = body
+        self.content_type = content_type or "binary/octet-stream"
+        self.content_encoding = content_encoding
+        self.metadata = dict(metadata or {})
+        self.last_modified = datetime.now(timezone.utc)
+        self.etag = hashlib.md5(body).hexdigest()
+
+
+class FakeS3:
+    def __init__(self, clock: Clock, latency_ms: float = 0):
+        self.clock = clock
+        self.latency_ms = latency_ms
+        self._objects = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def delay(self):
+        self.clock.sleep(self.latency_ms / 1000)
+
+    def put(self, bucket: str, key: str, body: bytes, content_type: str | None = None,
+            content_encoding: str | None = None, metadata: dict | None = None) -> S3Object:
+        obj = S3Object(body, content_type, content_encoding, metadata)
+        with self._lock:
+            self._objects[(bucket, key)] = obj
+        return obj
+
+    def get(self, bucket: str, key: str) -> S3Object | None:
+        with self._lock:
+            return self._objects.get((bucket, key))
+
+    def delete(self, bucket: str, key: str):
+        with self._lock:
+            self._objects.pop((bucket, key), None)
+
+    def list_objects(self, bucket: str, prefix: str = "", start_after: str = "") -> list[tuple[str, S3Object]]:
+        with self._lock:
+            items = [(k, obj) for (b, k), obj in self._objects.items()
+                     if b == bucket and k.startswith(prefix) and k > start_after]
+        return sorted(items, key=lambda item: item[0])
+
+    def count(self, bucket: str, prefix: str) -> int:
+        with self._lock:
+            return sum(1 for b, k in self._objects if b == bucket and k.startswith(prefix))
+
+    def create_upload(self, bucket: str, key: str, content_type: str | None) -> str:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = (bucket, key, content_type, {})
+        return upload_id
+
+    def put_part(self, upload_id: str, part_number: int, data: bytes) -> str:
+        with self._lock:
+            if upload_id not in self._uploads:
+                raise NoSuchUpload(upload_id)
+            self._uploads[upload_id][3][part_number] = data
+        return hashlib.md5(data).hexdigest()
+
+    def complete_upload(self, upload_id: str, part_numbers: list[int]) -> S3Object:
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is None:
+            raise NoSuchUpload(upload_id)
+        bucket, key, content_type, parts = upload
+        return self.put(bucket, key, b"".join(parts[n] for n in part_numbers), content_type)
+
+    def abort_upload(self, upload_id: str):
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+
+
+class _EventsStub:
+    def register(self, *args, **kwargs):
+        pass
+
+
+class _ClientMeta:
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self.region_name = "ru-central1"
+        self.events = _EventsStub()
+
+
+class _ClientExceptions:
+    NoSuchKey = NoSuchKey
+    NoSuchUpload = NoSuchUpload
+
+
+def read_body(body) -> bytes:
+    if hasattr(body, "read"):
+        body = body.read()
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return bytes(body or b"")
+
+
+class _ListObjectsPaginator:
+    def __init__(self, client):
+        self._client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self._client.list_objects_v2(**kwargs, **({"ContinuationToken": token} if token else {}))
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            token = page["NextContinuationToken"]
+
+
+# Подмножество API клиента boto3 S3, которым пользуются функции
+class FakeS3Client:
+    exceptions = _ClientExceptions
+
+    def __init__(self, s3: FakeS3):
+        self._s3 = s3
+        self.meta = _ClientMeta("s3")
+
+    def put_object(self, Bucket, Key, Body=b"", ContentType=None, ContentEncoding=None, Metadata=None, **kwargs):
+        self._s3.delay()
+        obj = self._s3.put(Bucket, Key, read_body(Body), ContentType, ContentEncoding, Metadata)
+        return {"ETag": f'"{obj.etag}"'}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, **kwargs):
+        extra = ExtraArgs or {}
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj, ContentType=extra.get("ContentType"),
+                        ContentEncoding=extra.get("ContentEncoding"), Metadata=extra.get("Metadata"))
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._s3.delay()
+        obj = self._s3.get(Bucket, Key)
+        if obj is None:
+            raise NoSuchKey(f"The specified key does not exist: {Key}")
+        response = {
+            "Body": io.BytesIO(obj.body),
+            "ContentLength": len(obj.body),
+            "ContentType": obj.content_type,
+            "LastModified": obj.last_modified,
+            "ETag": f'"{obj.etag}"',
+            "Metadata": dict(obj.metadata),
+        }
+        if obj.content_encoding:
+            response["ContentEncoding"] = obj.content_encoding
+        return response
+
+    def head_object(self, Bucket, Key, **kwargs):
+        response = self.get_object(Bucket=Bucket, Key=Key)
+        del response["Body"]
+        return response
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, ContinuationToken=None, StartAfter="", **kwargs):
+        self._s3.delay()
+        items = self._s3.list_objects(Bucket, Prefix, ContinuationToken or StartAfter or "")
+        page = items[:MaxKeys]
+        response = {"KeyCount": len(page), "IsTruncated": len(items) > MaxKeys, "Prefix": Prefix}
+        if page:
+            response["Contents"] = [
+                {"Key": key, "Size": len(obj.body), "LastModified": obj.last_modified, "ETag": f'"{obj.etag}"'}
+                for key, obj in page
+            ]
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1][0]
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(f"Paginator {operation_name} is not supported by the harness")
+        return _ListObjectsPaginator(self)
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._s3.delay()
+        self._s3.delete(Bucket, Key)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._s3.delay()
+        for item in Delete["Objects"]:
+            self._s3.delete(Bucket, item["Key"])
+        return {"Deleted": [{"Key": item["Key"]} for item in Delete["Objects"]]}
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None, **kwargs):
+        self._s3.delay()
+        return {"Bucket": Bucket, "Key": Key, "UploadId": self._s3.create_upload(Bucket, Key, ContentType)}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self._s3.delay()
+        return {"ETag": f'"{self._s3.put_part(UploadId, PartNumber, read_body(Body))}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._s3.delay()
+        obj = self._s3.complete_upload(UploadId, [part["PartNumber"] for part in MultipartUpload["Parts"]])
+        return {"Bucket": Bucket, "Key": Key, "ETag": f'"{obj.etag}"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._s3.abort_upload(UploadId)
+        return {}
+
+
+class SqsMessage:
+    def __init__(self, body: str, message_attributes: dict | None, visible_at: float):
+        self.message_id = str(uuid.uuid4())
+        self.body = body
+        self.message_attributes = message_attributes or {}
+        self.md5_of_body = hashlib.md5(body.encode("utf-8")).hexdigest()
+        self.sent_at = time.time()
+        self.visible_at = visible_at
+        self.receive_count = 0
+        self.receipt_handle = None
+
+
+class FakeQueue:
+    def __init__(self, url: str):
+        self.url = url
+        self.messages = []
+        self.sent = 0
+        self.dead_lettered = 0
+        # Время от отправки до первой доставки, секунды
+        self.waits = []
+
+
+# Очереди Message Queue с таймаутом видимости и redrive в DLQ после
+# max_receive_count доставок, как в terraform
+class FakeSqs:
+    def __init__(self, clock: Clock, visibility_timeout_seconds: float = 600, max_receive_count: int = 3,
+                 latency_ms: float = 0):
+        self.clock = clock
+        self.visibility_timeout_seconds = visibility_timeout_seconds
+        self.max_receive_count = max_receive_count
+        self.latency_ms = latency_ms
+        self._queues = {}
+        self._receipts = {}
+        self._cond = threading.Condition()
+
+    def delay(self):
+        self.clock.sleep(self.latency_ms / 1000)
+
+    def _queue(self, url: str) -> FakeQueue:
+        queue = self._queues.get(url)
+        if queue is None:
+            queue = self._queues[url] = FakeQueue(url)
+        return queue
+
+    def queue_urls(self) -> list[str]:
+        with self._cond:
+            return list(self._queues)
+
+    def send(self, url: str, body: str, delay_seconds: float = 0, message_attributes: dict | None = None) -> SqsMessage:
+        message = SqsMessage(body, message_attributes, time.monotonic() + self.clock.to_real(delay_seconds))
+        with self._cond:
+            queue = self._queue(url)
+            queue.messages.append(message)
+            queue.sent += 1
+            self._cond.notify_all()
+        return message
+
+    def receive(self, url: str, max_messages: int = 1, wait_seconds: float = 0,
+                visibility_timeout_seconds: float | None = None) -> list[SqsMessage]:
+        visibility = self.clock.to_real(visibility_timeout_seconds if visibility_timeout_seconds is not None
+                                        else self.visibility_timeout_seconds)
+        deadline = time.monotonic() + wait_seconds
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                queue = self._queue(url)
+                received = []
+                for message in list(queue.messages):
+                    if len(received) >= max_messages:
+                        break
+                    if message.visible_at > now:
+                        continue
+                    if message.receive_count >= self.max_receive_count:
+                        queue.messages.remove(message)
+                        queue.dead_lettered += 1
+                        dead_letter = self._queue(DEAD_LETTER_QUEUE_URL)
+                        dead_letter.messages.append(message)
+                        dead_letter.sent += 1
+                        continue
+                    if message.receive_count == 0:
+                        queue.waits.append(time.time() - message.sent_at)
+                    message.receive_count += 1
+                    message.visible_at = now + visibility
+                    message.receipt_handle = uuid.uuid4().hex
+                    self._receipts[message.receipt_handle] = (url, message)
+                    received.append(message)
+
+                if received or now >= deadline:
+                    return received
+                next_visible = min((m.visible_at for m in queue.messages if m.visible_at > now), default=deadline)
+                self._cond.wait(max(0.001, min(deadline, next_visible) - now))
+
+    def delete(self, receipt_handle: str):
+        with self._cond:
+            url, message = self._receipts.pop(receipt_handle, (None, None))
+            if message is not None and message in self._queues[url].messages:
+                self._queues[url].messages.remove(message)
+
+    def depth(self, url: str) -> dict:
+        now = time.monotonic()
+        with self._cond:
+            queue = self._queue(url)
+            delayed = sum(1 for m in queue.messages if m.visible_at > now and m.receive_count == 0)
+            in_flight = sum(1 for m in queue.messages if m.visible_at > now and m.receive_count > 0)
+            return {
+                "visible": len(queue.messages) - delayed - in_flight,
+                "in_flight": in_flight,
+                "delayed": delayed,
+            }
+
+    def waits(self, url: str) -> list[float]:
+        with self._cond:
+            return list(self._queue(url).waits)
+
+    def peek(self, url: str) -> list[SqsMessage]:
+        with self._cond:
+            return list(self._queue(url).messages)
+
+    # Событие триггера Message Queue в формате, который получают функции
+    def make_trigger_event(self, url: str, messages: list[SqsMessage]) -> dict:
+        return {
+            "messages": [
+                {
+                    "event_metadata": {
+                        "event_id": message.message_id,
+                        "event_type": "yandex.cloud.events.messagequeue.QueueMessage",
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                    },
+                    "details": {
+                        "queue_id": url,
+                        "message": {
+                            "message_id": message.message_id,
+                            "md5_of_body": message.md5_of_body,
+                            "body": message.body,
+                            "attributes": {
+                                "SentTimestamp": str(int(message.sent_at * 1000)),
+                                "ApproximateReceiveCount": str(message.receive_count),
+                            },
+                            "message_attributes": {
+                                name: {"dataType": value.get("DataType"), "stringValue": value.get("StringValue")}
+                                for name, value in message.message_attributes.items()
+                            },
+                        },
+                    },
+                }
+                for message in messages
+            ]
+        }
+
+
+# Подмножество API клиента boto3 SQS
+class FakeSqsClient:
+    def __init__(self, sqs: FakeSqs):
+        self._sqs = sqs
+        self.meta = _ClientMeta("sqs")
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds=0, MessageAttributes=None, **kwargs):
+        self._sqs.delay()
+        message = self._sqs.send(QueueUrl, MessageBody, DelaySeconds, MessageAttributes)
+        return {"MessageId": message.message_id, "MD5OfMessageBody": message.md5_of_body}
+
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        self._sqs.delay()
+        successful = []
+        for entry in Entries:
+            message = self._sqs.send(QueueUrl, entry["MessageBody"], entry.get("DelaySeconds", 0),
+                                     entry.get("MessageAttributes"))
+            successful.append({"Id": entry["Id"], "MessageId": message.message_id,
+                               "MD5OfMessageBody": message.md5_of_body})
+        return {"Successful": successful, "Failed": []}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=None, **kwargs):
+        self._sqs.delay()
+        messages = self._sqs.receive(QueueUrl, MaxNumberOfMessages, self._sqs.clock.to_real(WaitTimeSeconds),
+                                     VisibilityTimeout)
+        if not messages:
+            return {}
+        return {"Messages": [
+            {
+                "MessageId": m.message_id,
+                "ReceiptHandle": m.receipt_handle,
+                "MD5OfBody": m.md5_of_body,
+                "Body": m.body,
+                "Attributes": {"SentTimestamp": str(int(m.sent_at * 1000)),
+                               "ApproximateReceiveCount": str(m.receive_count)},
+                "MessageAttributes": m.message_attributes,
+            }
+            for m in messages
+        ]}
+
+    def delete_message(self, QueueUrl, ReceiptHandle, **kwargs):
+        self._sqs.delay()
+        self._sqs.delete(ReceiptHandle)
+        return {}
+
+    def delete_message_batch(self, QueueUrl, Entries, **kwargs):
+        self._sqs.delay()
+        for entry in Entries:
+            self._sqs.delete(entry["ReceiptHandle"])
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames=None, **kwargs):
+        self._sqs.delay()
+        depth = self._sqs.depth(QueueUrl)
+        return {"Attributes": {
+            "ApproximateNumberOfMessages": str(depth["visible"]),
+            "ApproximateNumberOfMessagesNotVisible": str(depth["in_flight"]),
+            "ApproximateNumberOfMessagesDelayed": str(depth["delayed"]),
+        }}
+
+
+# Клиенты boto3 создаются внутри функций, поэтому подменяется сама фабрика
+def install_boto(s3: FakeS3, sqs: FakeSqs):
+    import boto3.session
+
+    def client(session, service_name, *args, **kwargs):
+        if service_name == "s3":
+            return FakeS3Client(s3)
+        if service_name == "sqs":
+            return FakeSqsClient(sqs)
+        raise ValueError(f"Service {service_name} has no stand-in in the harness")
+
+    boto3.session.Session.client = client
+
+
+# Таблицы YDB в памяти. Функции ходят в YDB через свои функции доступа
+# (add_task_to_db, claim_stage, record_stage_event, ...), их и подменяем
+# в модулях каждого контейнера, сохраняя семантику запросов.
+class FakeYdb:
+    def __init__(self):
+        self.tasks = {}
+        self.ledger = {}
+        self.stage_events = []
+        self.rate_limits = {}
+        self._lock = threading.Lock()
+
+    def add_task(self, lecture_title: str, video_url: str, video_path: str | None = None) -> str:
+        task_id = str(uuid.uuid4())
+        with self._lock:
+            self.tasks[task_id] = {
+                "task_id": task_id,
+                "created_at": datetime.now(timezone.utc),
+                "lecture_title": lecture_title,
+                "video_url": video_url,
+                "video_path": video_path,
+                "status": "В очереди",
+                "description": None,
+                "finished_at": None,
+            }
+        return task_id
+
+    def change_status(self, task_id: str, status: str, description: str | None):
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return
+            task["status"] = status
+            task["description"] = description
+            if status in TERMINAL_STATUSES and task["finished_at"] is None:
+                task["finished_at"] = datetime.now(timezone.utc)
+
+    def get_lecture_name(self, task_id: str) -> str:
+        with self._lock:
+            return self.tasks[task_id]["lecture_title"]
+
+    def task_snapshot(self) -> list[dict]:
+        with self._lock:
+            return [dict(task) for task in self.tasks.values()]
+
+    def claim(self, task_id: str, stage: str, owner: str, lease_seconds: float) -> tuple[str, str | None]:
+        now = time.monotonic()
+        with self._lock:
+            row = self.ledger.get((task_id, stage))
+            if row is not None and row["status"] == LEDGER_DONE:
+                return "done", row["result"]
+            if row is not None and row["lease_until"] > now:
+                return "busy", None
+            self.ledger[(task_id, stage)] = {
+                "status": LEDGER_RUNNING, "owner": owner, "lease_until": now + lease_seconds, "result": None,
+            }
+            return "claimed", None
+
+    def complete(self, task_id: str, stage: str, owner: str, result: str | None):
+        with self._lock:
+            row = self.ledger.get((task_id, stage))
+            if row is not None and row["owner"] == owner:
+                row["status"] = LEDGER_DONE
+                row["result"] = result
+
+    def release(self, task_id: str, stage: str, owner: str):
+        with self._lock:
+            row = self.ledger.get((task_id, stage))
+            if row is not None and row["owner"] == owner and row["status"] == LEDGER_RUNNING:
+                del self.ledger[(task_id, stage)]
+
+    def record_stage_event(self, task_id: str, stage: str, started_at: datetime, finished_at: datetime,
+                           status: str, lane: str | None, bytes_in: int | None, bytes_out: int | None):
+        with self._lock:
+            self.stage_events.append({
+                "task_id": task_id,
+                "stage": stage,
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "duration_ms": (finished_at - started_at).total_seconds() * 1000,
+                "status": status,
+                "lane": lane,
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+            })
+
+    def stage_stats(self, since: datetime) -> dict[str, tuple[int, float]]:
+        durations = {}
+        with self._lock:
+            for event in self.stage_events:
+                if event["finished_at"] >= since and event["status"] == "ok":
+                    durations.setdefault(event["stage"], []).append(event["duration_ms"])
+        return {stage: (len(values), sorted(values)[len(values) // 2]) for stage, values in durations.items()}
+
+    def take_tokens(self, api: str, rate: float, burst: float, tokens: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.rate_limits.get(api)
+            if bucket is None:
+                available = burst
+            else:
+                available = min(burst, bucket[0] + max(0.0, now - bucket[1]) * rate)
+
+            if available >= tokens:
+                available -= tokens
+                wait_seconds = 0.0
+            else:
+                wait_seconds = (tokens - available) / rate
+            self.rate_limits[api] = (available, now)
+        return wait_seconds
+
+    def bind(self, modules: dict):
+        main = modules["main"]
+
+        def add_task_to_db(config, lecture_title: str, video_url: str, eta: datetime | None = None) -> str:
+            return self.add_task(lecture_title, video_url)
+
+        def add_tasks_to_db(config, tasks: list[dict]) -> list[str]:
+            for task in tasks:
+                task["task_id"] = self.add_task(task["lecture_title"], task["video_url"], task["video_path"])
+                task["traceparent"] = modules["tracing"].new_traceparent()
+            return [task["task_id"] for task in tasks]
+
+        def change_status_in_db(config, task_id: str, status: str, description: str | None):
+            self.change_status(task_id, status, description)
+
+        def mark_tasks_failed(config, task_ids: list[str], description: str):
+            for task_id in task_ids:
+                self.change_status(task_id, "Ошибка", description)
+
+        def get_lecture_name(config, task_id: str) -> str:
+            return self.get_lecture_name(task_id)
+
+        replace_function(modules, "main", "add_task_to_db", add_task_to_db)
+        replace_function(modules, "main", "add_tasks_to_db", add_tasks_to_db)
+        replace_function(modules, "main", "change_status_in_db", change_status_in_db)
+        replace_function(modules, "main", "mark_tasks_failed", mark_tasks_failed)
+        replace_function(modules, "main", "get_lecture_name", get_lecture_name)
+
+        if "ledger" in modules:
+            ledger = modules["ledger"]
+
+            def claim_stage(config, task_id: str, stage: str):
+                owner = str(uuid.uuid4())
+                state, result = self.claim(task_id, stage, owner, config.stage_lease_seconds)
+                if state == "busy":
+                    raise ledger.StageBusyError(
+                        f"Stage {stage} for task_id {task_id} is being processed by another invocation")
+                return ledger.StageClaim(task_id, stage, owner, state == "claimed", result)
+
+            def complete_stage(config, claim, result: str | None):
+                self.complete(claim.task_id, claim.stage, claim.owner, result)
+
+            def release_stage(config, claim):
+                self.release(claim.task_id, claim.stage, claim.owner)
+
+            replace_function(modules, "ledger", "claim_stage", claim_stage)
+            replace_function(modules, "ledger", "complete_stage", complete_stage)
+            replace_function(modules, "ledger", "release_stage", release_stage)
+
+        if "stage_events" in modules:
+            def record_stage_event(config, task_id: str, stage: str, started_at: datetime, finished_at: datetime,
+                                   status: str = "ok", lane: str | None = None,
+                                   bytes_in: int | None = None, bytes_out: int | None = None):
+                self.record_stage_event(task_id, stage, started_at, finished_at, status, lane, bytes_in, bytes_out)
+
+            replace_function(modules, "stage_events", "record_stage_event", record_stage_event)
+
+        if "admission" in modules:
+            def get_stage_stats(config, since: datetime) -> dict[str, tuple[int, float]]:
+                return self.stage_stats(since)
+
+            replace_function(modules, "admission", "get_stage_stats", get_stage_stats)
+
+        if "ratelimit" in modules:
+            def try_acquire(config, api: str, rate: float, burst: float, tokens: float = 1.0) -> float:
+                return self.take_tokens(api, rate, burst, tokens)
+
+            replace_function(modules, "ratelimit", "try_acquire", try_acquire)
+
+
+# Имя импортировано через from ... import, поэтому заменяем его во всех
+# модулях контейнера, где лежит тот же объект
+def replace_function(modules: dict, module_name: str, name: str, replacement):
+    module = modules.get(module_name)
+    if module is None or not hasattr(module, name):
+        return
+    original = getattr(module, name)
+    for m in modules.values():
+        if getattr(m, name, None) is original:
+            setattr(m, name, replacement)
@@ -0,0 +1,152 @@
+import argparse
+import json
+import math
+import sys
+from collections import Counter, defaultdict
+
+# Память Cloud Functions задаётся шагом 128 МБ
+MEMORY_STEP_MB = 128
+MIN_MEMORY_MB = 128
+MAX_MEMORY_MB = 4096
+MB = 1024 * 1024
+
+
+def parse_metric_record(line: str) -> dict | None:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        entry = None
+
+    # Экспорт Cloud Logging (yc logging read --format json) кладёт строку лога в message
+    if isinstance(entry, dict) and entry.get("metric") != "invocation":
+        line = entry.get("message") or ""
+        entry = None
+
+    if entry is None:
+        start = line.find("{")
+        if start < 0:
+            return None
+        try:
+            entry = json.loads(line[start:])
+        except ValueError:
+            return None
+
+    if isinstance(entry, dict) and entry.get("metric") == "invocation":
+        return entry
+    return None
+
+
+def read_records(paths: list[str]) -> list[dict]:
+    records = []
+    files = [open(path, encoding="utf-8") for path in paths] if paths else [sys.stdin]
+    for f in files:
+        for line in f:
+            record = parse_metric_record(line)
+            if record is not None:
+                records.append(record)
+    return records
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def recommend_memory_mb(peak_rss_mb: float, headroom: float) -> int:
+    needed = peak_rss_mb * headroom
+    steps = math.ceil(needed / MEMORY_STEP_MB)
+    return min(max(steps * MEMORY_STEP_MB, MIN_MEMORY_MB), MAX_MEMORY_MB)
+
+
+def summarize(function: str, records: list[dict], rss_percentile: float, headroom: float) -> dict:
+    rss_mb = [r["peak_rss_bytes"] / MB for r in records if r.get("peak_rss_bytes")]
+    wall_ms = [r["wall_ms"] for r in records if r.get("wall_ms") is not None]
+    cpu_ms = [r["cpu_ms"] for r in records if r.get("cpu_ms") is not None]
+    limits = Counter(r.get("memory_limit_mb") for r in records if r.get("memory_limit_mb"))
+    current_mb = limits.most_common(1)[0][0] if limits else None
+
+    peak_mb = percentile(rss_mb, rss_percentile)
+    recommended_mb = recommend_memory_mb(peak_mb, headroom)
+    wall_total = sum(wall_ms)
+    return {
+        "function": function,
+        "invocations": len(records),
+        "cold_ratio": sum(1 for r in records if r.get("cold")) / len(records),
+        "rss_p50_mb": percentile(rss_mb, 50),
+        "rss_p95_mb": percentile(rss_mb, 95),
+        "rss_p99_mb": percentile(rss_mb, 99),
+        "rss_max_mb": max(rss_mb, default=0.0),
+        "wall_p95_ms": percentile(wall_ms, 95),
+        "cpu_p95_ms": percentile(cpu_ms, 95),
+        # Доля CPU от времени вызова: близко к 1 — упираемся в процессор, а его
+        # выделяется тем больше, чем больше памяти у функции
+        "cpu_share": sum(cpu_ms) / wall_total if wall_total else 0.0,
+        "tmp_max_mb": max((r.get("tmp_bytes") or 0 for r in records), default=0) / MB,
+        "bytes_in_p95_mb": percentile([r.get("bytes_in") or 0 for r in records], 95) / MB,
+        "bytes_out_p95_mb": percentile([r.get("bytes_out") or 0 for r in records], 95) / MB,
+        "errors": sum(1 for r in records if (r.get("status_code") or 200) >= 500),
+        "current_mb": current_mb,
+        "recommended_mb": recommended_mb,
+        "per_invocation_peak": all(r.get("peak_rss_per_invocation") for r in records),
+    }
+
+
+def advice(summary: dict) -> str:
+    notes = []
+    current = summary["current_mb"]
+    recommended = summary["recommended_mb"]
+    if current is None:
+        notes.append(f"set {recommended} MB")
+    elif recommended < current:
+        notes.append(f"decrease {current} -> {recommended} MB")
+    elif recommended > current:
+        notes.append(f"increase {current} -> {recommended} MB")
+    else:
+        notes.append("keep")
+    if summary["cpu_share"] > 0.8:
+        notes.append("CPU-bound: more memory also buys CPU")
+    if summary["cold_ratio"] > 0.2:
+        notes.append("frequent cold starts: consider provisioned instances")
+    if not summary["per_invocation_peak"]:
+        notes.append("peak RSS is per container, not per call")
+    return "; ".join(notes)
+
+
+def report(summaries: list[dict]):
+    print(f"{'function':<24}{'calls':>7}{'cold':>7}{'rss p50':>9}{'p95':>8}{'p99':>8}{'max':>8}"
+          f"{'wall p95':>10}{'cpu':>6}{'/tmp':>8}{'now':>7}{'rec':>7}  advice")
+    for s in summaries:
+        current = s["current_mb"] if s["current_mb"] is not None else "?"
+        print(f"{s['function']:<24}{s['invocations']:>7}{s['cold_ratio']:>7.0%}"
+              f"{s['rss_p50_mb']:>9.0f}{s['rss_p95_mb']:>8.0f}{s['rss_p99_mb']:>8.0f}{s['rss_max_mb']:>8.0f}"
+              f"{s['wall_p95_ms']:>10.0f}{s['cpu_share']:>6.0%}{s['tmp_max_mb']:>8.0f}"
+              f"{current:>7}{s['recommended_mb']:>7}  {advice(s)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Right-sizing of function memory from invocation metrics logs")
+    parser.add_argument("logs", nargs="*", help="exported log files, stdin if omitted")
+    parser.add_argument("--percentile", type=float, default=99, help="peak RSS percentile to size for")
+    parser.add_argument("--headroom", type=float, default=1.25, help="multiplier over the sized peak RSS")
+    parser.add_argument("--json", action="store_true", help="print recommendations as JSON")
+    args = parser.parse_args()
+
+    by_function = defaultdict(list)
+    for record in read_records(args.logs):
+        by_function[record["function"]].append(record)
+
+    if not by_function:
+        print("No invocation metrics found", file=sys.stderr)
+        sys.exit(1)
+
+    summaries = [summarize(f, rs, args.percentile, args.headroom) for f, rs in sorted(by_function.items())]
+    if args.json:
+        print(json.dumps(summaries, ensure_ascii=False, indent=2))
+    else:
+        report(summaries)
@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from stages import STAGES, FunctionSlot, ScriptSlot, StageSpec, create_ydb_pool, is_failed, \
+    make_timer_event, make_trigger_message
+
+logger = logging.getLogger()
+
+# Долгоживущий процесс вместо облачных функций: те же handler(event, context)
+# этапов, но без холодного старта и нового подключения на каждое сообщение.
+# Окружение — объединение переменных функций из terraform/main.tf плюс очереди,
+# которые этапы читают: DOWNLOAD_QUEUE_URL_*, EXTRACT_AUDIO_QUEUE_URL_*,
+# RECOGNIZE_SPEECH_QUEUE_URL_*, SUMMARY_QUEUE_URL_*, SEARCH_INDEX_QUEUE_URL_*.
+
+SQS_ENDPOINT_URL = "https://message-queue.api.cloud.yandex.net"
+# Максимум long polling в Message Queue
+MAX_WAIT_SECONDS = 20
+POLL_ERROR_BACKOFF_SECONDS = 5
+
+
+def get_sqs_client():
+    import boto3.session
+
+    session = boto3.session.Session()
+    return session.client(
+        service_name='sqs',
+        endpoint_url=SQS_ENDPOINT_URL,
+        region_name='ru-central1',
+        aws_access_key_id=os.environ["AWS_ACCESS_KEY_ID"],
+        aws_secret_access_key=os.environ["AWS_SECRET_ACCESS_KEY"],
+    )
+
+
+class StageRunner:
+    def __init__(self, spec: StageSpec, slots: list, sqs, io_executor: ThreadPoolExecutor,
+                 wait_seconds: int, stopping: asyncio.Event):
+        self.spec = spec
+        self.sqs = sqs
+        self.io_executor = io_executor
+        self.wait_seconds = wait_seconds
+        self.stopping = stopping
+        self.slots = slots
+        # Свободный слот — разрешение взять следующее сообщение, поэтому воркер
+        # не держит невидимыми сообщения, которые некому обработать
+        self.free_slots = asyncio.Queue()
+        for slot in slots:
+            self.free_slots.put_nowait(slot)
+        self.handler_executor = ThreadPoolExecutor(max_workers=len(slots), thread_name_prefix=spec.name)
+        self.in_flight = set()
+        self.processed = 0
+        self.failed = 0
+        self.skipped_ticks = 0
+
+    async def _io(self, fn, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, lambda: fn(**kwargs))
+
+    def _start(self, coro):
+        task = asyncio.create_task(coro)
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def _acquire_slot(self):
+        get_slot = asyncio.ensure_future(self.free_slots.get())
+        stop = asyncio.ensure_future(self.stopping.wait())
+        await asyncio.wait({get_slot, stop}, return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        if get_slot.done():
+            return get_slot.result()
+        get_slot.cancel()
+        return None
+
+    async def poll_queue(self, lane: str, queue_url: str):
+        logger.info(f"Polling {self.spec.name} {lane} queue {queue_url}")
+        while not self.stopping.is_set():
+            slot = await self._acquire_slot()
+            if slot is None:
+                break
+            try:
+                resp = await self._io(
+                    self.sqs.receive_message,
+                    QueueUrl=queue_url,
+                    MaxNumberOfMessages=1,
+                    WaitTimeSeconds=self.wait_seconds,
+                    AttributeNames=["All"],
+                    MessageAttributeNames=["All"],
+                )
+            except Exception as e:
+                self.free_slots.put_nowait(slot)
+                logger.error(f"Failed to receive from {queue_url}: {e}")
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), POLL_ERROR_BACKOFF_SECONDS)
+                except TimeoutError:
+                    pass
+                continue
+
+            messages = resp.get("Messages", [])
+            if not messages:
+                self.free_slots.put_nowait(slot)
+                continue
+            if self.stopping.is_set():
+                # Сообщение пришло во время остановки: сразу возвращаем его в очередь
+                self.free_slots.put_nowait(slot)
+                await self._release(queue_url, messages[0])
+                break
+            self._start(self._process_message(slot, lane, queue_url, messages[0]))
+
+    async def _release(self, queue_url: str, message: dict):
+        try:
+            await self._io(self.sqs.change_message_visibility, QueueUrl=queue_url,
+                           ReceiptHandle=message["ReceiptHandle"], VisibilityTimeout=0)
+        except Exception as e:
+            logger.warning(f"Failed to release message {message['MessageId']}: {e}")
+
+    # Та же семантика, что у триггера: при ошибке сообщение не удаляется, вернётся
+    # после таймаута видимости, а после maxReceiveCount доставок уйдёт в DLQ
+    async def _process_message(self, slot, lane: str, queue_url: str, message: dict):
+        started = time.perf_counter()
+        try:
+            response = await slot.invoke({"messages": [make_trigger_message(queue_url, message)]},
+                                         self.handler_executor)
+            if is_failed(response):
+                self.failed += 1
+                logger.warning(f"{slot.name} failed on message {message['MessageId']} from {lane} queue, "
+                               f"leaving it for redelivery")
+                return
+            await self._io(self.sqs.delete_message, QueueUrl=queue_url, ReceiptHandle=message["ReceiptHandle"])
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Failed to finish message {message['MessageId']} on {slot.name}: {e}")
+        finally:
+            logger.debug(f"{slot.name} handled {message['MessageId']} in {time.perf_counter() - started:.1f}s")
+            self.free_slots.put_nowait(slot)
+
+    # Таймер-триггер: если прошлый вызов ещё идёт и свободных слотов нет, тик пропускается
+    async def run_timer(self):
+        logger.info(f"Running {self.spec.name} every {self.spec.timer_seconds}s")
+        while True:
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.spec.timer_seconds)
+                break
+            except TimeoutError:
+                pass
+            if self.free_slots.empty():
+                self.skipped_ticks += 1
+                logger.warning(f"{self.spec.name} is still busy, skipping tick")
+                continue
+            self._start(self._process_tick(self.free_slots.get_nowait()))
+
+    async def _process_tick(self, slot):
+        try:
+            response = await slot.invoke(make_timer_event(), self.handler_executor)
+            if is_failed(response):
+                self.failed += 1
+            else:
+                self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Failed to run {slot.name}: {e}")
+        finally:
+            self.free_slots.put_nowait(slot)
+
+    def pollers(self) -> list:
+        if self.spec.timer_seconds is not None:
+            return [self.run_timer()]
+        return [self.poll_queue(lane, url) for lane, url in self.spec.get_queue_urls().items()]
+
+    def terminate(self):
+        for slot in self.slots:
+            slot.terminate()
+        self.handler_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_concurrency(values: list[str]) -> dict[str, int]:
+    result = {}
+    for value in values:
+        stage, _, count = value.partition("=")
+        if stage not in STAGES or not count.isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"Expected <stage>=<n> with a known stage, got {value!r}")
+        result[stage] = int(count)
+    return result
+
+
+def create_runners(stage_names: list[str], concurrency: dict[str, int], sqs, io_executor: ThreadPoolExecutor,
+                   ydb_pool, wait_seconds: int, stopping: asyncio.Event) -> list[StageRunner]:
+    runners = []
+    for name in stage_names:
+        spec = STAGES[name]
+        count = concurrency.get(name, spec.concurrency)
+        if spec.script is not None:
+            slots = [ScriptSlot(spec, i) for i in range(count)]
+        else:
+            slots = [FunctionSlot(spec, i, ydb_pool) for i in range(count)]
+        logger.info(f"Stage {name}: {count} slots")
+        runners.append(StageRunner(spec, slots, sqs, io_executor, wait_seconds, stopping))
+    return runners
+
+
+async def run(args):
+    stage_names = args.stages
+    concurrency = parse_concurrency(args.concurrency)
+    STAGES["recognize-speech-cron"].timer_seconds = args.cron_interval
+
+    total_slots = sum(concurrency.get(n, STAGES[n].concurrency) for n in stage_names)
+    driver, ydb_pool = None, None
+    if any(STAGES[n].script is None for n in stage_names):
+        driver, ydb_pool = create_ydb_pool(total_slots * 2)
+
+    stopping = asyncio.Event()
+    queue_count = sum(len(STAGES[n].get_queue_urls()) for n in stage_names)
+    # Long polling, удаление и возврат сообщений не должны ждать друг друга
+    io_executor = ThreadPoolExecutor(max_workers=queue_count + total_slots, thread_name_prefix="sqs")
+    runners = create_runners(stage_names, concurrency, get_sqs_client(), io_executor, ydb_pool,
+                             args.wait_seconds, stopping)
+    # Модули функций при импорте выставляют корневому логгеру INFO
+    logger.setLevel(args.log_level.upper())
+
+    loop = asyncio.get_running_loop()
+
+    def on_signal(signum):
+        if stopping.is_set():
+            logger.warning("Second signal received, exiting without waiting for running invocations")
+            os._exit(1)
+        logger.info(f"Received {signal.Signals(signum).name}, stopping: no new messages, "
+                    f"waiting up to {args.shutdown_timeout}s for running invocations")
+        stopping.set()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, on_signal, signum)
+
+    await asyncio.gather(*(poller for runner in runners for poller in runner.pollers()))
+
+    in_flight = set().union(*(runner.in_flight for runner in runners))
+    if in_flight:
+        logger.info(f"Waiting for {len(in_flight)} running invocations")
+        _, pending = await asyncio.wait(in_flight, timeout=args.shutdown_timeout)
+    else:
+        pending = set()
+
+    for runner in runners:
+        logger.info(f"Stage {runner.spec.name}: {runner.processed} processed, {runner.failed} failed"
+                    + (f", {runner.skipped_ticks} ticks skipped" if runner.skipped_ticks else ""))
+
+    if pending:
+        # Сообщения незавершённых вызовов вернутся в очередь после таймаута видимости
+        logger.warning(f"{len(pending)} invocations did not finish in {args.shutdown_timeout}s, abandoning them")
+        for runner in runners:
+            runner.terminate()
+    io_executor.shutdown(wait=False, cancel_futures=True)
+    if driver is not None:
+        ydb_pool.stop()
+        driver.stop()
+    return len(pending)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run pipeline stages in one long-lived process")
+    parser.add_argument("--stages", type=lambda s: s.split(","), default=list(STAGES),
+                        help=f"Comma-separated stages to run (default: all of {','.join(STAGES)})")
+    parser.add_argument("--concurrency", action="append", default=[], metavar="STAGE=N",
+                        help="Concurrent invocations of a stage, can be repeated "
+                             f"(default: {', '.join(f'{n}={s.concurrency}' for n, s in STAGES.items())})")
+    parser.add_argument("--wait-seconds", type=int, default=MAX_WAIT_SECONDS,
+                        help="Long polling wait per receive, up to 20 seconds")
+    parser.add_argument("--cron-interval", type=float, default=60, help="Seconds between recognize-speech-cron runs")
+    parser.add_argument("--shutdown-timeout", type=float, default=300,
+                        help="Seconds to wait for running invocations on SIGTERM/SIGINT")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)}")
+    if not 0 <= args.wait_seconds <= MAX_WAIT_SECONDS:
+        parser.error(f"--wait-seconds must be between 0 and {MAX_WAIT_SECONDS}")
+    try:
+        parse_concurrency(args.concurrency)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s [%(threadName)s] %(message)s")
+    logger.setLevel(args.log_level.upper())
+
+    abandoned = asyncio.run(run(args))
+    if abandoned:
+        logging.shutdown()
+        # Потоки с незавершёнными вызовами не дали бы процессу выйти
+        os._exit(1)
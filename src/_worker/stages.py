@@ -0,0 +1,183 @@
+import asyncio
+import importlib
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+logger = logging.getLogger()
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+LANES = ("short", "medium", "long")
+QUEUE_MESSAGE_EVENT_TYPE = "yandex.cloud.events.messagequeue.QueueMessage"
+TIMER_EVENT_TYPE = "yandex.cloud.events.serverless.triggers.TimerMessage"
+
+
+class StageSpec:
+    def __init__(self, name: str, concurrency: int, queue_env_prefix: str | None = None,
+                 timer_seconds: float | None = None, script: str | None = None):
+        self.name = name
+        self.concurrency = concurrency
+        # Очереди этапа по полосам: <prefix>_SHORT, <prefix>_MEDIUM, <prefix>_LONG
+        self.queue_env_prefix = queue_env_prefix
+        self.timer_seconds = timer_seconds
+        self.script = script
+
+    def get_queue_urls(self) -> dict[str, str]:
+        if self.queue_env_prefix is None:
+            return {}
+        return {lane: os.environ[f"{self.queue_env_prefix}_{lane.upper()}"] for lane in LANES}
+
+
+# Те же источники событий, что у триггеров в terraform/main.tf
+STAGES = {
+    "download": StageSpec("download", 4, queue_env_prefix="DOWNLOAD_QUEUE_URL"),
+    "extract-audio": StageSpec("extract-audio", 2, queue_env_prefix="EXTRACT_AUDIO_QUEUE_URL", script="handler.sh"),
+    "recognize-speech": StageSpec("recognize-speech", 4, queue_env_prefix="RECOGNIZE_SPEECH_QUEUE_URL"),
+    "recognize-speech-cron": StageSpec("recognize-speech-cron", 1, timer_seconds=60),
+    "summary": StageSpec("summary", 2, queue_env_prefix="SUMMARY_QUEUE_URL"),
+    "search-index": StageSpec("search-index", 2, queue_env_prefix="SEARCH_INDEX_QUEUE_URL"),
+}
+
+
+# У функций одноимённые модули (main, config, tracing...), поэтому каждая
+# импортируется в свой набор модулей
+def load_function(function_name: str) -> dict:
+    function_dir = os.path.join(SRC_DIR, function_name)
+    names = [f[:-3] for f in os.listdir(function_dir) if f.endswith(".py")]
+    saved = {name: sys.modules.pop(name) for name in names if name in sys.modules}
+    sys.path.insert(0, function_dir)
+    try:
+        importlib.import_module("main")
+        return {name: sys.modules[name] for name in names if name in sys.modules}
+    finally:
+        sys.path.remove(function_dir)
+        for name in names:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+
+def create_ydb_pool(size: int):
+    import ydb
+
+    driver_config = ydb.DriverConfig(
+        os.environ["YDB_ENDPOINT"],
+        os.environ["YDB_DATABASE"],
+        credentials=ydb.credentials_from_env_variables(),
+        root_certificates=ydb.load_ydb_root_certificate(),
+    )
+    driver = ydb.Driver(driver_config)
+    try:
+        driver.wait(timeout=5, fail_fast=True)
+    except TimeoutError:
+        logger.warning(f"Connect failed to YDB. Last reported errors by discovery: {driver.discovery_debug_details()}")
+        driver.stop()
+        raise
+    return driver, ydb.QuerySessionPool(driver, size=size)
+
+
+def make_trigger_message(queue_url: str, message: dict) -> dict:
+    return {
+        "event_metadata": {
+            "event_id": message["MessageId"],
+            "event_type": QUEUE_MESSAGE_EVENT_TYPE,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "details": {
+            "queue_id": queue_url,
+            "message": {
+                "message_id": message["MessageId"],
+                "md5_of_body": message.get("MD5OfBody"),
+                "body": message["Body"],
+                "attributes": message.get("Attributes", {}),
+                "message_attributes": {
+                    name: {"dataType": value.get("DataType"), "stringValue": value.get("StringValue")}
+                    for name, value in message.get("MessageAttributes", {}).items()
+                },
+                "md5_of_message_attributes": message.get("MD5OfMessageAttributes"),
+            },
+        },
+    }
+
+
+def make_timer_event() -> dict:
+    return {"messages": [{"event_metadata": {
+        "event_type": TIMER_EVENT_TYPE,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }}]}
+
+
+def is_failed(response) -> bool:
+    return not isinstance(response, dict) or response.get("statusCode", 200) >= 500
+
+
+class InvocationContext:
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        # Ограничения памяти на вызов у общего процесса нет
+        self.memory_limit_in_mb = None
+        self.request_id = None
+
+
+# Слот — аналог контейнера функции: свой набор модулей, поэтому глобальные
+# кэши, корневой спан и счётчики invocation_metrics у слотов не общие, и код
+# функций по-прежнему видит не больше одного вызова за раз. Общие у слотов
+# драйвер и пул сессий YDB; клиенты S3 и SQS создаются один раз на слот и
+# держат соединения между сообщениями.
+class FunctionSlot:
+    def __init__(self, spec: StageSpec, index: int, ydb_pool=None):
+        self.name = f"{spec.name}#{index}"
+        self.modules = load_function(spec.name)
+        if ydb_pool is not None and "ydb_client" in self.modules:
+            ydb_client = self.modules["ydb_client"]
+            ydb_client._ydb_pool = ydb_client.TracedSessionPool(ydb_pool)
+        self.handler = self.modules["main"].handler
+        self.context = InvocationContext(spec.name)
+
+    async def invoke(self, event: dict, executor):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, self.handler, event, self.context)
+        except Exception as e:
+            logger.error(f"Unhandled error in {self.name}: {e}")
+            return None
+
+    def terminate(self):
+        # Поток с вызовом прервать нельзя, он завершится вместе с процессом
+        pass
+
+
+# extract-audio написан на bash: событие уходит в stdin, ответ — последняя строка stdout.
+# Логи скрипта идут в stderr воркера.
+class ScriptSlot:
+    def __init__(self, spec: StageSpec, index: int):
+        self.name = f"{spec.name}#{index}"
+        self.script_path = os.path.join(SRC_DIR, spec.name, spec.script)
+        self.process = None
+
+    async def invoke(self, event: dict, executor):
+        self.process = await asyncio.create_subprocess_exec(
+            "bash", self.script_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, _ = await self.process.communicate(json.dumps(event, ensure_ascii=False).encode("utf-8"))
+        finally:
+            returncode = self.process.returncode
+            self.process = None
+        if returncode != 0:
+            logger.error(f"{self.name} exited with code {returncode}")
+            return None
+        lines = stdout.decode("utf-8", errors="replace").strip().splitlines()
+        try:
+            return json.loads(lines[-1])
+        except (IndexError, ValueError):
+            logger.error(f"{self.name} returned no response")
+            return None
+
+    def terminate(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
@@ -1,4 +1,5 @@
 import os
+from lanes import get_lane_queue_urls
 
 class Config:
   def __init__(self):
@@ -6,6 +7,24 @@ class Config:
     self.ydb_database = os.environ["YDB_DATABASE"]
     self.ydb_tasks_table_name = os.environ["YDB_TASKS_TABLE_NAME"]
     self.s3_bucket_name = os.environ["S3_BUCKET_NAME"]
-    self.extract_audio_queue_url = os.environ["EXTRACT_AUDIO_QUEUE_URL"]
+    self.extract_audio_queue_urls = get_lane_queue_urls("EXTRACT_AUDIO_QUEUE_URL")
     self.aws_access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
-    self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
\ No newline at end of file
+    self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
+    self.ydb_ledger_table_name = os.environ["YDB_LEDGER_TABLE_NAME"]
+    self.stage_lease_seconds = int(os.environ.get("STAGE_LEASE_SECONDS", "900"))
+    self.ydb_stage_events_table_name = os.environ["YDB_STAGE_EVENTS_TABLE_NAME"]
+    self.lane_short_max_bytes = int(os.environ.get("LANE_SHORT_MAX_BYTES", str(200 * 1024 * 1024)))
+    self.lane_medium_max_bytes = int(os.environ.get("LANE_MEDIUM_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+_config = None
+
+# Конфиг собирается один раз на контейнер, .env есть только при локальном запуске
+def get_config() -> Config:
+  global _config
+  if _config is None:
+    if os.path.exists(".env"):
+      from dotenv import load_dotenv
+      load_dotenv(".env")
+    _config = Config()
+  return _config
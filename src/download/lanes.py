@@ -0,0 +1,42 @@
+import os
+import json
+import time
+import logging
+
+logger = logging.getLogger()
+
+LANES = ["short", "medium", "long"]
+DEFAULT_LANE = "medium"
+
+
+def get_lane(body: dict) -> str:
+    lane = body.get("lane")
+    return lane if lane in LANES else DEFAULT_LANE
+
+
+def get_lane_queue_urls(env_prefix: str) -> dict[str, str]:
+    return {lane: os.environ[f"{env_prefix}_{lane.upper()}"] for lane in LANES}
+
+
+def choose_lane(size_bytes: int | None, short_max_bytes: int, medium_max_bytes: int) -> str:
+    if size_bytes is None:
+        return DEFAULT_LANE
+    if size_bytes <= short_max_bytes:
+        return "short"
+    if size_bytes <= medium_max_bytes:
+        return "medium"
+    return "long"
+
+
+# Время в очереди по SentTimestamp из события триггера, для подбора порогов полос
+def record_queue_wait(stage: str, lane: str, message: dict):
+    sent_timestamp = message['details']['message'].get('attributes', {}).get('SentTimestamp')
+    if not sent_timestamp:
+        return
+    wait_seconds = time.time() - int(sent_timestamp) / 1000
+    logger.info(json.dumps({
+        "metric": "lane_queue_wait",
+        "stage": stage,
+        "lane": lane,
+        "wait_seconds": round(wait_seconds, 3),
+    }))
@@ -1,24 +1,61 @@
 import json
 import logging
-import boto3
-import boto3.exceptions
-import boto3.session
-import ydb
 import uuid
-from dotenv import load_dotenv
-from config import Config
-import requests
+from config import Config, get_config
+from ledger import claim_stage, complete_stage, release_stage
+from ydb_client import get_ydb_pool
+from lanes import choose_lane, get_lane, record_queue_wait
+from stage_events import stage_timer
+from invocation_metrics import add_bytes_in, add_bytes_out, record_invocation_metrics
+from tracing import get_message_attributes, get_message_traceparent, instrument_boto_client, start_span, trace_invocation
 from io import BytesIO
 from urllib.parse import urlparse, quote
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+STAGE_NAME = "download"
+
+_s3_client = None
+
+def get_s3_client(config: Config):
+    global _s3_client
+    if _s3_client is None:
+        import boto3.session
+
+        session = boto3.session.Session()
+        _s3_client = instrument_boto_client(session.client(
+            service_name='s3',
+            endpoint_url="https://storage.yandexcloud.net",
+            aws_access_key_id=config.aws_access_key_id,
+            aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _s3_client
+
+_sqs_client = None
+
+def get_sqs_client(config: Config):
+    global _sqs_client
+    if _sqs_client is None:
+        import boto3.session
+
+        session = boto3.session.Session()
+        _sqs_client = instrument_boto_client(session.client(
+            service_name='sqs',
+            endpoint_url='https://message-queue.api.cloud.yandex.net',
+            region_name='ru-central1',
+            aws_access_key_id=config.aws_access_key_id,
+            aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _sqs_client
+
+
+def get_yandex_disk_public_video(link, path=None) -> dict | None:
+    import requests
 
-def is_yandex_disk_public_video(link):
     parsed_url = urlparse(link)
     if parsed_url.scheme != 'https':
-        return False
+        return None
     
     allowed_domains = [
         'yadi.sk', 
@@ -29,62 +66,57 @@ def is_yandex_disk_public_video(link):
     ]
     
     if not any(parsed_url.netloc.endswith(domain) for domain in allowed_domains):
-        return False
+        return None
 
     api_url = "https://cloud-api.yandex.net/v1/disk/public/resources"
     encoded_link = quote(link, safe='')
     params = {'public_key': encoded_link}
+    if path:
+        # Файл внутри публичной папки
+        params['path'] = path
     headers = {'Accept': 'application/json'}
 
     try:
-        response = requests.get(api_url, params=params, headers=headers, timeout=10)
+        with start_span("disk.get_public_resource", "disk"):
+            response = requests.get(api_url, params=params, headers=headers, timeout=10)
     except requests.exceptions.RequestException:
-        return False
+        return None
 
     if response.status_code == 200:
         try:
             data = response.json()
         except ValueError:
-            return False
+            return None
         
-        return data.get('type') == 'file' and data.get('mime_type', '').startswith('video/')
+        if data.get('type') == 'file' and data.get('mime_type', '').startswith('video/'):
+            return data
     
-    return False
+    return None
 
 
 def change_status_in_db(config: Config, task_id: str, status: str, description: str | None):
-    driver_config = ydb.DriverConfig(
-        config.ydb_endpoint, 
-        config.ydb_database, 
-        credentials=ydb.credentials_from_env_variables(),
-        root_certificates=ydb.load_ydb_root_certificate(),
-    )
+    import ydb
 
     logger.info(f"Saving status {status} for task_id {task_id} to database")
-    with ydb.Driver(driver_config) as driver:
-        try:
-            driver.wait(timeout=5)
-            with ydb.QuerySessionPool(driver) as pool:
-                id = uuid.UUID(task_id)
-
-                pool.execute_with_retries(
-                    f"""
-                    UPDATE `{config.ydb_tasks_table_name}`
-                    SET status = $status, description = $description
-                    WHERE task_id = $taskId
-                    """,
-                    {
-                        "$taskId": (id, ydb.PrimitiveType.UUID),
-                        "$status": (status, ydb.PrimitiveType.Utf8),
-                        "$description": (description, ydb.OptionalType(ydb.PrimitiveType.Utf8)),
-                    }
-                )
-        except TimeoutError:
-            logger.warning(f"Connect failed to YDB. Last reported errors by discovery: {driver.discovery_debug_details()}")
-            exit(1)
-
-
-def download_video_to_s3(config: Config, task_id: str, video_url: str) -> str:
+    with start_span("ydb.change_status_in_db", "ydb", table=config.ydb_tasks_table_name):
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            UPDATE `{config.ydb_tasks_table_name}`
+            SET status = $status, description = $description
+            WHERE task_id = $taskId
+            """,
+            {
+                "$taskId": (uuid.UUID(task_id), ydb.PrimitiveType.UUID),
+                "$status": (status, ydb.PrimitiveType.Utf8),
+                "$description": (description, ydb.OptionalType(ydb.PrimitiveType.Utf8)),
+            }
+        )
+
+
+def download_video_to_s3(config: Config, task_id: str, video_url: str, video_path: str | None = None) -> str:
+    import boto3.exceptions
+    import requests
+
     object_name = f"video/{task_id}"
     logger.info(f"Downloading video {object_name} to bucket {config.s3_bucket_name}")
         
@@ -92,30 +124,30 @@ def download_video_to_s3(config: Config, task_id: str, video_url: str) -> str:
         api_url = "https://cloud-api.yandex.net/v1/disk/public/resources/download"
         encoded_link = quote(video_url, safe='')
         params = {'public_key': encoded_link}
+        if video_path:
+            params['path'] = video_path
         headers = {'Accept': 'application/json'}
-        response = requests.get(api_url, params=params, headers=headers, timeout=10)
-        real_video_url = response.json()['href']
+        with start_span("disk.get_download_link", "disk"):
+            response = requests.get(api_url, params=params, headers=headers, timeout=10)
+            real_video_url = response.json()['href']
 
         logger.info(f"Fetching video from URL: {real_video_url}")
 
-        response = requests.get(real_video_url, stream=True, timeout=30)
-        response.raise_for_status()
+        with start_span("disk.download", "disk") as span:
+            response = requests.get(real_video_url, stream=True, timeout=30)
+            response.raise_for_status()
+            file_buffer = BytesIO(response.content)
+            span.attributes['bytes'] = file_buffer.getbuffer().nbytes
+            add_bytes_in(file_buffer.getbuffer().nbytes)
         
-        session = boto3.session.Session()
-        s3 = session.client(
-            service_name='s3',
-            endpoint_url="https://storage.yandexcloud.net",
-            aws_access_key_id=config.aws_access_key_id,
-            aws_secret_access_key=config.aws_secret_access_key,
-        )
-        
-        file_buffer = BytesIO(response.content)
+        s3 = get_s3_client(config)
         s3.upload_fileobj(
             file_buffer,
             config.s3_bucket_name,
             object_name,
             ExtraArgs={'ContentType': response.headers.get('content-type', 'video/mp4')}
         )
+        add_bytes_out(file_buffer.getbuffer().nbytes)
 
         return object_name
     except requests.exceptions.RequestException as e:
@@ -129,33 +161,23 @@ def download_video_to_s3(config: Config, task_id: str, video_url: str) -> str:
         raise
 
 
-def send_message_to_queue(config: Config, task_id: str, object_name: str):
-    logger.info(f"Sending message to queue: {config.extract_audio_queue_url}")
+def send_message_to_queue(config: Config, task_id: str, object_name: str, lane: str):
+    queue_url = config.extract_audio_queue_urls[lane]
+    logger.info(f"Sending message to queue: {queue_url}")
         
     message_body = json.dumps({
             'task_id': task_id,
-            'object_name': object_name
+            'object_name': object_name,
+            'lane': lane
         }, ensure_ascii=False)
         
     try:
-        session = boto3.session.Session()
-        sqs = session.client(
-            service_name='sqs',
-            endpoint_url='https://message-queue.api.cloud.yandex.net',
-            region_name='ru-central1',
-            aws_access_key_id=config.aws_access_key_id,
-            aws_secret_access_key=config.aws_secret_access_key,
-        )
+        sqs = get_sqs_client(config)
             
         response = sqs.send_message(
-                QueueUrl=config.extract_audio_queue_url,
+                QueueUrl=queue_url,
                 MessageBody=message_body,
-                MessageAttributes={
-                    'Source': {
-                        'StringValue': 'cloud-function',
-                        'DataType': 'String'
-                    }
-                }
+                MessageAttributes=get_message_attributes()
             )
             
         logger.info(f"Message sent successfully. MessageId: {response.get('MessageId', 'Unknown')}")
@@ -165,30 +187,53 @@ def send_message_to_queue(config: Config, task_id: str, object_name: str):
         raise
 
 
+@record_invocation_metrics("download")
 def handler(event, context):
     try:
         logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
-        load_dotenv(".env")
-        config = Config()
+        config = get_config()
         
         for message in event["messages"]:
             body = json.loads(message['details']['message']['body'])
             task_id = body['task_id']
             video_url = body['video_url']
+            video_path = body.get('video_path')
+            record_queue_wait(STAGE_NAME, get_lane(body), message)
             
-            logger.info(f"Received data: task_id={task_id}, video_url={video_url}")
-            
-            if not is_yandex_disk_public_video(video_url):
-                change_status_in_db(config, task_id, "Ошибка", "Ссылка не ведет к публичному видео в Яндекс.Диск")
-                return { 'statusCode': 200 }
-            else:
-                change_status_in_db(config, task_id, "В обработке", None)
-            
-            object_name = download_video_to_s3(config, task_id, video_url)
+            with trace_invocation(STAGE_NAME, get_message_traceparent(message), task_id=task_id):
+                logger.info(f"Received data: task_id={task_id}, video_url={video_url}, video_path={video_path}")
 
-            send_message_to_queue(config, task_id, object_name)
+                claim = claim_stage(config, task_id, STAGE_NAME)
+                if not claim.claimed:
+                    return { 'statusCode': 200 }
+            
+                try:
+                    # Неверная ссылка — не скачивание: в stage_events она попала бы
+                    # успешным download без байтов и исказила перцентили и пропускную способность
+                    video = get_yandex_disk_public_video(video_url, video_path)
+                    if video is None:
+                        change_status_in_db(config, task_id, "Ошибка", "Ссылка не ведет к публичному видео в Яндекс.Диск")
+                        complete_stage(config, claim, None)
+                        return { 'statusCode': 200 }
+                    change_status_in_db(config, task_id, "В обработке", None)
+
+                    with stage_timer(config, task_id, STAGE_NAME, get_lane(body)) as stage_event:
+                        object_name = download_video_to_s3(config, task_id, video_url, video_path)
+
+                        # Дальше задача идёт по полосе, выбранной по размеру видео
+                        lane = choose_lane(video.get('size'), config.lane_short_max_bytes, config.lane_medium_max_bytes)
+                        logger.info(f"Video size {video.get('size')} bytes, lane {lane}")
+                        stage_event.lane = lane
+                        stage_event.bytes_out = video.get('size')
+
+                        send_message_to_queue(config, task_id, object_name, lane)
+
+                    complete_stage(config, claim, object_name)
+                except Exception:
+                    release_stage(config, claim)
+                    raise
 
-            return { 'statusCode': 200 }
+                return { 'statusCode': 200 }
         
     except Exception as e:
         logger.error(f"Error in handler: {str(e)}")
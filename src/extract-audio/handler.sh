@@ -4,7 +4,9 @@ set -euo pipefail
 
 missing_vars=()
 [ -z "$S3_BUCKET_NAME" ] && missing_vars+=("S3_BUCKET_NAME")
-[ -z "$RECOGNIZE_SPEECH_QUEUE_URL" ] && missing_vars+=("RECOGNIZE_SPEECH_QUEUE_URL")
+[ -z "$RECOGNIZE_SPEECH_QUEUE_URL_SHORT" ] && missing_vars+=("RECOGNIZE_SPEECH_QUEUE_URL_SHORT")
+[ -z "$RECOGNIZE_SPEECH_QUEUE_URL_MEDIUM" ] && missing_vars+=("RECOGNIZE_SPEECH_QUEUE_URL_MEDIUM")
+[ -z "$RECOGNIZE_SPEECH_QUEUE_URL_LONG" ] && missing_vars+=("RECOGNIZE_SPEECH_QUEUE_URL_LONG")
 [ -z "$AWS_ACCESS_KEY_ID" ] && missing_vars+=("AWS_ACCESS_KEY_ID")
 [ -z "$AWS_SECRET_ACCESS_KEY" ] && missing_vars+=("AWS_SECRET_ACCESS_KEY")
 
@@ -13,53 +15,215 @@ if [ ${#missing_vars[@]} -gt 0 ]; then
   exit 1
 fi
 
+SERVICE_NAME="extract-audio"
+
+random_hex() {
+  od -An -N"$1" -tx1 /dev/urandom | tr -d ' \n'
+}
+
+now_iso() {
+  date -u +%Y-%m-%dT%H:%M:%S.%6N+00:00
+}
+
+# Спан в том же формате JSON, что и tracing.py в Python-функциях
+emit_span() {
+  local name=$1 kind=$2 span_id=$3 parent_span_id=$4 start_time=$5 start_ns=$6 status=$7
+  local duration_ms=$(( ($(date +%s%N) - start_ns) / 1000000 ))
+  jq -nc --arg name "$name" --arg kind "$kind" --arg service "$SERVICE_NAME" \
+    --arg trace_id "$trace_id" --arg span_id "$span_id" --arg parent_span_id "$parent_span_id" \
+    --arg start_time "$start_time" --argjson duration_ms "$duration_ms" --arg status "$status" \
+    --arg task_id "$task_id" \
+    '{span: $name, kind: $kind, service: $service, trace_id: $trace_id, span_id: $span_id,
+      parent_span_id: (if $parent_span_id == "" then null else $parent_span_id end),
+      start_time: $start_time, duration_ms: $duration_ms, status: $status,
+      attributes: {task_id: $task_id}}' >&2
+}
+
+# Выполняет команду внутри дочернего спана этапа и возвращает её код выхода
+run_span() {
+  local name=$1 kind=$2
+  shift 2
+  local span_id start_time start_ns rc=0
+  span_id=$(random_hex 8)
+  start_time=$(now_iso)
+  start_ns=$(date +%s%N)
+  if "$@"; then
+    emit_span "$name" "$kind" "$span_id" "$stage_span_id" "$start_time" "$start_ns" "ok"
+  else
+    rc=$?
+    emit_span "$name" "$kind" "$span_id" "$stage_span_id" "$start_time" "$start_ns" "error"
+  fi
+  return $rc
+}
+
+# Ресурсы вызова одной записью, как invocation_metrics.py в Python-функциях.
+# /tmp живёт, пока жив контейнер, поэтому по метке в нём видно холодный старт.
+warm_marker="/tmp/.${SERVICE_NAME}-warm"
+cold=true
+[ -f "$warm_marker" ] && cold=false
+touch "$warm_marker"
+
+invocation_start_ns=$(date +%s%N)
+bytes_in=0
+bytes_out=0
+tmp_peak_bytes=0
+
+# utime + stime самого shell и дождавшихся его дочерних процессов (ffmpeg, yc, curl)
+cpu_ticks() {
+  awk '{print $14 + $15 + $16 + $17}' "/proc/$$/stat"
+}
+cpu_start_ticks=$(cpu_ticks)
+
+# Основной потребитель памяти — ffmpeg, поэтому пик берётся по cgroup контейнера,
+# а не по самому bash. Если счётчик пика удалось сбросить, он относится к этому вызову.
+memory_peak_file=""
+for f in /sys/fs/cgroup/memory.peak /sys/fs/cgroup/memory/memory.max_usage_in_bytes; do
+  if [ -r "$f" ]; then
+    memory_peak_file=$f
+    break
+  fi
+done
+peak_rss_per_invocation=false
+if [ -n "$memory_peak_file" ] && { echo 0 > "$memory_peak_file"; } 2>/dev/null; then
+  peak_rss_per_invocation=true
+fi
+
+memory_limit_mb() {
+  local limit=""
+  for f in /sys/fs/cgroup/memory.max /sys/fs/cgroup/memory/memory.limit_in_bytes; do
+    if [ -r "$f" ]; then
+      limit=$(cat "$f")
+      break
+    fi
+  done
+  # Без ограничения cgroup v1 отдаёт почти 2^63, v2 — "max"
+  if [[ "$limit" =~ ^[0-9]+$ ]] && (( limit < 1 << 40 )); then
+    echo $(( limit / 1024 / 1024 ))
+  else
+    echo null
+  fi
+}
+
+emit_invocation_metrics() {
+  local rc=$? peak_rss_bytes status_code=200
+  [ "$rc" -ne 0 ] && status_code=500
+  if [ -n "$memory_peak_file" ]; then
+    peak_rss_bytes=$(cat "$memory_peak_file")
+  else
+    peak_rss_bytes=$(( $(awk '/^VmHWM:/ {print $2}' "/proc/$$/status") * 1024 ))
+  fi
+  jq -nc --arg function "$SERVICE_NAME" --argjson cold "$cold" \
+    --argjson wall_ms "$(( ($(date +%s%N) - invocation_start_ns) / 1000000 ))" \
+    --argjson cpu_ms "$(( ($(cpu_ticks) - cpu_start_ticks) * 1000 / $(getconf CLK_TCK) ))" \
+    --argjson peak_rss_bytes "$peak_rss_bytes" --argjson peak_rss_per_invocation "$peak_rss_per_invocation" \
+    --argjson memory_limit_mb "$(memory_limit_mb)" --argjson tmp_bytes "$tmp_peak_bytes" \
+    --argjson bytes_in "$bytes_in" --argjson bytes_out "$bytes_out" --argjson status_code "$status_code" \
+    '{metric: "invocation", function: $function, cold: $cold, wall_ms: $wall_ms, cpu_ms: $cpu_ms,
+      peak_rss_bytes: $peak_rss_bytes, peak_rss_per_invocation: $peak_rss_per_invocation,
+      memory_limit_mb: $memory_limit_mb, tmp_bytes: $tmp_bytes,
+      bytes_in: $bytes_in, bytes_out: $bytes_out, status_code: $status_code}' >&2
+}
+trap emit_invocation_metrics EXIT
+
 input_json=$(cat)
 
-echo "$input_json" | jq -c '.messages[]' | while IFS= read -r message; do
+# Цикл в текущем shell, а не в подоболочке конвейера: счётчики байтов нужны после него
+while IFS= read -r message; do
  
   body=$(echo "$message" | jq -r '.details.message.body')
   task_id=$(echo "$body" | jq -r '.task_id')
   video_path=$(echo "$body" | jq -r '.object_name')
+  lane=$(echo "$body" | jq -r '.lane // "medium"')
+  case "$lane" in
+    short|medium|long) ;;
+    *) lane="medium" ;;
+  esac
+  queue_url_var="RECOGNIZE_SPEECH_QUEUE_URL_${lane^^}"
+  queue_url="${!queue_url_var}"
+
+  # Время в очереди для подбора порогов полос
+  sent_timestamp=$(echo "$message" | jq -r '.details.message.attributes.SentTimestamp // empty')
+  if [ -n "$sent_timestamp" ]; then
+    wait_ms=$(( $(date +%s%3N) - sent_timestamp ))
+    jq -nc --arg lane "$lane" --argjson wait_ms "$wait_ms" \
+      '{metric: "lane_queue_wait", stage: "extract-audio", lane: $lane, wait_seconds: ($wait_ms / 1000)}' >&2
+  fi
   
+  # Контекст трассировки приходит в атрибутах сообщения и уходит дальше в curl
+  incoming_traceparent=$(echo "$message" | jq -r '.details.message.message_attributes.traceparent.stringValue // empty')
+  if [[ "$incoming_traceparent" =~ ^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$ ]]; then
+    trace_id="${BASH_REMATCH[1]}"
+    parent_span_id="${BASH_REMATCH[2]}"
+  else
+    trace_id=$(random_hex 16)
+    parent_span_id=""
+  fi
+  stage_span_id=$(random_hex 8)
+  stage_start_ns=$(date +%s%N)
+  traceparent="00-${trace_id}-${stage_span_id}-01"
+
   video_file="/tmp/${task_id}.video"
   audio_file="/tmp/${task_id}.mp3"
   audio_path="audio/${task_id}"
-  notification_body=$(jq -nc --arg tid "$task_id" --arg obj "audio/$task_id" \
-    '{task_id: $tid, object_name: $obj}')
 
   echo "Processing task: $task_id" >&2
+  started_at=$(now_iso)
   echo "Downloading video: $video_path" >&2
 
-  yc storage s3api get-object \
+  run_span "s3.GetObject" "s3" yc storage s3api get-object \
     --bucket "$S3_BUCKET_NAME" \
     --key "$video_path" \
     "$video_file" >/dev/null
 
   echo "Extracting audio to MP3 format" >&2
   
-  ffmpeg -loglevel error -i "$video_file" -vn -acodec libmp3lame "$audio_file" >&2
+  run_span "ffmpeg.extract_audio" "ffmpeg" ffmpeg -loglevel error -i "$video_file" -vn -acodec libmp3lame "$audio_file" >&2
 
   echo "Uploading audio to: $audio_path" >&2
 
-  yc storage s3api put-object \
+  run_span "s3.PutObject" "s3" yc storage s3api put-object \
     --bucket "$S3_BUCKET_NAME" \
     --key "$audio_path" \
     --body "$audio_file" \
     --content-type "audio/mpeg" >/dev/null
 
+  finished_at=$(now_iso)
+  video_bytes=$(stat -c %s "$video_file")
+  audio_bytes=$(stat -c %s "$audio_file")
+  # Видео и аудио лежат в /tmp одновременно именно здесь
+  tmp_bytes=$(du -sb /tmp | cut -f1)
+  (( tmp_bytes > tmp_peak_bytes )) && tmp_peak_bytes=$tmp_bytes
+  bytes_in=$(( bytes_in + video_bytes ))
+  bytes_out=$(( bytes_out + audio_bytes ))
   rm -f "$video_file" "$audio_file"
 
-  curl \
+  # У bash-функции нет клиента YDB: тайминги этапа едут в сообщении,
+  # и recognize-speech записывает их в таблицу stage_events
+  notification_body=$(jq -nc --arg tid "$task_id" --arg obj "audio/$task_id" --arg lane "$lane" \
+    --arg started_at "$started_at" --arg finished_at "$finished_at" \
+    --argjson bytes_in "$video_bytes" --argjson bytes_out "$audio_bytes" \
+    '{task_id: $tid, object_name: $obj, lane: $lane,
+      stage_event: {stage: "extract-audio", started_at: $started_at, finished_at: $finished_at,
+                    bytes_in: $bytes_in, bytes_out: $bytes_out}}')
+
+  run_span "sqs.SendMessage" "sqs" curl \
     --request POST \
     --header 'Content-Type: application/x-www-form-urlencoded' \
     --data-urlencode 'Action=SendMessage' \
     --data-urlencode "MessageBody=$notification_body" \
-    --data-urlencode "QueueUrl=$RECOGNIZE_SPEECH_QUEUE_URL" \
+    --data-urlencode "QueueUrl=$queue_url" \
+    --data-urlencode 'MessageAttribute.1.Name=Source' \
+    --data-urlencode 'MessageAttribute.1.Value.DataType=String' \
+    --data-urlencode 'MessageAttribute.1.Value.StringValue=cloud-function' \
+    --data-urlencode 'MessageAttribute.2.Name=traceparent' \
+    --data-urlencode 'MessageAttribute.2.Value.DataType=String' \
+    --data-urlencode "MessageAttribute.2.Value.StringValue=$traceparent" \
     --user "$AWS_ACCESS_KEY_ID:$AWS_SECRET_ACCESS_KEY" \
     --aws-sigv4 'aws:amz:ru-central1:sqs' \
     https://message-queue.api.cloud.yandex.net/ >&2
 
+  emit_span "$SERVICE_NAME" "stage" "$stage_span_id" "$parent_span_id" "$started_at" "$stage_start_ns" "ok"
   echo "Completed processing task: $task_id" >&2
-done
+done < <(echo "$input_json" | jq -c '.messages[]')
 
 echo '{"statusCode": 200}'
\ No newline at end of file
@@ -4,4 +4,20 @@ class Config:
   def __init__(self):
     self.ydb_endpoint = os.environ["YDB_ENDPOINT"]
     self.ydb_database = os.environ["YDB_DATABASE"]
-    self.ydb_tasks_table_name = os.environ["YDB_TASKS_TABLE_NAME"]
\ No newline at end of file
+    self.ydb_tasks_table_name = os.environ["YDB_TASKS_TABLE_NAME"]
+    self.ydb_stage_events_table_name = os.environ["YDB_STAGE_EVENTS_TABLE_NAME"]
+    self.ydb_search_postings_table_name = os.environ["YDB_SEARCH_POSTINGS_TABLE_NAME"]
+    self.ydb_search_documents_table_name = os.environ["YDB_SEARCH_DOCUMENTS_TABLE_NAME"]
+
+
+_config = None
+
+# Конфиг собирается один раз на контейнер, .env есть только при локальном запуске
+def get_config() -> Config:
+  global _config
+  if _config is None:
+    if os.path.exists(".env"):
+      from dotenv import load_dotenv
+      load_dotenv(".env")
+    _config = Config()
+  return _config
@@ -1,14 +1,33 @@
 import json
+import math
+import time
 import logging
-import ydb
-from dotenv import load_dotenv
-from config import Config
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from config import Config, get_config
+from ydb_client import get_ydb_pool
+from search_text import tokenize
+from invocation_metrics import record_invocation_metrics
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+DEFAULT_WINDOW_HOURS = 24
+MAX_WINDOW_HOURS = 24 * 30
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_TERMS = 16
+# Отметок времени на лекцию в выдаче
+MAX_RESULT_TIMESTAMPS = 5
+# Параметры BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
 
 def get_tasks(config: Config) -> list[dict]:
+    import ydb
+
     driver_config = ydb.DriverConfig(
         config.ydb_endpoint, 
         config.ydb_database, 
@@ -23,7 +42,7 @@ def get_tasks(config: Config) -> list[dict]:
             with ydb.QuerySessionPool(driver) as pool:
                 result_sets = pool.execute_with_retries(
                     f"""
-                    SELECT created_at, task_id, lecture_title, video_url, status, description
+                    SELECT created_at, task_id, lecture_title, video_url, status, description, eta
                     FROM `{config.ydb_tasks_table_name}`
                     ORDER BY created_at DESC
                     """
@@ -37,7 +56,9 @@ def get_tasks(config: Config) -> list[dict]:
                         'lecture_name': row.lecture_title, 
                         'video_url': row.video_url, 
                         'status': row.status, 
-                        'description': row.description
+                        'description': row.description,
+                        # Наивное время UTC из YDB: без смещения браузер прочитал бы его как местное
+                        'eta': as_datetime(row.eta).isoformat() if row.eta else None
                     }
                     result.append(task)
                 return result
@@ -47,11 +68,170 @@ def get_tasks(config: Config) -> list[dict]:
             exit(1)
 
 
+def as_datetime(value) -> datetime:
+    if isinstance(value, int):
+        return datetime.fromtimestamp(value / 1_000_000, timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def get_task_timings(config: Config, task_id: str) -> list[dict]:
+    import ydb
+
+    logger.info(f"Getting stage events of task_id {task_id} from database")
+    result_sets = get_ydb_pool(config).execute_with_retries(
+        f"""
+        DECLARE $taskId AS Utf8;
+
+        SELECT stage, started_at, finished_at, duration_ms, status, lane, bytes_in, bytes_out
+        FROM `{config.ydb_stage_events_table_name}`
+        WHERE task_id = $taskId
+        ORDER BY started_at
+        """,
+        {
+            "$taskId": (task_id, ydb.PrimitiveType.Utf8),
+        }
+    )
+
+    result = []
+    previous_finished_at = None
+    for row in result_sets[0].rows:
+        started_at = as_datetime(row.started_at)
+        finished_at = as_datetime(row.finished_at)
+        # Разрыв с концом предыдущего этапа — время в очереди между этапами
+        wait_ms = None
+        if previous_finished_at is not None:
+            wait_ms = max((started_at - previous_finished_at).total_seconds() * 1000, 0)
+        result.append({
+            'stage': row.stage,
+            'started_at': started_at.isoformat(),
+            'finished_at': finished_at.isoformat(),
+            'duration_ms': row.duration_ms,
+            'wait_before_ms': wait_ms,
+            'status': row.status,
+            'lane': row.lane,
+            'bytes_in': row.bytes_in,
+            'bytes_out': row.bytes_out,
+        })
+        previous_finished_at = max(previous_finished_at or finished_at, finished_at)
+    return result
+
+
+def get_stage_latency(config: Config, window_hours: int) -> list[dict]:
+    import ydb
+
+    since = datetime.now(timezone.utc) - timedelta(hours=window_hours)
+    logger.info(f"Aggregating stage latency since {since.isoformat()}")
+    result_sets = get_ydb_pool(config).execute_with_retries(
+        f"""
+        DECLARE $since AS Timestamp;
+
+        SELECT
+            stage,
+            COUNT(*) AS count,
+            PERCENTILE(duration_ms, 0.5) AS p50_ms,
+            PERCENTILE(duration_ms, 0.95) AS p95_ms,
+            PERCENTILE(duration_ms, 0.99) AS p99_ms,
+            MAX(duration_ms) AS max_ms,
+            SUM(bytes_in) AS bytes_in,
+            SUM(bytes_out) AS bytes_out
+        FROM `{config.ydb_stage_events_table_name}`
+        WHERE finished_at >= $since AND status = 'ok'u
+        GROUP BY stage
+        ORDER BY p95_ms DESC
+        """,
+        {
+            "$since": (since, ydb.PrimitiveType.Timestamp),
+        }
+    )
+
+    return [
+        {
+            'stage': row.stage,
+            'count': row.count,
+            'p50_ms': row.p50_ms,
+            'p95_ms': row.p95_ms,
+            'p99_ms': row.p99_ms,
+            'max_ms': row.max_ms,
+            'bytes_in': row.bytes_in,
+            'bytes_out': row.bytes_out,
+        }
+        for row in result_sets[0].rows
+    ]
+
+
+# Постинги всех терминов запроса вместе с документами и статистика корпуса
+# читаются одним запросом, ранжирование BM25 — здесь. Постинги без строки
+# документа (лекция ещё индексируется) в выдачу не попадают.
+def search_lectures(config: Config, query: str, limit: int) -> tuple[list[str], list[dict]]:
+    import ydb
+
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return terms, []
+
+    logger.info(f"Searching lectures by terms {terms}")
+    result_sets = get_ydb_pool(config).execute_with_retries(
+        f"""
+        DECLARE $terms AS List<Utf8>;
+
+        SELECT p.term AS term, p.task_id AS task_id, p.tf AS tf, p.doc_length AS doc_length,
+               p.timestamps AS timestamps, d.lecture_title AS lecture_title, d.pdf_object_name AS pdf_object_name
+        FROM `{config.ydb_search_postings_table_name}` AS p
+        JOIN `{config.ydb_search_documents_table_name}` AS d ON d.task_id = p.task_id
+        WHERE p.term IN $terms;
+
+        SELECT COUNT(*) AS doc_count, SUM(length) AS total_length
+        FROM `{config.ydb_search_documents_table_name}`;
+        """,
+        {
+            "$terms": (terms, ydb.ListType(ydb.PrimitiveType.Utf8)),
+        }
+    )
+    # Большой результат приходит несколькими частями с одним индексом
+    rows = {}
+    for result_set in result_sets:
+        rows.setdefault(result_set.index, []).extend(result_set.rows)
+    postings, stats = rows.get(0, []), rows[1][0]
+    if not postings:
+        return terms, []
+
+    doc_count = stats.doc_count
+    avg_length = max(stats.total_length / doc_count, 1)
+    doc_freq = Counter(row.term for row in postings)
+
+    results = {}
+    for row in postings:
+        idf = math.log(1 + (doc_count - doc_freq[row.term] + 0.5) / (doc_freq[row.term] + 0.5))
+        norm = row.tf * (BM25_K1 + 1) / (row.tf + BM25_K1 * (1 - BM25_B + BM25_B * row.doc_length / avg_length))
+        result = results.get(row.task_id)
+        if result is None:
+            result = results[row.task_id] = {
+                'task_id': row.task_id,
+                'lecture_name': row.lecture_title,
+                'pdf_object_name': row.pdf_object_name,
+                'score': 0.0,
+                'matched_terms': [],
+                'timestamps_ms': set(),
+            }
+        result['score'] += idf * norm
+        result['matched_terms'].append(row.term)
+        if row.timestamps:
+            result['timestamps_ms'].update(json.loads(row.timestamps))
+
+    ranked = sorted(results.values(), key=lambda r: r['score'], reverse=True)[:limit]
+    for result in ranked:
+        result['score'] = round(result['score'], 4)
+        result['timestamps_ms'] = sorted(result['timestamps_ms'])[:MAX_RESULT_TIMESTAMPS]
+    return terms, ranked
+
+
+@record_invocation_metrics("fetch-ydb")
 def handler(event, context):
     try:
         logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
-        load_dotenv(".env")
-        config = Config()
+        config = get_config()
 
         tasks = get_tasks(config)
         body = json.dumps({'tasks': tasks}, ensure_ascii=False)
@@ -72,4 +252,96 @@ def handler(event, context):
                 'Content-Type': 'text/plain'
             },
             'body': f'Error occurred: {str(e)}'
-        }
\ No newline at end of file
+        }
+
+
+# GET /api/tasks/{task_id}/timings — разбивка одной задачи по этапам,
+# GET /api/stages/latency?window_hours=N — перцентили по этапам за окно
+@record_invocation_metrics("fetch-ydb-timings")
+def timings_handler(event, context):
+    try:
+        logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
+        config = get_config()
+
+        task_id = (event.get('pathParams') or {}).get('task_id')
+        if task_id:
+            body = {'task_id': task_id, 'stages': get_task_timings(config, task_id)}
+        else:
+            params = event.get('queryStringParameters') or {}
+            window_hours = params.get('window_hours', str(DEFAULT_WINDOW_HOURS))
+            if not window_hours.isdigit() or int(window_hours) == 0:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'text/plain'
+                    },
+                    'body': 'window_hours must be a positive integer'
+                }
+            window_hours = min(int(window_hours), MAX_WINDOW_HOURS)
+            body = {'window_hours': window_hours, 'stages': get_stage_latency(config, window_hours)}
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json'
+            },
+            'body': json.dumps(body, ensure_ascii=False)
+        }
+
+    except Exception as e:
+        logger.error(f"Error in handler: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'text/plain'
+            },
+            'body': f'Error occurred: {str(e)}'
+        }
+
+
+# GET /api/search?q=...&limit=N — поиск по названиям, резюме и расшифровкам лекций
+@record_invocation_metrics("fetch-ydb-search")
+def search_handler(event, context):
+    try:
+        logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
+        config = get_config()
+
+        params = event.get('queryStringParameters') or {}
+        query = params.get('q', '')
+        limit = params.get('limit', str(DEFAULT_SEARCH_LIMIT))
+        if not limit.isdigit() or int(limit) == 0:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'text/plain'
+                },
+                'body': 'limit must be a positive integer'
+            }
+        limit = min(int(limit), MAX_SEARCH_LIMIT)
+
+        started = time.perf_counter()
+        terms, results = search_lectures(config, query, limit)
+        body = {
+            'query': query,
+            'terms': terms,
+            'took_ms': round((time.perf_counter() - started) * 1000, 1),
+            'results': results,
+        }
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json'
+            },
+            'body': json.dumps(body, ensure_ascii=False)
+        }
+
+    except Exception as e:
+        logger.error(f"Error in handler: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'text/plain'
+            },
+            'body': f'Error occurred: {str(e)}'
+        }
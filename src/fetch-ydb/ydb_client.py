@@ -0,0 +1,28 @@
+import logging
+from config import Config
+
+logger = logging.getLogger()
+
+_ydb_pool = None
+
+# Один драйвер и пул сессий на контейнер вместо нового подключения на каждый запрос
+def get_ydb_pool(config: Config):
+    global _ydb_pool
+    if _ydb_pool is None:
+        import ydb
+
+        driver_config = ydb.DriverConfig(
+            config.ydb_endpoint, 
+            config.ydb_database, 
+            credentials=ydb.credentials_from_env_variables(),
+            root_certificates=ydb.load_ydb_root_certificate(),
+        )
+        driver = ydb.Driver(driver_config)
+        try:
+            driver.wait(timeout=5, fail_fast=True)
+        except TimeoutError:
+            logger.warning(f"Connect failed to YDB. Last reported errors by discovery: {driver.discovery_debug_details()}")
+            driver.stop()
+            raise
+        _ydb_pool = ydb.QuerySessionPool(driver)
+    return _ydb_pool
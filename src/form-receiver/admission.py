@@ -0,0 +1,217 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from config import Config
+from ydb_client import get_ydb_pool
+from tracing import instrument_boto_client, start_span
+
+logger = logging.getLogger()
+
+# Максимальная задержка сообщения в Message Queue
+MAX_DELAY_SECONDS = 900
+# Отказ без оценки пропускной способности: попробовать снова через столько секунд
+DEFAULT_RETRY_AFTER_SECONDS = 300
+QUEUE_ATTRIBUTE_WORKERS = 8
+
+DECISION_ADMIT = "admit"
+DECISION_DEFER = "defer"
+DECISION_REJECT = "reject"
+
+# Этапы конвейера: очереди этапа, событие stage_events, по числу которых
+# считается пропускная способность, и события, из которых складывается
+# время обработки одной лекции. Распознавание завершается событием speechkit:
+# операции SpeechKit ждут в speech-tasks/, а не в очереди.
+PIPELINE_STAGES = [
+    ("download", "download_queue_urls", "download", ("download",)),
+    ("extract-audio", "extract_audio_queue_urls", "extract-audio", ("extract-audio",)),
+    ("recognize-speech", "recognize_speech_queue_urls", "speechkit", ("recognize-speech", "speechkit")),
+    ("summary", "summary_queue_urls", "pdf", ("llm", "pdf")),
+]
+SPEECHKIT_STAGE = "recognize-speech"
+SPEECHKIT_TASKS_PREFIX = "speech-tasks/"
+
+_s3_client = None
+_load = None
+
+
+def get_s3_client(config: Config):
+    global _s3_client
+    if _s3_client is None:
+        import boto3.session
+
+        session = boto3.session.Session()
+        _s3_client = instrument_boto_client(session.client(
+            service_name='s3',
+            endpoint_url='https://storage.yandexcloud.net',
+            region_name='ru-central1',
+            aws_access_key_id=config.aws_access_key_id,
+            aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _s3_client
+
+
+class PipelineLoad:
+    def __init__(self, depths: dict[str, int], rates: dict[str, float], processing_seconds: float | None):
+        # Задачи, ждущие и выполняемые на каждом этапе
+        self.depths = depths
+        # Завершений в секунду по этапам, если они известны
+        self.rates = rates
+        # Медианное время обработки одной лекции без ожидания в очередях
+        self.processing_seconds = processing_seconds
+        self.fetched_at = time.monotonic()
+
+    @property
+    def backlog(self) -> int:
+        return sum(self.depths.values())
+
+    # Самый медленный этап определяет, как быстро рассасывается очередь
+    @property
+    def drain_rate(self) -> float | None:
+        return min(self.rates.values()) if self.rates else None
+
+    # Чтобы пройти этап, лекция ждёт всех, кто стоит на нём и на предыдущих этапах
+    def estimate_wait_seconds(self, position: int) -> float:
+        ahead = 0
+        wait = 0.0
+        for stage, _, _, _ in PIPELINE_STAGES:
+            ahead += self.depths.get(stage, 0)
+            rate = self.rates.get(stage)
+            if rate:
+                wait = max(wait, (ahead + position) / rate)
+        return wait
+
+    def seconds_to_drain(self, count: int) -> float | None:
+        rate = self.drain_rate
+        return count / rate if rate else None
+
+
+class AdmissionDecision:
+    def __init__(self, decision: str, backlog: int, delay_seconds: int = 0, retry_after: int | None = None):
+        self.decision = decision
+        self.backlog = backlog
+        self.delay_seconds = delay_seconds
+        self.retry_after = retry_after
+
+
+def get_queue_depth(sqs, queue_url: str) -> int:
+    response = sqs.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=[
+            'ApproximateNumberOfMessages',
+            'ApproximateNumberOfMessagesNotVisible',
+            'ApproximateNumberOfMessagesDelayed',
+        ]
+    )
+    return sum(int(value) for value in response.get('Attributes', {}).values())
+
+
+def get_speechkit_in_progress(config: Config) -> int:
+    response = get_s3_client(config).list_objects_v2(
+        Bucket=config.s3_bucket_name,
+        Prefix=SPEECHKIT_TASKS_PREFIX,
+        MaxKeys=1000,
+    )
+    return response.get('KeyCount', len(response.get('Contents', [])))
+
+
+def get_stage_stats(config: Config, since: datetime) -> dict[str, tuple[int, float]]:
+    import ydb
+
+    result_sets = get_ydb_pool(config).execute_with_retries(
+        f"""
+        DECLARE $since AS Timestamp;
+
+        SELECT stage, COUNT(*) AS count, PERCENTILE(duration_ms, 0.5) AS p50_ms
+        FROM `{config.ydb_stage_events_table_name}`
+        WHERE finished_at >= $since AND status = 'ok'u
+        GROUP BY stage
+        """,
+        {
+            "$since": (since, ydb.PrimitiveType.Timestamp),
+        }
+    )
+    return {row.stage: (row.count, row.p50_ms) for row in result_sets[0].rows}
+
+
+def fetch_pipeline_load(config: Config, sqs) -> PipelineLoad:
+    queues = [
+        (stage, queue_url)
+        for stage, urls_attribute, _, _ in PIPELINE_STAGES
+        for queue_url in getattr(config, urls_attribute).values()
+    ]
+    with start_span("admission.fetch_pipeline_load", "sqs", queues=len(queues)):
+        with ThreadPoolExecutor(max_workers=QUEUE_ATTRIBUTE_WORKERS) as executor:
+            speechkit_future = executor.submit(get_speechkit_in_progress, config)
+            queue_depths = list(executor.map(lambda q: get_queue_depth(sqs, q[1]), queues))
+            window = config.admission_throughput_window_seconds
+            stats = get_stage_stats(config, datetime.now(timezone.utc) - timedelta(seconds=window))
+            speechkit_in_progress = speechkit_future.result()
+
+    depths = {stage: 0 for stage, _, _, _ in PIPELINE_STAGES}
+    for (stage, _), depth in zip(queues, queue_depths):
+        depths[stage] += depth
+    depths[SPEECHKIT_STAGE] += speechkit_in_progress
+
+    rates = {}
+    processing_ms = 0.0
+    for stage, _, completion_event, events in PIPELINE_STAGES:
+        stage_ms = sum(stats[event][1] or 0 for event in events if event in stats)
+        processing_ms += stage_ms
+        # В спокойное время завершений мало, и их частота показывает спрос, а не
+        # возможности этапа: снизу её ограничивает один обработчик, работающий подряд
+        observed = stats[completion_event][0] / window if completion_event in stats else 0.0
+        serial = 1000 / stage_ms if stage_ms else 0.0
+        if observed or serial:
+            rates[stage] = max(observed, serial)
+
+    load = PipelineLoad(depths, rates, processing_ms / 1000 if stats else None)
+    logger.info(f"Pipeline load: depths {depths}, rates {({s: round(r, 4) for s, r in rates.items()})}, "
+                f"processing {load.processing_seconds}")
+    return load
+
+
+# Глубины и пропускная способность кэшируются на контейнер на несколько секунд:
+# при всплеске отправок не нужно опрашивать 12 очередей и YDB на каждую форму
+def get_pipeline_load(config: Config, sqs) -> PipelineLoad | None:
+    global _load
+    if _load is None or time.monotonic() - _load.fetched_at > config.admission_cache_seconds:
+        try:
+            _load = fetch_pipeline_load(config, sqs)
+        except Exception as e:
+            # Без данных о нагрузке формы принимаются как раньше
+            logger.warning(f"Failed to fetch pipeline load, admitting without backpressure: {str(e)}")
+            return None
+    return _load
+
+
+def decide(config: Config, load: PipelineLoad | None, count: int = 1) -> AdmissionDecision:
+    if load is None:
+        return AdmissionDecision(DECISION_ADMIT, 0)
+
+    projected = load.backlog + count
+    over_defer = projected - config.admission_defer_watermark
+    if projected > config.admission_reject_watermark:
+        drain_seconds = load.seconds_to_drain(over_defer)
+        retry_after = DEFAULT_RETRY_AFTER_SECONDS if drain_seconds is None else max(60, int(drain_seconds))
+        return AdmissionDecision(DECISION_REJECT, load.backlog, retry_after=retry_after)
+    if over_defer > 0:
+        # Сообщения откладываются, пока очередь не опустится до нижней отметки
+        drain_seconds = load.seconds_to_drain(over_defer)
+        delay = MAX_DELAY_SECONDS if drain_seconds is None else int(min(MAX_DELAY_SECONDS, drain_seconds))
+        return AdmissionDecision(DECISION_DEFER, load.backlog, delay_seconds=max(1, delay))
+    return AdmissionDecision(DECISION_ADMIT, load.backlog)
+
+
+def estimate_completion(load: PipelineLoad | None, decision: AdmissionDecision, position: int) -> datetime | None:
+    if load is None or load.processing_seconds is None:
+        return None
+    wait = max(load.estimate_wait_seconds(position), decision.delay_seconds)
+    return datetime.now(timezone.utc) + timedelta(seconds=wait + load.processing_seconds)
+
+
+# Принятые задачи учитываются в кэше сразу, чтобы следующие формы в этом же
+# контейнере не видели устаревшую глубину до обновления
+def record_admitted(load: PipelineLoad | None, count: int):
+    if load is not None:
+        load.depths[PIPELINE_STAGES[0][0]] += count
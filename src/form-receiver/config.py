@@ -1,10 +1,35 @@
 import os
+from lanes import get_lane_queue_urls
 
 class Config:
   def __init__(self):
     self.ydb_endpoint = os.environ["YDB_ENDPOINT"]
     self.ydb_database = os.environ["YDB_DATABASE"]
     self.ydb_tasks_table_name = os.environ["YDB_TASKS_TABLE_NAME"]
-    self.download_queue_url = os.environ["DOWNLOAD_QUEUE_URL"]
+    self.download_queue_urls = get_lane_queue_urls("DOWNLOAD_QUEUE_URL")
+    self.lane_short_max_bytes = int(os.environ.get("LANE_SHORT_MAX_BYTES", str(200 * 1024 * 1024)))
+    self.lane_medium_max_bytes = int(os.environ.get("LANE_MEDIUM_MAX_BYTES", str(1024 * 1024 * 1024)))
     self.aws_access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
-    self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
\ No newline at end of file
+    self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
+    self.s3_bucket_name = os.environ["S3_BUCKET_NAME"]
+    self.ydb_stage_events_table_name = os.environ["YDB_STAGE_EVENTS_TABLE_NAME"]
+    self.extract_audio_queue_urls = get_lane_queue_urls("EXTRACT_AUDIO_QUEUE_URL")
+    self.recognize_speech_queue_urls = get_lane_queue_urls("RECOGNIZE_SPEECH_QUEUE_URL")
+    self.summary_queue_urls = get_lane_queue_urls("SUMMARY_QUEUE_URL")
+    self.admission_defer_watermark = int(os.environ.get("ADMISSION_DEFER_WATERMARK", "200"))
+    self.admission_reject_watermark = int(os.environ.get("ADMISSION_REJECT_WATERMARK", "2000"))
+    self.admission_cache_seconds = float(os.environ.get("ADMISSION_CACHE_SECONDS", "5"))
+    self.admission_throughput_window_seconds = int(os.environ.get("ADMISSION_THROUGHPUT_WINDOW_SECONDS", "900"))
+
+
+_config = None
+
+# Конфиг собирается один раз на контейнер, .env есть только при локальном запуске
+def get_config() -> Config:
+  global _config
+  if _config is None:
+    if os.path.exists(".env"):
+      from dotenv import load_dotenv
+      load_dotenv(".env")
+    _config = Config()
+  return _config
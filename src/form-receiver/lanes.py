@@ -0,0 +1,18 @@
+import os
+
+LANES = ["short", "medium", "long"]
+DEFAULT_LANE = "medium"
+
+
+def get_lane_queue_urls(env_prefix: str) -> dict[str, str]:
+    return {lane: os.environ[f"{env_prefix}_{lane.upper()}"] for lane in LANES}
+
+
+def choose_lane(size_bytes: int | None, short_max_bytes: int, medium_max_bytes: int) -> str:
+    if size_bytes is None:
+        return DEFAULT_LANE
+    if size_bytes <= short_max_bytes:
+        return "short"
+    if size_bytes <= medium_max_bytes:
+        return "medium"
+    return "long"
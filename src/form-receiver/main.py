@@ -1,17 +1,42 @@
 import json
 import logging
-import boto3
-import boto3.session
-from urllib.parse import parse_qs
-import ydb
+from urllib.parse import parse_qs, urlencode
+from concurrent.futures import ThreadPoolExecutor
 import uuid
 import datetime
-from dotenv import load_dotenv
-from config import Config
+from config import Config, get_config
+from lanes import DEFAULT_LANE, choose_lane
+from ydb_client import get_ydb_pool
+from admission import DECISION_REJECT, decide, estimate_completion, get_pipeline_load, record_admitted
+from invocation_metrics import record_invocation_metrics
+from tracing import get_message_attributes, instrument_boto_client, new_traceparent, start_span, trace_invocation
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+MAX_BULK_TASKS = 1000
+SQS_BATCH_SIZE = 10
+SQS_BATCH_WORKERS = 8
+DISK_FOLDER_PAGE_SIZE = 200
+SERVICE_NAME = "form-receiver"
+
+_sqs_client = None
+
+def get_sqs_client(config: Config):
+    global _sqs_client
+    if _sqs_client is None:
+        import boto3.session
+
+        session = boto3.session.Session()
+        _sqs_client = instrument_boto_client(session.client(
+            service_name='sqs',
+            endpoint_url='https://message-queue.api.cloud.yandex.net',
+            region_name='ru-central1',
+            aws_access_key_id=config.aws_access_key_id,
+            aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _sqs_client
+
 def parse_request_body(event):
     body = event.get('body', '')
     is_base64 = event.get('isBase64Encoded', False)
@@ -32,81 +57,64 @@ def parse_request_body(event):
     return {}
 
 
-def add_task_to_db(config: Config, lecture_title: str, video_url: str) -> str:
+def add_task_to_db(config: Config, lecture_title: str, video_url: str, eta: datetime.datetime | None = None) -> str:
     logger.info(f"Saving to database")
 
     current_time = datetime.datetime.now(datetime.timezone.utc)
     id = uuid.uuid4()
 
-    driver_config = ydb.DriverConfig(
-        config.ydb_endpoint, 
-        config.ydb_database, 
-        credentials=ydb.credentials_from_env_variables(),
-        root_certificates=ydb.load_ydb_root_certificate(),
-    )
+    import ydb
+
+    with start_span("ydb.add_task_to_db", "ydb", table=config.ydb_tasks_table_name):
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            DECLARE $taskId AS Uuid;
+            DECLARE $createdAt As Timestamp;
+            DECLARE $lectureTitle AS Utf8;
+            DECLARE $videoUrl AS Utf8;
+            DECLARE $eta AS Timestamp?;
 
-    with ydb.Driver(driver_config) as driver:
-        try:
-            driver.wait(timeout=5)
-            with ydb.QuerySessionPool(driver) as pool:
-                pool.execute_with_retries(
-                    f"""
-                    DECLARE $taskId AS Uuid;
-                    DECLARE $createdAt As Timestamp;
-                    DECLARE $lectureTitle AS Utf8;
-                    DECLARE $videoUrl AS Utf8;
-
-                    UPSERT INTO `{config.ydb_tasks_table_name}` (
-                        created_at, task_id, lecture_title, video_url, status, description
-                    ) VALUES (
-                        $createdAt,
-                        $taskId,
-                        $lectureTitle,
-                        $videoUrl,
-                        'В очереди',
-                        NULL
-                    );
-                    """,
-                    {
-                        "$taskId": (id, ydb.PrimitiveType.UUID),
-                        "$createdAt": (current_time, ydb.PrimitiveType.Timestamp),
-                        "$lectureTitle": (lecture_title, ydb.PrimitiveType.Utf8),
-                        "$videoUrl": (video_url, ydb.PrimitiveType.Utf8),
-                    }
-                )
-        except TimeoutError:
-            logger.warning(f"Connect failed to YDB. Last reported errors by discovery: {driver.discovery_debug_details()}")
-            exit(1)
+            UPSERT INTO `{config.ydb_tasks_table_name}` (
+                created_at, task_id, lecture_title, video_url, status, description, eta
+            ) VALUES (
+                $createdAt,
+                $taskId,
+                $lectureTitle,
+                $videoUrl,
+                'В очереди',
+                NULL,
+                $eta
+            );
+            """,
+            {
+                "$taskId": (id, ydb.PrimitiveType.UUID),
+                "$createdAt": (current_time, ydb.PrimitiveType.Timestamp),
+                "$lectureTitle": (lecture_title, ydb.PrimitiveType.Utf8),
+                "$videoUrl": (video_url, ydb.PrimitiveType.Utf8),
+                "$eta": (eta, ydb.OptionalType(ydb.PrimitiveType.Timestamp)),
+            }
+        )
     return str(id)
 
 
-def send_message(config: Config, task_id: str, video_url: str):
-    logger.info(f"Sending message to queue: {config.download_queue_url}")
+def send_message(config: Config, task_id: str, video_url: str, delay_seconds: int = 0):
+    # Размер видео здесь неизвестен, полосу для следующих этапов выберет download
+    queue_url = config.download_queue_urls[DEFAULT_LANE]
+    logger.info(f"Sending message to queue: {queue_url}")
         
     message_body = json.dumps({
             'task_id': task_id,
-            'video_url': video_url
+            'video_url': video_url,
+            'lane': DEFAULT_LANE
         }, ensure_ascii=False)
         
     try:
-        session = boto3.session.Session()
-        sqs = session.client(
-            service_name='sqs',
-            endpoint_url='https://message-queue.api.cloud.yandex.net',
-            region_name='ru-central1',
-            aws_access_key_id=config.aws_access_key_id,
-            aws_secret_access_key=config.aws_secret_access_key,
-        )
-
+        sqs = get_sqs_client(config)
         response = sqs.send_message(
-                QueueUrl=config.download_queue_url,
+                QueueUrl=queue_url,
                 MessageBody=message_body,
-                MessageAttributes={
-                    'Source': {
-                        'StringValue': 'cloud-function',
-                        'DataType': 'String'
-                    }
-                }
+                DelaySeconds=delay_seconds,
+                MessageAttributes=get_message_attributes()
             )
             
         logger.info(f"Message sent successfully. MessageId: {response.get('MessageId', 'Unknown')}")
@@ -115,21 +123,336 @@ def send_message(config: Config, task_id: str, video_url: str):
         logger.error(f"Failed to send message to queue: {str(e)}")
 
 
+def parse_bulk_request_body(event) -> dict:
+    body = event.get('body', '')
+    if event.get('isBase64Encoded', False) and body:
+        import base64
+        body = base64.b64decode(body).decode('utf-8')
+
+    try:
+        return json.loads(body or '{}')
+    except ValueError:
+        # Форма: ссылки построчно в yandex-links, папка в yandex-folder
+        form = parse_request_body({'body': body})
+        return {
+            'lecture_title': form.get('lecture-title', ''),
+            'links': [l.strip() for l in form.get('yandex-links', '').splitlines() if l.strip()],
+            'folder_url': form.get('yandex-folder', ''),
+        }
+
+
+def list_public_folder_videos(folder_url: str) -> list[dict]:
+    import urllib.request
+
+    api_url = "https://cloud-api.yandex.net/v1/disk/public/resources"
+    videos = []
+    offset = 0
+    while True:
+        params = urlencode({
+            'public_key': folder_url,
+            'limit': DISK_FOLDER_PAGE_SIZE,
+            'offset': offset,
+            'sort': 'name',
+        })
+        request = urllib.request.Request(f"{api_url}?{params}", headers={'Accept': 'application/json'})
+        with start_span("disk.list_public_folder", "disk", offset=offset):
+            with urllib.request.urlopen(request, timeout=10) as response:
+                data = json.loads(response.read().decode('utf-8'))
+
+        if data.get('type') != 'dir':
+            raise ValueError("Ссылка не ведет к публичной папке в Яндекс.Диск")
+
+        items = data.get('_embedded', {}).get('items', [])
+        for item in items:
+            if item.get('type') == 'file' and item.get('mime_type', '').startswith('video/'):
+                videos.append({'name': item['name'], 'path': item['path'], 'size': item.get('size')})
+
+        offset += len(items)
+        if not items or offset >= data['_embedded'].get('total', 0):
+            break
+
+    logger.info(f"Found {len(videos)} videos in folder {folder_url}")
+    return videos
+
+
+def expand_bulk_request(config: Config, request_data: dict) -> list[dict]:
+    lecture_title = request_data.get('lecture_title', '')
+    tasks = []
+
+    links = request_data.get('links', [])
+    # Строка в JSON иначе разошлась бы на задачи по одному символу
+    if not isinstance(links, list) or not all(isinstance(link, str) for link in links):
+        raise ValueError("links must be a list of strings")
+    for i, link in enumerate(links):
+        title = lecture_title if len(links) == 1 else f"{lecture_title} ({i + 1})".strip()
+        tasks.append({'lecture_title': title, 'video_url': link, 'video_path': None, 'lane': DEFAULT_LANE})
+
+    folder_url = request_data.get('folder_url')
+    if folder_url:
+        for video in list_public_folder_videos(folder_url):
+            name = video['name'].rsplit('.', 1)[0]
+            title = f"{lecture_title}: {name}" if lecture_title else name
+            lane = choose_lane(video['size'], config.lane_short_max_bytes, config.lane_medium_max_bytes)
+            tasks.append({'lecture_title': title, 'video_url': folder_url, 'video_path': video['path'], 'lane': lane})
+
+    return tasks
+
+
+def add_tasks_to_db(config: Config, tasks: list[dict]) -> list[str]:
+    logger.info(f"Saving {len(tasks)} tasks to database")
+
+    import ydb
+
+    current_time = datetime.datetime.now(datetime.timezone.utc)
+    rows = []
+    for task in tasks:
+        task['task_id'] = str(uuid.uuid4())
+        # У каждой лекции своя трассировка, иначе критический путь одной лекции
+        # потеряется среди всей пачки
+        task['traceparent'] = new_traceparent()
+        rows.append({
+            'task_id': uuid.UUID(task['task_id']),
+            'created_at': current_time,
+            'lecture_title': task['lecture_title'],
+            'video_url': task['video_url'],
+            'video_path': task['video_path'],
+            'eta': task.get('eta'),
+        })
+
+    row_type = (
+        ydb.StructType()
+        .add_member('task_id', ydb.PrimitiveType.UUID)
+        .add_member('created_at', ydb.PrimitiveType.Timestamp)
+        .add_member('lecture_title', ydb.PrimitiveType.Utf8)
+        .add_member('video_url', ydb.PrimitiveType.Utf8)
+        .add_member('video_path', ydb.OptionalType(ydb.PrimitiveType.Utf8))
+        .add_member('eta', ydb.OptionalType(ydb.PrimitiveType.Timestamp))
+    )
+
+    with start_span("ydb.add_tasks_to_db", "ydb", table=config.ydb_tasks_table_name, rows=len(rows)):
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            DECLARE $tasks AS List<Struct<
+                task_id: Uuid,
+                created_at: Timestamp,
+                lecture_title: Utf8,
+                video_url: Utf8,
+                video_path: Utf8?,
+                eta: Timestamp?
+            >>;
+
+            UPSERT INTO `{config.ydb_tasks_table_name}` (
+                created_at, task_id, lecture_title, video_url, video_path, eta, status, description
+            )
+            SELECT
+                created_at, task_id, lecture_title, video_url, video_path, eta,
+                'В очереди'u AS status, NULL AS description
+            FROM AS_TABLE($tasks);
+            """,
+            {
+                "$tasks": (rows, ydb.ListType(row_type)),
+            }
+        )
+    return [task['task_id'] for task in tasks]
+
+
+def send_message_batch(config: Config, queue_url: str, tasks: list[dict]) -> list[str]:
+    sqs = get_sqs_client(config)
+    entries = []
+    for i, task in enumerate(tasks):
+        message = {'task_id': task['task_id'], 'video_url': task['video_url'], 'lane': task['lane']}
+        if task['video_path']:
+            message['video_path'] = task['video_path']
+        entries.append({
+            'Id': str(i),
+            'MessageBody': json.dumps(message, ensure_ascii=False),
+            'DelaySeconds': task.get('delay_seconds', 0),
+            'MessageAttributes': get_message_attributes(task['traceparent'])
+        })
+
+    # Ошибка пачки (троттлинг, сеть) не должна ронять весь запрос: задачи
+    # пачки считаются неотправленными
+    try:
+        response = sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+        failed = response.get('Failed', [])
+        if failed:
+            # Повторяем один раз только неотправленные сообщения
+            failed_ids = {f['Id'] for f in failed}
+            retry = [e for e in entries if e['Id'] in failed_ids]
+            response = sqs.send_message_batch(QueueUrl=queue_url, Entries=retry)
+            failed = response.get('Failed', [])
+            for f in failed:
+                logger.error(f"Failed to send message for task {tasks[int(f['Id'])]['task_id']}: {f.get('Message')}")
+    except Exception as e:
+        logger.error(f"Failed to send batch of {len(tasks)} messages to {queue_url}: {str(e)}")
+        return [task['task_id'] for task in tasks]
+
+    return [tasks[int(f['Id'])]['task_id'] for f in failed]
+
+
+def mark_tasks_failed(config: Config, task_ids: list[str], description: str):
+    logger.info(f"Marking {len(task_ids)} unsent tasks as failed")
+
+    import ydb
+
+    with start_span("ydb.mark_tasks_failed", "ydb", table=config.ydb_tasks_table_name, rows=len(task_ids)):
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            DECLARE $taskIds AS List<Uuid>;
+            DECLARE $description AS Utf8;
+
+            UPDATE `{config.ydb_tasks_table_name}`
+            SET status = 'Ошибка'u, description = $description
+            WHERE task_id IN $taskIds;
+            """,
+            {
+                "$taskIds": ([uuid.UUID(t) for t in task_ids], ydb.ListType(ydb.PrimitiveType.UUID)),
+                "$description": (description, ydb.PrimitiveType.Utf8),
+            }
+        )
+
+
+def send_messages(config: Config, tasks: list[dict]) -> list[str]:
+    logger.info(f"Sending {len(tasks)} messages to download queues")
+
+    batches = []
+    for lane, queue_url in config.download_queue_urls.items():
+        lane_tasks = [task for task in tasks if task['lane'] == lane]
+        for i in range(0, len(lane_tasks), SQS_BATCH_SIZE):
+            batches.append((queue_url, lane_tasks[i:i + SQS_BATCH_SIZE]))
+
+    with ThreadPoolExecutor(max_workers=SQS_BATCH_WORKERS) as executor:
+        failed = [task_id for batch_failed in executor.map(lambda batch: send_message_batch(config, *batch), batches)
+                  for task_id in batch_failed]
+
+    logger.info(f"Sent {len(tasks) - len(failed)} of {len(tasks)} messages")
+    return failed
+
+
+def overloaded_response(decision) -> dict:
+    minutes = max(1, round(decision.retry_after / 60))
+    return {
+        'statusCode': 503,
+        'headers': {
+            'Content-Type': 'text/plain',
+            'Retry-After': str(decision.retry_after)
+        },
+        'body': f'Сервис перегружен: в очередях {decision.backlog} задач. Попробуйте через {minutes} мин.'
+    }
+
+
+@record_invocation_metrics("form-receiver-bulk")
+def bulk_handler(event, context):
+    try:
+        logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
+        config = get_config()
+
+        with trace_invocation(f"{SERVICE_NAME}-bulk") as span:
+            request_data = parse_bulk_request_body(event)
+            try:
+                tasks = expand_bulk_request(config, request_data)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'text/plain'
+                    },
+                    'body': str(e)
+                }
+            span.attributes['tasks'] = len(tasks)
+
+            if not tasks:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'text/plain'
+                    },
+                    'body': 'No video links or videos in folder found'
+                }
+            if len(tasks) > MAX_BULK_TASKS:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'text/plain'
+                    },
+                    'body': f'Too many videos: {len(tasks)}, maximum is {MAX_BULK_TASKS}'
+                }
+
+            load = get_pipeline_load(config, get_sqs_client(config))
+            decision = decide(config, load, len(tasks))
+            span.attributes['admission'] = decision.decision
+            if decision.decision == DECISION_REJECT:
+                return overloaded_response(decision)
+
+            for i, task in enumerate(tasks):
+                task['delay_seconds'] = decision.delay_seconds
+                task['eta'] = estimate_completion(load, decision, i + 1)
+
+            task_ids = add_tasks_to_db(config, tasks)
+            failed_task_ids = send_messages(config, tasks)
+            if failed_task_ids:
+                # Без сообщения в очереди строка навсегда осталась бы «В очереди»
+                mark_tasks_failed(config, failed_task_ids, "Не удалось поставить задачу в очередь, отправьте её снова")
+                failed = set(failed_task_ids)
+                task_ids = [task_id for task_id in task_ids if task_id not in failed]
+            record_admitted(load, len(task_ids))
+
+        eta = tasks[-1]['eta']
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json'
+            },
+            'body': json.dumps({
+                'task_ids': task_ids,
+                'queued': len(task_ids),
+                'failed_task_ids': failed_task_ids,
+                'admission': decision.decision,
+                'delay_seconds': decision.delay_seconds,
+                'eta': eta.isoformat() if eta else None,
+            }, ensure_ascii=False)
+        }
+
+    except Exception as e:
+        logger.error(f"Error in bulk handler: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'text/plain'
+            },
+            'body': f'Error occurred: {str(e)}'
+        }
+
+
+@record_invocation_metrics("form-receiver")
 def handler(event, context):
     try:
         logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
-        load_dotenv(".env")
-        config = Config()
+        config = get_config()
         
         request_data = parse_request_body(event)
         lecture_title = request_data.get('lecture-title', '')
         video_url = request_data.get('yandex-link', '')
         
         logger.info(f"Received data: lecture_title={lecture_title}, video_url={video_url}")
-          
-        task_id = add_task_to_db(config, lecture_title, video_url)
 
-        send_message(config, task_id, video_url)
+        # Здесь начинается трассировка лекции, дальше контекст идёт в атрибутах сообщений
+        with trace_invocation(SERVICE_NAME) as span:
+            load = get_pipeline_load(config, get_sqs_client(config))
+            decision = decide(config, load)
+            span.attributes['admission'] = decision.decision
+            if decision.decision == DECISION_REJECT:
+                logger.warning(f"Rejected submission: backlog {decision.backlog}, retry after {decision.retry_after}s")
+                return overloaded_response(decision)
+
+            eta = estimate_completion(load, decision, 1)
+            task_id = add_task_to_db(config, lecture_title, video_url, eta)
+            span.attributes['task_id'] = task_id
+
+            send_message(config, task_id, video_url, decision.delay_seconds)
+            record_admitted(load, 1)
+            logger.info(f"Admission {decision.decision} for task_id {task_id}: backlog {decision.backlog}, "
+                        f"delay {decision.delay_seconds}s, eta {eta}")
 
         return {
             'statusCode': 302,
@@ -1,4 +1,5 @@
 import os
+from lanes import get_lane_queue_urls
 
 class Config:
   def __init__(self):
@@ -6,4 +7,21 @@ class Config:
     self.s3_bucket_name = os.environ["S3_BUCKET_NAME"]
     self.aws_access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
     self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
-    self.summary_queue_url = os.environ["SUMMARY_QUEUE_URL"]
\ No newline at end of file
+    self.summary_queue_urls = get_lane_queue_urls("SUMMARY_QUEUE_URL")
+    self.artifact_encoding = os.environ.get("ARTIFACT_ENCODING", "zstd")
+    self.ydb_endpoint = os.environ["YDB_ENDPOINT"]
+    self.ydb_database = os.environ["YDB_DATABASE"]
+    self.ydb_stage_events_table_name = os.environ["YDB_STAGE_EVENTS_TABLE_NAME"]
+
+
+_config = None
+
+# Конфиг собирается один раз на контейнер, .env есть только при локальном запуске
+def get_config() -> Config:
+  global _config
+  if _config is None:
+    if os.path.exists(".env"):
+      from dotenv import load_dotenv
+      load_dotenv(".env")
+    _config = Config()
+  return _config
@@ -0,0 +1,110 @@
+import functools
+import json
+import logging
+import os
+import resource
+import time
+
+logger = logging.getLogger()
+
+TMP_DIR = "/tmp"
+PROC_STATUS = "/proc/self/status"
+# Запись "5" сбрасывает VmHWM, так пик RSS считается для одного вызова, а не для всего контейнера
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+# Модуль импортируется один раз на контейнер: первый вызов после импорта — холодный
+_cold = True
+_bytes_in = 0
+_bytes_out = 0
+
+
+def add_bytes_in(count: int | None):
+    global _bytes_in
+    _bytes_in += count or 0
+
+
+def add_bytes_out(count: int | None):
+    global _bytes_out
+    _bytes_out += count or 0
+
+
+def reset_peak_rss() -> bool:
+    try:
+        with open(PROC_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_peak_rss_bytes() -> int:
+    try:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss в килобайтах на Linux, это пик за всю жизнь процесса
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_tmp_bytes() -> int:
+    total = 0
+    for root, _, files in os.walk(TMP_DIR):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def get_response_size(response) -> int:
+    if isinstance(response, dict):
+        body = response.get('body')
+        if isinstance(body, str):
+            return len(body.encode("utf-8"))
+    return 0
+
+
+# Одна запись с ресурсами на вызов, из логов её собирает src/_rightsizing
+def record_invocation_metrics(function_name: str):
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _cold, _bytes_in, _bytes_out
+
+            cold = _cold
+            _cold = False
+            _bytes_in = len(json.dumps(event, ensure_ascii=False).encode("utf-8"))
+            _bytes_out = 0
+            peak_is_per_invocation = reset_peak_rss()
+            tmp_before = get_tmp_bytes()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+
+            response = None
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                add_bytes_out(get_response_size(response))
+                tmp_after = get_tmp_bytes()
+                record = {
+                    "metric": "invocation",
+                    "function": function_name,
+                    "cold": cold,
+                    "wall_ms": round((time.perf_counter() - wall_start) * 1000, 1),
+                    "cpu_ms": round((time.process_time() - cpu_start) * 1000, 1),
+                    "peak_rss_bytes": get_peak_rss_bytes(),
+                    "peak_rss_per_invocation": peak_is_per_invocation,
+                    "memory_limit_mb": getattr(context, "memory_limit_in_mb", None),
+                    "tmp_bytes": max(tmp_before, tmp_after),
+                    "bytes_in": _bytes_in,
+                    "bytes_out": _bytes_out,
+                    "status_code": response.get('statusCode') if isinstance(response, dict) else None,
+                }
+                logger.info(json.dumps(record))
+        return wrapper
+    return decorator
@@ -0,0 +1,16 @@
+import os
+
+LANES = ["short", "medium", "long"]
+DEFAULT_LANE = "medium"
+# Вес полосы: короткие задачи дольше ждут токен у лимитера и раньше
+# возвращаются после отсрочки, длинные уступают им при нехватке квоты
+LANE_WEIGHTS = {"short": 3, "medium": 2, "long": 1}
+
+
+def get_lane(body: dict) -> str:
+    lane = body.get("lane")
+    return lane if lane in LANES else DEFAULT_LANE
+
+
+def get_lane_queue_urls(env_prefix: str) -> dict[str, str]:
+    return {lane: os.environ[f"{env_prefix}_{lane.upper()}"] for lane in LANES}
@@ -1,30 +1,89 @@
 import json
 import logging
-import boto3
-import boto3.session
-import requests
-from dotenv import load_dotenv
-from config import Config
+from datetime import datetime, timezone
+from config import Config, get_config
+from lanes import get_lane
+from artifacts import get_json_artifact, put_json_artifact
+from stage_events import parse_event_time, record_stage_event
+from invocation_metrics import add_bytes_in, add_bytes_out, record_invocation_metrics
+from tracing import get_message_attributes, instrument_boto_client, start_span, trace_invocation
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+SERVICE_NAME = "recognize-speech-cron"
+
+# Время от запуска распознавания до готового результата: очередь и работа SpeechKit
+SPEECHKIT_STAGE_NAME = "speechkit"
+
 _s3_client = None
 
 def get_s3_client(config: Config):
     global _s3_client
     if _s3_client is None:
-        _s3_client = boto3.client(
+        import boto3
+
+        _s3_client = instrument_boto_client(boto3.client(
             's3',
             endpoint_url='https://storage.yandexcloud.net',
             region_name='ru-central1',
             aws_access_key_id=config.aws_access_key_id,
             aws_secret_access_key=config.aws_secret_access_key,
-        )
+        ))
     return _s3_client
 
+_sqs_client = None
+
+def get_sqs_client(config: Config):
+    global _sqs_client
+    if _sqs_client is None:
+        import boto3.session
+
+        session = boto3.session.Session()
+        _sqs_client = instrument_boto_client(session.client(
+            service_name='sqs',
+            endpoint_url='https://message-queue.api.cloud.yandex.net',
+            region_name='ru-central1',
+            aws_access_key_id=config.aws_access_key_id,
+            aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _sqs_client
+
+
+# Итоговые фрагменты речи с отметками времени, для поискового индекса.
+# finalRefinement — нормализованный текст фрагмента (числа, пунктуация),
+# он заменяет final с тем же finalIndex
+def parse_transcript(lines: list[str]) -> list[dict]:
+    finals = {}
+    refinements = {}
+    for i, line in enumerate(lines):
+        if '"final"' not in line and '"finalRefinement"' not in line:
+            continue
+        result = json.loads(line).get('result', {})
+        if 'finalRefinement' in result:
+            refinement = result['finalRefinement']
+            alternatives = refinement.get('normalizedText', {}).get('alternatives', [])
+            target, key = refinements, (result.get('channelTag'), refinement.get('finalIndex'))
+        elif 'final' in result:
+            alternatives = result['final'].get('alternatives', [])
+            final_index = result.get('audioCursors', {}).get('finalIndex', str(i))
+            target, key = finals, (result.get('channelTag'), final_index)
+        else:
+            continue
+        if alternatives and alternatives[0].get('text'):
+            alternative = alternatives[0]
+            target[key] = {
+                "start_ms": int(alternative.get('startTimeMs', 0)),
+                "end_ms": int(alternative.get('endTimeMs', 0)),
+                "text": alternative['text'],
+            }
+    finals.update(refinements)
+    return sorted(finals.values(), key=lambda utterance: utterance['start_ms'])
+
+
+def check_recognition_status(config: Config, operation_id: str) -> tuple[bool, dict, list[dict] | None]:
+    import requests
 
-def check_recognition_status(config: Config, operation_id: str) -> tuple[bool, dict]:
     logger.info(f"Checking status for operation ID: {operation_id}")
     
     headers = {
@@ -38,12 +97,16 @@ def check_recognition_status(config: Config, operation_id: str) -> tuple[bool, d
     url = f"https://stt.api.cloud.yandex.net/stt/v3/getRecognition"
     
     try:
-        response = requests.get(url, params=params, headers=headers)
-        if response.status_code == 404:
-            return (False, response.json())
-        
-        # Почему-то ответ с несколькими JSON-объектами приходит, только в последней строке есть резюме распознавания
-        return (True, json.loads(response.text.splitlines()[-1]))
+        with start_span("speechkit.get_recognition", "speechkit") as span:
+            response = requests.get(url, params=params, headers=headers)
+            span.attributes['http_status'] = response.status_code
+            add_bytes_in(len(response.content))
+            if response.status_code == 404:
+                return (False, response.json(), None)
+            
+            # Почему-то ответ с несколькими JSON-объектами приходит, только в последней строке есть резюме распознавания
+            lines = response.text.splitlines()
+            return (True, json.loads(lines[-1]), parse_transcript(lines))
     
     except Exception as e:
         logger.error(f"Failed to check recognition status: {str(e)}")
@@ -55,12 +118,7 @@ def save_recognition_result(config: Config, task_id: str, result_data: dict) ->
     object_key = f"speech/{task_id}"
     
     try:
-        s3_client.put_object(
-            Bucket=config.s3_bucket_name,
-            Key=object_key,
-            Body=json.dumps(result_data, ensure_ascii=False),
-            ContentType='application/json'
-        )
+        add_bytes_out(put_json_artifact(s3_client, config.s3_bucket_name, object_key, result_data, config.artifact_encoding))
         logger.info(f"Recognition result saved to {object_key}")
         return object_key
     except Exception as e:
@@ -68,28 +126,30 @@ def save_recognition_result(config: Config, task_id: str, result_data: dict) ->
         raise
 
 
+def save_transcript(config: Config, task_id: str, utterances: list[dict]) -> str:
+    s3_client = get_s3_client(config)
+    object_key = f"transcript/{task_id}"
+
+    try:
+        add_bytes_out(put_json_artifact(s3_client, config.s3_bucket_name, object_key,
+                                        {"utterances": utterances}, config.artifact_encoding))
+        logger.info(f"Transcript with {len(utterances)} utterances saved to {object_key}")
+        return object_key
+    except Exception as e:
+        logger.error(f"Failed to save transcript: {str(e)}")
+        raise
+
+
 def send_message_to_queue(config: Config, queue_url: str, message_body: str):
     logger.info(f"Sending message to queue: {queue_url}")
 
     try:
-        session = boto3.session.Session()
-        sqs = session.client(
-            service_name='sqs',
-            endpoint_url='https://message-queue.api.cloud.yandex.net',
-            region_name='ru-central1',
-            aws_access_key_id=config.aws_access_key_id,
-            aws_secret_access_key=config.aws_secret_access_key,
-        )
+        sqs = get_sqs_client(config)
             
         response = sqs.send_message(
                 QueueUrl=queue_url,
                 MessageBody=message_body,
-                MessageAttributes={
-                    'Source': {
-                        'StringValue': 'cloud-function',
-                        'DataType': 'String'
-                    }
-                }
+                MessageAttributes=get_message_attributes()
             )
             
         logger.info(f"Message sent successfully. MessageId: {response.get('MessageId', 'Unknown')}")
@@ -118,33 +178,40 @@ def check_completed_tasks(config: Config):
             
             try:
                 # Читаем информацию о задаче
-                task_obj = s3_client.get_object(Bucket=config.s3_bucket_name, Key=task_key)
-                task_info = json.loads(task_obj['Body'].read().decode('utf-8'))
+                task_info = get_json_artifact(s3_client, config.s3_bucket_name, task_key)
                 
-                # Проверяем статус операции
-                ok, resp = check_recognition_status(config, task_info['operation_id'])
+                with trace_invocation(SERVICE_NAME, task_info.get('traceparent'), task_id=task_id):
+                    # Проверяем статус операции
+                    ok, resp, utterances = check_recognition_status(config, task_info['operation_id'])
                 
-                if ok:
-                    logger.info(f"Task {task_id} completed")
-
-                    object_name = save_recognition_result(
-                        config, 
-                        task_id, 
-                        json.loads(resp['result']['summarization']['results'][0]['response']))
-                    message = json.dumps({
-                        "task_id": task_id,
-                        "object_name": object_name
-                    })
+                    if ok:
+                        logger.info(f"Task {task_id} completed")
+
+                        object_name = save_recognition_result(
+                            config, 
+                            task_id, 
+                            json.loads(resp['result']['summarization']['results'][0]['response']))
+                        transcript_object_name = save_transcript(config, task_id, utterances)
+                        lane = get_lane(task_info)
+                        record_stage_event(config, task_id, SPEECHKIT_STAGE_NAME,
+                                           parse_event_time(task_info['created_at']), datetime.now(timezone.utc),
+                                           lane=lane)
+                        message = json.dumps({
+                            "task_id": task_id,
+                            "object_name": object_name,
+                            "transcript_object_name": transcript_object_name,
+                            "lane": lane
+                        })
                     
-                    send_message_to_queue(config, config.summary_queue_url, message)
+                        send_message_to_queue(config, config.summary_queue_urls[lane], message)
                     
-                    s3_client.delete_object(
-                        Bucket=config.s3_bucket_name,
-                        Key=task_key
-                    )
-                    logger.info(f"Task {task_id} processed and removed from active tasks")
-                else:
-                    logger.info(f"Text is not ready yet: {resp['error']['message']}")        
+                        s3_client.delete_object(
+                            Bucket=config.s3_bucket_name,
+                            Key=task_key
+                        )
+                        logger.info(f"Task {task_id} processed and removed from active tasks")
+                    else:
+                        logger.info(f"Text is not ready yet: {resp['error']['message']}")        
                     
             except Exception as e:
                 logger.error(f"Error processing task {task_id}: {str(e)}")
@@ -155,15 +222,16 @@ def check_completed_tasks(config: Config):
         raise
 
 
+@record_invocation_metrics("recognize-speech-cron")
 def handler(event, context):
     try:
         logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
-        load_dotenv(".env")
-        config = Config()
+        config = get_config()
 
         logger.info(f"Checking completed tasks")
         
-        check_completed_tasks(config)
+        with trace_invocation(SERVICE_NAME):
+            check_completed_tasks(config)
         
         return {'statusCode': 200}
         
@@ -176,6 +244,3 @@ def handler(event, context):
             },
             'body': f'Error occurred: {str(e)}'
         }
-    
-handler({'messages':[
-    {'details': {'message': {'body': '{\"object_name\": \"audio/829f2916-a98c-4003-9487-83aed1a2a72e\", \"task_id\": \"829f2916-a98c-4003-9487-83aed1a2a72e\"}'}}}]}, {})
\ No newline at end of file
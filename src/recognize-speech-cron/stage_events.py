@@ -0,0 +1,83 @@
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from config import Config
+from ydb_client import get_ydb_pool
+
+logger = logging.getLogger()
+
+EVENT_STATUS_OK = "ok"
+EVENT_STATUS_ERROR = "error"
+
+
+class StageEvent:
+    def __init__(self, lane: str | None):
+        self.lane = lane
+        self.bytes_in = None
+        self.bytes_out = None
+
+
+def parse_event_time(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+# Тайминги — вспомогательные данные, ошибка записи не должна ронять этап
+def record_stage_event(config: Config, task_id: str, stage: str,
+                       started_at: datetime, finished_at: datetime,
+                       status: str = EVENT_STATUS_OK, lane: str | None = None,
+                       bytes_in: int | None = None, bytes_out: int | None = None):
+    import ydb
+
+    duration_ms = (finished_at - started_at).total_seconds() * 1000
+    try:
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            DECLARE $taskId AS Utf8;
+            DECLARE $stage AS Utf8;
+            DECLARE $startedAt AS Timestamp;
+            DECLARE $finishedAt AS Timestamp;
+            DECLARE $durationMs AS Double;
+            DECLARE $status AS Utf8;
+            DECLARE $lane AS Utf8?;
+            DECLARE $bytesIn AS Uint64?;
+            DECLARE $bytesOut AS Uint64?;
+
+            UPSERT INTO `{config.ydb_stage_events_table_name}` (
+                task_id, stage, started_at, finished_at, duration_ms, status, lane, bytes_in, bytes_out
+            ) VALUES (
+                $taskId, $stage, $startedAt, $finishedAt, $durationMs, $status, $lane, $bytesIn, $bytesOut
+            );
+            """,
+            {
+                "$taskId": (task_id, ydb.PrimitiveType.Utf8),
+                "$stage": (stage, ydb.PrimitiveType.Utf8),
+                "$startedAt": (started_at, ydb.PrimitiveType.Timestamp),
+                "$finishedAt": (finished_at, ydb.PrimitiveType.Timestamp),
+                "$durationMs": (duration_ms, ydb.PrimitiveType.Double),
+                "$status": (status, ydb.PrimitiveType.Utf8),
+                "$lane": (lane, ydb.OptionalType(ydb.PrimitiveType.Utf8)),
+                "$bytesIn": (bytes_in, ydb.OptionalType(ydb.PrimitiveType.Uint64)),
+                "$bytesOut": (bytes_out, ydb.OptionalType(ydb.PrimitiveType.Uint64)),
+            }
+        )
+        logger.info(f"Stage {stage} for task_id {task_id} took {duration_ms:.0f} ms ({status})")
+    except Exception as e:
+        logger.warning(f"Failed to record stage event {stage} for task_id {task_id}: {e}")
+
+
+@contextmanager
+def stage_timer(config: Config, task_id: str, stage: str, lane: str | None = None):
+    event = StageEvent(lane)
+    started_at = datetime.now(timezone.utc)
+    status = EVENT_STATUS_ERROR
+    try:
+        yield event
+        status = EVENT_STATUS_OK
+    finally:
+        record_stage_event(config, task_id, stage, started_at, datetime.now(timezone.utc),
+                           status, event.lane, event.bytes_in, event.bytes_out)
@@ -1,4 +1,5 @@
 import os
+from lanes import get_lane_queue_urls
 
 class Config:
   def __init__(self):
@@ -6,4 +7,28 @@ class Config:
     self.s3_bucket_name = os.environ["S3_BUCKET_NAME"]
     self.aws_access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
     self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
-    self.folder_id = os.environ["FOLDER_ID"]
\ No newline at end of file
+    self.folder_id = os.environ["FOLDER_ID"]
+    self.ydb_endpoint = os.environ["YDB_ENDPOINT"]
+    self.ydb_database = os.environ["YDB_DATABASE"]
+    self.ydb_ledger_table_name = os.environ["YDB_LEDGER_TABLE_NAME"]
+    self.stage_lease_seconds = int(os.environ.get("STAGE_LEASE_SECONDS", "900"))
+    self.ydb_stage_events_table_name = os.environ["YDB_STAGE_EVENTS_TABLE_NAME"]
+    self.recognize_speech_queue_urls = get_lane_queue_urls("RECOGNIZE_SPEECH_QUEUE_URL")
+    self.artifact_encoding = os.environ.get("ARTIFACT_ENCODING", "zstd")
+    self.ydb_rate_limits_table_name = os.environ["YDB_RATE_LIMITS_TABLE_NAME"]
+    self.speechkit_rate_per_second = float(os.environ.get("SPEECHKIT_RATE_PER_SECOND", "1"))
+    self.speechkit_burst = float(os.environ.get("SPEECHKIT_BURST", "5"))
+    self.rate_limit_wait_seconds = float(os.environ.get("RATE_LIMIT_WAIT_SECONDS", "10"))
+
+
+_config = None
+
+# Конфиг собирается один раз на контейнер, .env есть только при локальном запуске
+def get_config() -> Config:
+  global _config
+  if _config is None:
+    if os.path.exists(".env"):
+      from dotenv import load_dotenv
+      load_dotenv(".env")
+    _config = Config()
+  return _config
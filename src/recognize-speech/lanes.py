@@ -0,0 +1,43 @@
+import os
+import json
+import time
+import logging
+
+logger = logging.getLogger()
+
+LANES = ["short", "medium", "long"]
+DEFAULT_LANE = "medium"
+# Вес полосы: короткие задачи дольше ждут токен у лимитера и раньше
+# возвращаются после отсрочки, длинные уступают им при нехватке квоты
+LANE_WEIGHTS = {"short": 3, "medium": 2, "long": 1}
+
+
+def get_lane(body: dict) -> str:
+    lane = body.get("lane")
+    return lane if lane in LANES else DEFAULT_LANE
+
+
+def get_lane_queue_urls(env_prefix: str) -> dict[str, str]:
+    return {lane: os.environ[f"{env_prefix}_{lane.upper()}"] for lane in LANES}
+
+
+# Время в очереди по SentTimestamp из события триггера, для подбора порогов полос
+def record_queue_wait(stage: str, lane: str, message: dict):
+    sent_timestamp = message['details']['message'].get('attributes', {}).get('SentTimestamp')
+    if not sent_timestamp:
+        return
+    wait_seconds = time.time() - int(sent_timestamp) / 1000
+    logger.info(json.dumps({
+        "metric": "lane_queue_wait",
+        "stage": stage,
+        "lane": lane,
+        "wait_seconds": round(wait_seconds, 3),
+    }))
+
+
+def get_lane_wait_seconds(base_seconds: float, lane: str) -> float:
+    return base_seconds * LANE_WEIGHTS[lane] / max(LANE_WEIGHTS.values())
+
+
+def get_lane_delay_seconds(base_seconds: float, lane: str) -> float:
+    return base_seconds * max(LANE_WEIGHTS.values()) / LANE_WEIGHTS[lane]
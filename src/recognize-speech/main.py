@@ -1,35 +1,63 @@
 import json
 import logging
-import boto3
-import requests
 from datetime import datetime, timezone
-from dotenv import load_dotenv
-from config import Config
+from config import Config, get_config
+from ledger import claim_stage, complete_stage, release_stage
+from ratelimit import RateLimitedError, acquire, get_retry_after, get_requeue_delay
+from lanes import get_lane, get_lane_delay_seconds, get_lane_wait_seconds, record_queue_wait
+from artifacts import put_json_artifact
+from stage_events import parse_event_time, record_stage_event, stage_timer
+from invocation_metrics import record_invocation_metrics
+from tracing import get_message_attributes, get_message_traceparent, get_traceparent, instrument_boto_client, start_span, trace_invocation
 from urllib.parse import quote
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+STAGE_NAME = "recognize-speech"
+SPEECHKIT_API_NAME = "speechkit-recognize-file-async"
+
 _s3_client = None
 
 def get_s3_client(config: Config):
     global _s3_client
     if _s3_client is None:
-        _s3_client = boto3.client(
+        import boto3
+
+        _s3_client = instrument_boto_client(boto3.client(
             's3',
             endpoint_url='https://storage.yandexcloud.net',
             region_name='ru-central1',
             aws_access_key_id=config.aws_access_key_id,
             aws_secret_access_key=config.aws_secret_access_key,
-        )
+        ))
     return _s3_client
 
+_sqs_client = None
+
+def get_sqs_client(config: Config):
+    global _sqs_client
+    if _sqs_client is None:
+        import boto3.session
+
+        session = boto3.session.Session()
+        _sqs_client = instrument_boto_client(session.client(
+            service_name='sqs',
+            endpoint_url='https://message-queue.api.cloud.yandex.net',
+            region_name='ru-central1',
+            aws_access_key_id=config.aws_access_key_id,
+            aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _sqs_client
+
 
 def get_public_object_url(config: Config, object_name: str) -> str:
     encoded_object_name = quote(object_name)
     return f"https://storage.yandexcloud.net/{config.s3_bucket_name}/{encoded_object_name}"
 
-def start_speech_recognition(config: Config, object_url: str) -> str:
+def start_speech_recognition(config: Config, object_url: str, lane: str) -> str:
+    import requests
+
     logger.info(f"Starting speech recognition for URL: {object_url}")
     
     headers = {
@@ -66,9 +94,16 @@ def start_speech_recognition(config: Config, object_url: str) -> str:
     url = "https://stt.api.cloud.yandex.net/stt/v3/recognizeFileAsync"
     
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        result = response.json()
+        acquire(config, SPEECHKIT_API_NAME, config.speechkit_rate_per_second, config.speechkit_burst,
+                get_lane_wait_seconds(config.rate_limit_wait_seconds, lane))
+
+        with start_span("speechkit.recognize_file_async", "speechkit") as span:
+            response = requests.post(url, headers=headers, json=data)
+            span.attributes['http_status'] = response.status_code
+            if response.status_code == 429:
+                raise RateLimitedError(SPEECHKIT_API_NAME, get_retry_after(response, config.rate_limit_wait_seconds))
+            response.raise_for_status()
+            result = response.json()
         operation_id = result.get('id')
         
         logger.info(f"Speech recognition started successfully. Operation ID: {operation_id}")
@@ -79,53 +114,122 @@ def start_speech_recognition(config: Config, object_url: str) -> str:
         raise
 
 
-def process_recognition_task(config: Config, task_id: str, object_name: str):
+def send_message_to_queue(config: Config, queue_url: str, message_body: str, delay_seconds: int = 0):
+    logger.info(f"Sending message to queue: {queue_url}")
+
+    try:
+        sqs = get_sqs_client(config)
+            
+        response = sqs.send_message(
+                QueueUrl=queue_url,
+                MessageBody=message_body,
+                DelaySeconds=delay_seconds,
+                MessageAttributes=get_message_attributes()
+            )
+            
+        logger.info(f"Message sent successfully. MessageId: {response.get('MessageId', 'Unknown')}")
+            
+    except Exception as e:
+        logger.error(f"Failed to send message to queue: {str(e)}")
+        raise
+
+
+def start_recognition(config: Config, object_name: str, lane: str) -> str:
+    object_url = get_public_object_url(config, object_name)
+    logger.info(f"Object URL: {object_url}")
+    return start_speech_recognition(config, object_url, lane)
+
+
+def save_speech_task(config: Config, task_id: str, object_name: str, operation_id: str, lane: str):
     try:
-        object_url = get_public_object_url(config, object_name)
-        logger.info(f"Object URL: {object_url}")
-        
-        operation_id = start_speech_recognition(config, object_url)
-        
         task_info = {
             "task_id": task_id,
             "object_name": object_name,
             "operation_id": operation_id,
+            "lane": lane,
+            # Дальше задачу подхватывает cron, сообщения из очереди у него нет
+            "traceparent": get_traceparent(),
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
         s3_client = get_s3_client(config)
         task_key = f"speech-tasks/{task_id}"
         
-        s3_client.put_object(
-            Bucket=config.s3_bucket_name,
-            Key=task_key,
-            Body=json.dumps(task_info, ensure_ascii=False),
-            ContentType='application/json'
-        )
+        put_json_artifact(s3_client, config.s3_bucket_name, task_key, task_info, config.artifact_encoding)
         
         logger.info(f"Task info saved to {task_key}. Operation ID: {operation_id}")
         
         return task_info
         
     except Exception as e:
-        logger.error(f"Error processing recognition task: {str(e)}")
+        logger.error(f"Error saving recognition task: {str(e)}")
         raise
 
 
+def object_exists(config: Config, key: str) -> bool:
+    response = get_s3_client(config).list_objects_v2(Bucket=config.s3_bucket_name, Prefix=key, MaxKeys=1)
+    return any(item['Key'] == key for item in response.get('Contents', []))
+
+
+# Операция уже запущена, но speech-tasks/ мог не записаться: cron узнаёт об
+# операции только из него. Если cron уже сохранил speech/, задача завершена
+def restore_speech_task(config: Config, task_id: str, object_name: str, operation_id: str, lane: str):
+    if object_exists(config, f"speech-tasks/{task_id}") or object_exists(config, f"speech/{task_id}"):
+        return
+    logger.info(f"Restoring speech-tasks/{task_id} for operation ID: {operation_id}")
+    save_speech_task(config, task_id, object_name, operation_id, lane)
+
+
+@record_invocation_metrics("recognize-speech")
 def handler(event, context):
     try:
         logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
-        load_dotenv(".env")
-        config = Config()
+        config = get_config()
         
         for message in event["messages"]:
             body = json.loads(message['details']['message']['body'])
             task_id = body['task_id']
             object_name = body['object_name']
+            lane = get_lane(body)
+            record_queue_wait(STAGE_NAME, lane, message)
             
-            logger.info(f"Received data: task_id={task_id}, object_name={object_name}")
+            with trace_invocation(STAGE_NAME, get_message_traceparent(message), task_id=task_id, lane=lane):
+                logger.info(f"Received data: task_id={task_id}, object_name={object_name}, lane={lane}")
+
+                # Тайминги extract-audio приходят в сообщении, см. handler.sh
+                upstream = body.get('stage_event')
+                if upstream:
+                    record_stage_event(config, task_id, upstream['stage'],
+                                       parse_event_time(upstream['started_at']), parse_event_time(upstream['finished_at']),
+                                       lane=lane, bytes_in=upstream.get('bytes_in'), bytes_out=upstream.get('bytes_out'))
+
+                # Повторная доставка не должна запускать ещё одну платную операцию SpeechKit
+                claim = claim_stage(config, task_id, STAGE_NAME)
+                if not claim.claimed:
+                    logger.info(f"Recognition already started, operation ID: {claim.result}")
+                    if claim.result:
+                        restore_speech_task(config, task_id, object_name, claim.result, lane)
+                    continue
             
-            process_recognition_task(config, task_id, object_name)
+                operation_id = None
+                try:
+                    with stage_timer(config, task_id, STAGE_NAME, lane):
+                        operation_id = start_recognition(config, object_name, lane)
+                        # Операция оплачена с этого момента: её id сразу попадает в реестр,
+                        # чтобы повторная доставка не запустила вторую
+                        complete_stage(config, claim, operation_id)
+                        save_speech_task(config, task_id, object_name, operation_id, lane)
+                except RateLimitedError as e:
+                    release_stage(config, claim)
+                    delay = get_requeue_delay(get_lane_delay_seconds(e.retry_after, lane))
+                    logger.info(f"Deferring task_id {task_id} by {delay}s: {str(e)}")
+                    send_message_to_queue(config, config.recognize_speech_queue_urls[lane], message['details']['message']['body'], delay)
+                except Exception:
+                    # После запуска операции захват не снимается: повторная доставка
+                    # восстановит speech-tasks/ из реестра
+                    if operation_id is None:
+                        release_stage(config, claim)
+                    raise
         
         return {'statusCode': 200}
         
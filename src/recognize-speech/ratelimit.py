@@ -0,0 +1,108 @@
+import time
+import random
+import logging
+from datetime import datetime, timezone
+from config import Config
+from ydb_client import get_ydb_pool
+
+logger = logging.getLogger()
+
+# Максимальная задержка сообщения в Message Queue
+MAX_DELAY_SECONDS = 900
+
+
+class RateLimitedError(Exception):
+    def __init__(self, api: str, retry_after: float):
+        super().__init__(f"Rate limit for {api} exceeded, retry after {retry_after:.1f}s")
+        self.api = api
+        self.retry_after = retry_after
+
+
+def _as_utc(value) -> datetime:
+    if isinstance(value, int):
+        return datetime.fromtimestamp(value / 1_000_000, timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+# Чтение и запись корзины в одной serializable-транзакции: при конкурентном
+# изменении YDB вернёт ABORTED (оптимистичная блокировка), и retry_tx_sync
+# повторит всю транзакцию с новым состоянием.
+def _take_tokens(tx, config: Config, api: str, rate: float, burst: float, tokens: float) -> float:
+    import ydb
+
+    now = datetime.now(timezone.utc)
+    with tx.execute(
+        f"""
+        DECLARE $api AS Utf8;
+        SELECT tokens, updated_at FROM `{config.ydb_rate_limits_table_name}` WHERE api = $api;
+        """,
+        {"$api": (api, ydb.PrimitiveType.Utf8)},
+    ) as results:
+        rows = [row for result_set in results for row in result_set.rows]
+
+    if rows:
+        elapsed = max(0.0, (now - _as_utc(rows[0].updated_at)).total_seconds())
+        available = min(burst, rows[0].tokens + elapsed * rate)
+    else:
+        available = burst
+
+    if available >= tokens:
+        available -= tokens
+        wait_seconds = 0.0
+    else:
+        wait_seconds = (tokens - available) / rate
+
+    with tx.execute(
+        f"""
+        DECLARE $api AS Utf8;
+        DECLARE $tokens AS Double;
+        DECLARE $updatedAt AS Timestamp;
+        UPSERT INTO `{config.ydb_rate_limits_table_name}` (api, tokens, updated_at)
+        VALUES ($api, $tokens, $updatedAt);
+        """,
+        {
+            "$api": (api, ydb.PrimitiveType.Utf8),
+            "$tokens": (available, ydb.PrimitiveType.Double),
+            "$updatedAt": (now, ydb.PrimitiveType.Timestamp),
+        },
+    ) as results:
+        for _ in results:
+            pass
+
+    return wait_seconds
+
+
+def try_acquire(config: Config, api: str, rate: float, burst: float, tokens: float = 1.0) -> float:
+    return get_ydb_pool(config).retry_tx_sync(
+        lambda tx: _take_tokens(tx, config, api, rate, burst, tokens)
+    )
+
+
+# Ждём токен не дольше deadline_seconds, иначе RateLimitedError: лучше отложить
+# сообщение в очереди, чем платить за простой функции.
+def acquire(config: Config, api: str, rate: float, burst: float,
+            deadline_seconds: float, tokens: float = 1.0):
+    deadline = time.monotonic() + deadline_seconds
+    while True:
+        wait_seconds = try_acquire(config, api, rate, burst, tokens)
+        if wait_seconds == 0:
+            return
+        if time.monotonic() + wait_seconds > deadline:
+            logger.info(f"Rate limit for {api}: no tokens within deadline, need {wait_seconds:.1f}s")
+            raise RateLimitedError(api, wait_seconds)
+        time.sleep(wait_seconds)
+
+
+def get_retry_after(response, default: float) -> float:
+    try:
+        return float(response.headers.get("Retry-After", default))
+    except ValueError:
+        return default
+
+
+def get_requeue_delay(retry_after: float) -> int:
+    # Разброс, чтобы отложенные сообщения не вернулись одной пачкой
+    delay = retry_after * random.uniform(1.0, 1.5) + 1
+    return int(min(MAX_DELAY_SECONDS, delay))
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+logger = logging.getLogger()
+
+# Контекст трассировки в формате W3C traceparent: 00-<trace_id>-<span_id>-01.
+# Передаётся между функциями в MessageAttributes сообщений очереди.
+TRACEPARENT_ATTRIBUTE = "traceparent"
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+_current_span = ContextVar("current_span", default=None)
+# Корневой спан вызова: к нему привязываются спаны из потоков (s3transfer, ThreadPoolExecutor),
+# куда ContextVar не копируется
+_invocation_span = None
+
+
+class Span:
+    def __init__(self, name: str, kind: str, service: str, trace_id: str,
+                 parent_span_id: str | None, attributes: dict):
+        self.name = name
+        self.kind = kind
+        self.service = service
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.attributes = attributes
+        self.start_time = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def finish(self, error: Exception | None = None):
+        record = {
+            "span": self.name,
+            "kind": self.kind,
+            "service": self.service,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time": self.start_time.isoformat(),
+            "duration_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "status": STATUS_OK if error is None else STATUS_ERROR,
+            "attributes": self.attributes,
+        }
+        if error is not None:
+            record["error"] = str(error)
+        # Спаны экспортируются структурированными логами и собираются из Cloud Logging
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    if not value:
+        return None
+    m = TRACEPARENT_PATTERN.match(value.strip())
+    if m is None:
+        return None
+    return m.group(1), m.group(2)
+
+
+def new_traceparent() -> str:
+    return f"00-{os.urandom(16).hex()}-{os.urandom(8).hex()}-01"
+
+
+def get_parent_span() -> Span | None:
+    return _current_span.get() or _invocation_span
+
+
+def create_span(name: str, kind: str, attributes: dict) -> Span:
+    parent = get_parent_span()
+    if parent is None:
+        return Span(name, kind, "", os.urandom(16).hex(), None, attributes)
+    return Span(name, kind, parent.service, parent.trace_id, parent.span_id, attributes)
+
+
+@contextmanager
+def start_span(name: str, kind: str, **attributes):
+    span = create_span(name, kind, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.finish(e)
+        raise
+    else:
+        span.finish()
+    finally:
+        _current_span.reset(token)
+
+
+# Корневой спан функции. Без входящего traceparent начинается новая трассировка.
+@contextmanager
+def trace_invocation(service: str, traceparent: str | None = None, **attributes):
+    global _invocation_span
+
+    parent = parse_traceparent(traceparent)
+    if parent is None:
+        span = Span(service, "stage", service, os.urandom(16).hex(), None, attributes)
+    else:
+        span = Span(service, "stage", service, parent[0], parent[1], attributes)
+
+    token = _current_span.set(span)
+    previous_invocation_span = _invocation_span
+    _invocation_span = span
+    try:
+        yield span
+    except Exception as e:
+        span.finish(e)
+        raise
+    else:
+        span.finish()
+    finally:
+        _invocation_span = previous_invocation_span
+        _current_span.reset(token)
+
+
+def get_traceparent() -> str | None:
+    span = get_parent_span()
+    return span.traceparent if span is not None else None
+
+
+def get_message_attributes(traceparent: str | None = None) -> dict:
+    attributes = {
+        'Source': {
+            'StringValue': 'cloud-function',
+            'DataType': 'String'
+        }
+    }
+    traceparent = traceparent or get_traceparent()
+    if traceparent:
+        attributes[TRACEPARENT_ATTRIBUTE] = {
+            'StringValue': traceparent,
+            'DataType': 'String'
+        }
+    return attributes
+
+
+# Триггер Message Queue отдаёт атрибуты сообщения в details.message.message_attributes
+def get_message_traceparent(message: dict) -> str | None:
+    attributes = message.get('details', {}).get('message', {}).get('message_attributes') or {}
+    attribute = attributes.get(TRACEPARENT_ATTRIBUTE) or {}
+    return attribute.get('stringValue') or attribute.get('StringValue')
+
+
+def _before_boto_call(params, model, context, **kwargs):
+    attributes = {"operation": model.name}
+    for key in ("Bucket", "Key", "QueueUrl"):
+        if key in params:
+            attributes[key.lower()] = params[key]
+    service_name = model.service_model.service_name
+    context["trace_span"] = create_span(f"{service_name}.{model.name}", service_name, attributes)
+
+
+def _after_boto_call(http_response, context, **kwargs):
+    span = context.pop("trace_span", None)
+    if span is not None:
+        span.attributes["http_status"] = http_response.status_code
+        span.finish(None if http_response.status_code < 300 else Exception(f"HTTP {http_response.status_code}"))
+
+
+def _after_boto_call_error(exception, context, **kwargs):
+    span = context.pop("trace_span", None)
+    if span is not None:
+        span.finish(exception)
+
+
+# Каждый вызов API клиента boto3 (S3, SQS) попадает в трассировку отдельным спаном
+def instrument_boto_client(client):
+    client.meta.events.register("before-parameter-build", _before_boto_call)
+    client.meta.events.register("after-call", _after_boto_call)
+    client.meta.events.register("after-call-error", _after_boto_call_error)
+    return client
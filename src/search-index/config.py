@@ -0,0 +1,25 @@
+import os
+
+class Config:
+  def __init__(self):
+    self.ydb_endpoint = os.environ["YDB_ENDPOINT"]
+    self.ydb_database = os.environ["YDB_DATABASE"]
+    self.ydb_stage_events_table_name = os.environ["YDB_STAGE_EVENTS_TABLE_NAME"]
+    self.ydb_search_postings_table_name = os.environ["YDB_SEARCH_POSTINGS_TABLE_NAME"]
+    self.ydb_search_documents_table_name = os.environ["YDB_SEARCH_DOCUMENTS_TABLE_NAME"]
+    self.s3_bucket_name = os.environ["S3_BUCKET_NAME"]
+    self.aws_access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
+    self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
+
+
+_config = None
+
+# Конфиг собирается один раз на контейнер, .env есть только при локальном запуске
+def get_config() -> Config:
+  global _config
+  if _config is None:
+    if os.path.exists(".env"):
+      from dotenv import load_dotenv
+      load_dotenv(".env")
+    _config = Config()
+  return _config
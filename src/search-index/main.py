@@ -0,0 +1,250 @@
+import json
+import logging
+from config import Config, get_config
+from ydb_client import get_ydb_pool
+from lanes import get_lane, record_queue_wait
+from artifacts import get_json_artifact
+from stage_events import stage_timer
+from search_text import tokenize
+from invocation_metrics import record_invocation_metrics
+from tracing import get_message_traceparent, instrument_boto_client, start_span, trace_invocation
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+STAGE_NAME = "search-index"
+
+# Вес вхождения по полю: совпадение в названии лекции значит больше, чем в резюме,
+# а в резюме — больше, чем отдельное слово в речи
+FIELD_WEIGHTS = {"title": 5, "summary": 2, "transcript": 1}
+# Отметок времени на термин в лекции: для перехода к фрагменту записи хватает первых вхождений
+MAX_TERM_TIMESTAMPS = 20
+# Строк на один UPSERT/DELETE
+WRITE_BATCH_SIZE = 1000
+# Вторичный индекс таблицы постингов по task_id, см. terraform/main.tf
+POSTINGS_TASK_INDEX = "task_id_index"
+
+_s3_client = None
+
+def get_s3_client(config: Config):
+    global _s3_client
+    if _s3_client is None:
+        import boto3
+
+        _s3_client = instrument_boto_client(boto3.client(
+            's3',
+            endpoint_url='https://storage.yandexcloud.net',
+            region_name='ru-central1',
+            aws_access_key_id=config.aws_access_key_id,
+            aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _s3_client
+
+
+class Posting:
+    def __init__(self):
+        self.tf = 0
+        self.timestamps = []
+
+
+class DocumentIndex:
+    def __init__(self):
+        self.postings = {}
+        self.length = 0
+
+    def add(self, text: str, field: str, start_ms: int | None = None):
+        terms = tokenize(text)
+        weight = FIELD_WEIGHTS[field]
+        self.length += len(terms) * weight
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = Posting()
+            posting.tf += weight
+            if start_ms is not None and len(posting.timestamps) < MAX_TERM_TIMESTAMPS \
+                    and (not posting.timestamps or posting.timestamps[-1] != start_ms):
+                posting.timestamps.append(start_ms)
+
+
+# Схема резюме SpeechKit меняется, поэтому индексируются все строки без привязки к ключам
+def iter_strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_strings(item)
+
+
+def build_document(lecture_name: str, speech_summary, transcript: dict | None) -> DocumentIndex:
+    document = DocumentIndex()
+    document.add(lecture_name, "title")
+    for text in iter_strings(speech_summary):
+        document.add(text, "summary")
+    for utterance in (transcript or {}).get("utterances", []):
+        document.add(utterance["text"], "transcript", utterance["start_ms"])
+    return document
+
+
+def get_indexed_terms(config: Config, task_id: str) -> set[str]:
+    import ydb
+
+    result_sets = get_ydb_pool(config).execute_with_retries(
+        f"""
+        DECLARE $taskId AS Utf8;
+
+        SELECT term
+        FROM `{config.ydb_search_postings_table_name}` VIEW {POSTINGS_TASK_INDEX}
+        WHERE task_id = $taskId
+        """,
+        {
+            "$taskId": (task_id, ydb.PrimitiveType.Utf8),
+        }
+    )
+    return {row.term for result_set in result_sets for row in result_set.rows}
+
+
+def upsert_postings(config: Config, task_id: str, document: DocumentIndex):
+    import ydb
+
+    row_type = (
+        ydb.StructType()
+        .add_member('term', ydb.PrimitiveType.Utf8)
+        .add_member('task_id', ydb.PrimitiveType.Utf8)
+        .add_member('tf', ydb.PrimitiveType.Uint32)
+        .add_member('doc_length', ydb.PrimitiveType.Uint32)
+        .add_member('timestamps', ydb.OptionalType(ydb.PrimitiveType.Json))
+    )
+    rows = [
+        {
+            'term': term,
+            'task_id': task_id,
+            'tf': posting.tf,
+            'doc_length': document.length,
+            'timestamps': json.dumps(posting.timestamps) if posting.timestamps else None,
+        }
+        for term, posting in document.postings.items()
+    ]
+
+    for i in range(0, len(rows), WRITE_BATCH_SIZE):
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            DECLARE $rows AS List<Struct<
+                term: Utf8,
+                task_id: Utf8,
+                tf: Uint32,
+                doc_length: Uint32,
+                timestamps: Json?
+            >>;
+
+            UPSERT INTO `{config.ydb_search_postings_table_name}`
+            SELECT * FROM AS_TABLE($rows);
+            """,
+            {
+                "$rows": (rows[i:i + WRITE_BATCH_SIZE], ydb.ListType(row_type)),
+            }
+        )
+
+
+def delete_postings(config: Config, task_id: str, terms: list[str]):
+    import ydb
+
+    for i in range(0, len(terms), WRITE_BATCH_SIZE):
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            DECLARE $taskId AS Utf8;
+            DECLARE $terms AS List<Utf8>;
+
+            DELETE FROM `{config.ydb_search_postings_table_name}`
+            WHERE term IN $terms AND task_id = $taskId;
+            """,
+            {
+                "$taskId": (task_id, ydb.PrimitiveType.Utf8),
+                "$terms": (terms[i:i + WRITE_BATCH_SIZE], ydb.ListType(ydb.PrimitiveType.Utf8)),
+            }
+        )
+
+
+def upsert_document(config: Config, task_id: str, lecture_name: str, pdf_object_name: str | None, length: int):
+    import ydb
+
+    get_ydb_pool(config).execute_with_retries(
+        f"""
+        DECLARE $taskId AS Utf8;
+        DECLARE $lectureTitle AS Utf8;
+        DECLARE $pdfObjectName AS Utf8?;
+        DECLARE $length AS Uint32;
+
+        UPSERT INTO `{config.ydb_search_documents_table_name}` (
+            task_id, lecture_title, pdf_object_name, length, indexed_at
+        ) VALUES (
+            $taskId, $lectureTitle, $pdfObjectName, $length, CurrentUtcTimestamp()
+        );
+        """,
+        {
+            "$taskId": (task_id, ydb.PrimitiveType.Utf8),
+            "$lectureTitle": (lecture_name, ydb.PrimitiveType.Utf8),
+            "$pdfObjectName": (pdf_object_name, ydb.OptionalType(ydb.PrimitiveType.Utf8)),
+            "$length": (length, ydb.PrimitiveType.Uint32),
+        }
+    )
+
+
+# Повторная индексация той же лекции безопасна: постинги перезаписываются,
+# термины, которых больше нет в документе, удаляются. Поиск соединяет постинги
+# с таблицей документов, поэтому лекция появляется в выдаче только после
+# записи строки документа — последним шагом.
+def index_lecture(config: Config, task_id: str, lecture_name: str, pdf_object_name: str | None,
+                  speech_summary, transcript: dict | None) -> DocumentIndex:
+    document = build_document(lecture_name, speech_summary, transcript)
+
+    with start_span("ydb.index_lecture", "ydb", table=config.ydb_search_postings_table_name):
+        stale_terms = sorted(get_indexed_terms(config, task_id) - document.postings.keys())
+        upsert_postings(config, task_id, document)
+        delete_postings(config, task_id, stale_terms)
+        upsert_document(config, task_id, lecture_name, pdf_object_name, document.length)
+
+    logger.info(f"Indexed task_id {task_id}: {len(document.postings)} terms, "
+                f"{len(stale_terms)} stale terms removed, length {document.length}")
+    return document
+
+
+@record_invocation_metrics("search-index")
+def handler(event, context):
+    try:
+        logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
+        config = get_config()
+
+        for message in event["messages"]:
+            body = json.loads(message['details']['message']['body'])
+            task_id = body['task_id']
+            lane = get_lane(body)
+            record_queue_wait(STAGE_NAME, lane, message)
+
+            with trace_invocation(STAGE_NAME, get_message_traceparent(message), task_id=task_id, lane=lane):
+                logger.info(f"Received data: {body}")
+                s3_client = get_s3_client(config)
+
+                with stage_timer(config, task_id, STAGE_NAME, lane):
+                    speech_summary = get_json_artifact(s3_client, config.s3_bucket_name, body['object_name'])
+                    # У задач, распознанных до появления transcript/, индексируется только резюме
+                    transcript = None
+                    if body.get('transcript_object_name'):
+                        transcript = get_json_artifact(s3_client, config.s3_bucket_name, body['transcript_object_name'])
+
+                    index_lecture(config, task_id, body['lecture_name'], body.get('pdf_object_name'),
+                                  speech_summary, transcript)
+
+        return { 'statusCode': 200 }
+
+    except Exception as e:
+        logger.error(f"Error in handler: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'text/plain'
+            },
+            'body': f'Error occurred: {str(e)}'
+        }
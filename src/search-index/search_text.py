@@ -0,0 +1,48 @@
+import re
+from functools import lru_cache
+
+# Нормализация текста для поиска. Модуль один и тот же у search-index (индексация)
+# и fetch-ydb (разбор запроса): термины запроса и индекса должны совпадать.
+
+TOKEN_PATTERN = re.compile(r"[0-9a-zа-я]+")
+CYRILLIC_PATTERN = re.compile(r"[а-я]")
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 40
+
+STOPWORDS = frozenset("""
+а без бы был была были было быть в вам вас весь во вот все всего всех вы где да даже для до его ее ей ему
+если есть еще же за здесь и из или им их к как ко когда кто ли либо мне мы на над нам нас не него нее нет
+ни них но ну о об однако он она они оно от очень по под при с со так также такой там те тем то того тоже
+той только том ты у уже хотя чего чей чем что чтобы эта эти это этого этой этом этот я
+a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or
+our she so than that the their them then there these they this to was we were what when which who will
+with you your
+""".split())
+
+
+# PyStemmer — те же алгоритмы Snowball на C: импорт за миллисекунды, что важно
+# для холодного старта поиска
+@lru_cache(maxsize=None)
+def get_stemmer(language: str):
+    import Stemmer
+    return Stemmer.Stemmer(language)
+
+
+# В речи одни и те же слова повторяются тысячи раз, стемминг кэшируется
+@lru_cache(maxsize=65536)
+def normalize_token(token: str) -> str | None:
+    if token in STOPWORDS or not MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH:
+        return None
+    if token.isdigit():
+        return token
+    language = "russian" if CYRILLIC_PATTERN.search(token) else "english"
+    return get_stemmer(language).stemWord(token)
+
+
+def tokenize(text: str) -> list[str]:
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower().replace("ё", "е")):
+        term = normalize_token(token)
+        if term:
+            terms.append(term)
+    return terms
@@ -0,0 +1,77 @@
+import gzip
+import json
+import logging
+
+logger = logging.getLogger()
+
+# Промежуточные артефакты (speech-tasks/, speech/) хранятся сжатыми,
+# кодек указывается в Content-Encoding объекта
+ENCODING_ZSTD = "zstd"
+ENCODING_GZIP = "gzip"
+ENCODING_IDENTITY = "identity"
+ENCODINGS = (ENCODING_ZSTD, ENCODING_GZIP, ENCODING_IDENTITY)
+
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == ENCODING_ZSTD:
+        import zstandard
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == ENCODING_GZIP:
+        # mtime=0, чтобы одинаковые данные давали одинаковые байты
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == ENCODING_IDENTITY:
+        return data
+    raise ValueError(f"Unknown artifact encoding: {encoding}")
+
+
+def open_decoded(body, encoding: str | None):
+    # Распаковка идёт по мере чтения тела ответа, объект целиком в память не скачивается
+    if encoding == ENCODING_ZSTD:
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(body)
+    if encoding == ENCODING_GZIP:
+        return gzip.GzipFile(fileobj=body, mode="rb")
+    if encoding in (None, "", ENCODING_IDENTITY):
+        # Объекты, записанные до появления сжатия, лежат как есть
+        return body
+    raise ValueError(f"Unknown artifact encoding: {encoding}")
+
+
+def put_artifact(s3_client, bucket: str, key: str, data: bytes,
+                 content_type: str, encoding: str) -> int:
+    body = compress(data, encoding)
+    params = {
+        "Bucket": bucket,
+        "Key": key,
+        "Body": body,
+        "ContentType": content_type,
+    }
+    if encoding != ENCODING_IDENTITY:
+        params["ContentEncoding"] = encoding
+
+    s3_client.put_object(**params)
+    logger.info(f"Artifact {key} saved: {len(data)} bytes, {len(body)} bytes stored ({encoding})")
+    return len(body)
+
+
+def put_json_artifact(s3_client, bucket: str, key: str, obj, encoding: str) -> int:
+    data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    return put_artifact(s3_client, bucket, key, data, "application/json", encoding)
+
+
+def open_artifact(s3_client, bucket: str, key: str):
+    resp = s3_client.get_object(Bucket=bucket, Key=key)
+    return open_decoded(resp["Body"], resp.get("ContentEncoding"))
+
+
+def get_artifact_text(s3_client, bucket: str, key: str) -> str:
+    with open_artifact(s3_client, bucket, key) as reader:
+        return reader.read().decode("utf-8")
+
+
+def get_json_artifact(s3_client, bucket: str, key: str):
+    with open_artifact(s3_client, bucket, key) as reader:
+        return json.load(reader)
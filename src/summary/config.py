@@ -1,4 +1,5 @@
 import os
+from lanes import get_lane_queue_urls
 
 class Config:
   def __init__(self):
@@ -8,5 +9,31 @@ class Config:
     self.s3_bucket_name = os.environ["S3_BUCKET_NAME"]
     self.aws_access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
     self.aws_secret_access_key = os.environ["AWS_SECRET_ACCESS_KEY"]
+    self.ydb_ledger_table_name = os.environ["YDB_LEDGER_TABLE_NAME"]
+    self.stage_lease_seconds = int(os.environ.get("STAGE_LEASE_SECONDS", "900"))
+    self.ydb_stage_events_table_name = os.environ["YDB_STAGE_EVENTS_TABLE_NAME"]
+    self.summary_queue_urls = get_lane_queue_urls("SUMMARY_QUEUE_URL")
+    self.search_index_queue_urls = get_lane_queue_urls("SEARCH_INDEX_QUEUE_URL")
+    self.ydb_rate_limits_table_name = os.environ["YDB_RATE_LIMITS_TABLE_NAME"]
+    self.llm_rate_per_second = float(os.environ.get("LLM_RATE_PER_SECOND", "1"))
+    self.llm_burst = float(os.environ.get("LLM_BURST", "5"))
+    self.rate_limit_wait_seconds = float(os.environ.get("RATE_LIMIT_WAIT_SECONDS", "10"))
     self.folder_id = os.environ["FOLDER_ID"]
-    self.ya_api_key = os.environ["YA_API_KEY"]
\ No newline at end of file
+    self.ya_api_key = os.environ["YA_API_KEY"]
+    self.llm_cache_ttl_seconds = int(os.environ.get("LLM_CACHE_TTL_SECONDS", "86400"))
+    self.llm_cache_max_bytes = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    self.llm_cache_evict_probability = float(os.environ.get("LLM_CACHE_EVICT_PROBABILITY", "0.05"))
+
+
+
+_config = None
+
+# Конфиг собирается один раз на контейнер, .env есть только при локальном запуске
+def get_config() -> Config:
+  global _config
+  if _config is None:
+    if os.path.exists(".env"):
+      from dotenv import load_dotenv
+      load_dotenv(".env")
+    _config = Config()
+  return _config
@@ -0,0 +1,150 @@
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+from config import Config
+from ydb_client import get_ydb_pool
+
+logger = logging.getLogger()
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+
+
+class StageBusyError(Exception):
+    pass
+
+
+class StageClaim:
+    def __init__(self, task_id: str, stage: str, owner: str, claimed: bool, result: str | None):
+        self.task_id = task_id
+        self.stage = stage
+        self.owner = owner
+        self.claimed = claimed
+        self.result = result
+
+
+# Условная вставка в одной транзакции: строка перезаписывается, только если
+# её нет, этап не завершён и чужая аренда истекла (или аренда наша же —
+# на случай повтора запроса после потерянного ответа).
+def claim_stage(config: Config, task_id: str, stage: str) -> StageClaim:
+    import ydb
+
+    owner = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    lease_until = now + timedelta(seconds=config.stage_lease_seconds)
+
+    result_sets = get_ydb_pool(config).execute_with_retries(
+        f"""
+        DECLARE $taskId AS Utf8;
+        DECLARE $stage AS Utf8;
+        DECLARE $owner AS Utf8;
+        DECLARE $now AS Timestamp;
+        DECLARE $leaseUntil AS Timestamp;
+
+        $existing = (
+            SELECT status, owner, lease_until, result
+            FROM `{config.ydb_ledger_table_name}`
+            WHERE task_id = $taskId AND stage = $stage
+        );
+
+        $busy = (
+            SELECT COUNT(*) FROM $existing
+            WHERE owner != $owner AND (status = '{STATUS_DONE}'u OR lease_until > $now)
+        );
+
+        SELECT status, owner, lease_until, result FROM $existing;
+
+        UPSERT INTO `{config.ydb_ledger_table_name}` (
+            task_id, stage, status, owner, lease_until, result, updated_at
+        )
+        SELECT
+            $taskId AS task_id,
+            $stage AS stage,
+            '{STATUS_RUNNING}'u AS status,
+            $owner AS owner,
+            $leaseUntil AS lease_until,
+            CAST(NULL AS Utf8?) AS result,
+            $now AS updated_at
+        FROM AS_TABLE(AsList(AsStruct(1 AS x)))
+        WHERE $busy = 0;
+        """,
+        {
+            "$taskId": (task_id, ydb.PrimitiveType.Utf8),
+            "$stage": (stage, ydb.PrimitiveType.Utf8),
+            "$owner": (owner, ydb.PrimitiveType.Utf8),
+            "$now": (now, ydb.PrimitiveType.Timestamp),
+            "$leaseUntil": (lease_until, ydb.PrimitiveType.Timestamp),
+        }
+    )
+
+    rows = result_sets[0].rows
+    if not rows or rows[0].owner == owner:
+        logger.info(f"Claimed stage {stage} for task_id {task_id}")
+        return StageClaim(task_id, stage, owner, True, None)
+
+    row = rows[0]
+    if row.status == STATUS_DONE:
+        logger.info(f"Stage {stage} for task_id {task_id} is already done, skipping duplicate delivery")
+        return StageClaim(task_id, stage, owner, False, row.result)
+
+    lease_until_row = row.lease_until
+    if isinstance(lease_until_row, int):
+        lease_until_row = datetime.fromtimestamp(lease_until_row / 1_000_000, timezone.utc)
+    if lease_until_row.tzinfo is None:
+        lease_until_row = lease_until_row.replace(tzinfo=timezone.utc)
+    if lease_until_row <= now:
+        # Аренда истекла, и UPSERT выше уже перезаписал строку на нас
+        logger.info(f"Took over expired lease of stage {stage} for task_id {task_id}")
+        return StageClaim(task_id, stage, owner, True, None)
+
+    raise StageBusyError(f"Stage {stage} for task_id {task_id} is being processed by another invocation")
+
+
+def complete_stage(config: Config, claim: StageClaim, result: str | None):
+    import ydb
+
+    get_ydb_pool(config).execute_with_retries(
+        f"""
+        DECLARE $taskId AS Utf8;
+        DECLARE $stage AS Utf8;
+        DECLARE $owner AS Utf8;
+        DECLARE $result AS Utf8?;
+        DECLARE $now AS Timestamp;
+
+        UPDATE `{config.ydb_ledger_table_name}`
+        SET status = '{STATUS_DONE}'u, result = $result, updated_at = $now
+        WHERE task_id = $taskId AND stage = $stage AND owner = $owner;
+        """,
+        {
+            "$taskId": (claim.task_id, ydb.PrimitiveType.Utf8),
+            "$stage": (claim.stage, ydb.PrimitiveType.Utf8),
+            "$owner": (claim.owner, ydb.PrimitiveType.Utf8),
+            "$result": (result, ydb.OptionalType(ydb.PrimitiveType.Utf8)),
+            "$now": (datetime.now(timezone.utc), ydb.PrimitiveType.Timestamp),
+        }
+    )
+
+
+# Снимаем аренду при ошибке, чтобы повторная доставка могла сразу взять этап
+def release_stage(config: Config, claim: StageClaim):
+    import ydb
+
+    try:
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            DECLARE $taskId AS Utf8;
+            DECLARE $stage AS Utf8;
+            DECLARE $owner AS Utf8;
+
+            DELETE FROM `{config.ydb_ledger_table_name}`
+            WHERE task_id = $taskId AND stage = $stage AND owner = $owner
+              AND status = '{STATUS_RUNNING}'u;
+            """,
+            {
+                "$taskId": (claim.task_id, ydb.PrimitiveType.Utf8),
+                "$stage": (claim.stage, ydb.PrimitiveType.Utf8),
+                "$owner": (claim.owner, ydb.PrimitiveType.Utf8),
+            }
+        )
+    except Exception as e:
+        logger.warning(f"Failed to release stage {claim.stage} for task_id {claim.task_id}: {e}")
@@ -0,0 +1,118 @@
+import json
+import random
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from config import Config
+
+logger = logging.getLogger()
+
+CACHE_PREFIX = "llm-cache/"
+CACHE_FORMAT_VERSION = 1
+
+
+def make_cache_key(model_name: str, model_version: str, temperature: float,
+                   instruction: str, text: str) -> str:
+    payload = json.dumps({
+        "format": CACHE_FORMAT_VERSION,
+        "model_name": model_name,
+        "model_version": model_version,
+        "temperature": temperature,
+        "instruction": instruction,
+        "text": text,
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def record_cache_metric(result: str, key: str):
+    # Метрика в виде структурированного лога, собирается из Cloud Logging
+    logger.info(json.dumps({"metric": "llm_cache", "result": result, "key": key}))
+
+
+def get_cached_response(config: Config, s3_client, key: str) -> str | None:
+    object_name = f"{CACHE_PREFIX}{key}"
+    try:
+        resp = s3_client.get_object(Bucket=config.s3_bucket_name, Key=object_name)
+    except s3_client.exceptions.NoSuchKey:
+        record_cache_metric("miss", key)
+        return None
+    except Exception as e:
+        logger.warning(f"Failed to read LLM cache entry {object_name}: {e}")
+        record_cache_metric("miss", key)
+        return None
+
+    # Любая проблема с записью кэша — это промах, а не ошибка этапа summary
+    try:
+        expires_at = resp.get("Metadata", {}).get("expires-at")
+        if expires_at and datetime.fromisoformat(expires_at) <= datetime.now(timezone.utc):
+            logger.info(f"LLM cache entry {object_name} expired")
+            delete_cache_entry(config, s3_client, object_name)
+            record_cache_metric("miss", key)
+            return None
+        text = resp["Body"].read().decode("utf-8")
+    except Exception as e:
+        logger.warning(f"Invalid LLM cache entry {object_name}: {e}")
+        delete_cache_entry(config, s3_client, object_name)
+        record_cache_metric("miss", key)
+        return None
+
+    record_cache_metric("hit", key)
+    return text
+
+
+def delete_cache_entry(config: Config, s3_client, object_name: str):
+    try:
+        s3_client.delete_object(Bucket=config.s3_bucket_name, Key=object_name)
+    except Exception as e:
+        logger.warning(f"Failed to delete LLM cache entry {object_name}: {e}")
+
+
+def put_cached_response(config: Config, s3_client, key: str, response_text: str):
+    body = response_text.encode("utf-8")
+    if len(body) > config.llm_cache_max_bytes:
+        logger.info(f"LLM response for {key} is larger than cache size, not caching")
+        return
+
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=config.llm_cache_ttl_seconds)
+    try:
+        s3_client.put_object(
+            Bucket=config.s3_bucket_name,
+            Key=f"{CACHE_PREFIX}{key}",
+            Body=body,
+            ContentType="text/html; charset=utf-8",
+            Metadata={"expires-at": expires_at.isoformat()},
+        )
+        # Вытеснение обходит весь префикс кэша, поэтому запускается
+        # только на доле записей, а не на каждом вызове LLM
+        if random.random() < config.llm_cache_evict_probability:
+            evict_cache_entries(config, s3_client)
+    except Exception as e:
+        # Кэш не должен ломать основной сценарий
+        logger.warning(f"Failed to write LLM cache entry {key}: {e}")
+
+
+def evict_cache_entries(config: Config, s3_client):
+    entries = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=config.s3_bucket_name, Prefix=CACHE_PREFIX):
+        entries.extend(page.get("Contents", []))
+
+    total_size = sum(obj["Size"] for obj in entries)
+    if total_size <= config.llm_cache_max_bytes:
+        return
+
+    # Удаляем самые старые записи, пока не уложимся в лимит
+    entries.sort(key=lambda obj: obj["LastModified"])
+    to_delete = []
+    for obj in entries:
+        if total_size <= config.llm_cache_max_bytes:
+            break
+        to_delete.append({"Key": obj["Key"]})
+        total_size -= obj["Size"]
+
+    for i in range(0, len(to_delete), 1000):
+        s3_client.delete_objects(
+            Bucket=config.s3_bucket_name,
+            Delete={"Objects": to_delete[i:i + 1000]},
+        )
+    logger.info(f"Evicted {len(to_delete)} LLM cache entries")
@@ -1,105 +1,113 @@
 import json
 import logging
-import boto3
-import boto3.session
-from yandex_cloud_ml_sdk import YCloudML
-import ydb
 import uuid
-from weasyprint import HTML
-import io
-from dotenv import load_dotenv
-from config import Config
+from config import Config, get_config
+from ledger import claim_stage, complete_stage, release_stage
+from ydb_client import get_ydb_pool
+from ratelimit import RateLimitedError, acquire, get_retry_after, get_requeue_delay
+from lanes import get_lane, get_lane_delay_seconds, get_lane_wait_seconds, record_queue_wait
+from artifacts import get_artifact_text
+from stage_events import stage_timer
+from invocation_metrics import add_bytes_in, add_bytes_out, record_invocation_metrics
+from tracing import get_message_attributes, get_message_traceparent, instrument_boto_client, start_span, trace_invocation
+from llm_cache import make_cache_key, get_cached_response, put_cached_response
+from pdf_renderer import MultipartUploadWriter, get_pdf_renderer
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+STAGE_NAME = "summary"
+LLM_STAGE_NAME = "llm"
+PDF_STAGE_NAME = "pdf"
 
-def get_lecture_name(config: Config, task_id: str) -> str:
-    driver_config = ydb.DriverConfig(
-        config.ydb_endpoint, 
-        config.ydb_database, 
-        credentials=ydb.credentials_from_env_variables(),
-        root_certificates=ydb.load_ydb_root_certificate(),
-    )
+LLM_MODEL_NAME = "yandexgpt-lite"
+LLM_MODEL_VERSION = "rc"
+LLM_TEMPERATURE = 0.2
+LLM_COMPLETION_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+LLM_TIMEOUT_SECONDS = 50
+LLM_API_NAME = "yandexgpt-completion"
 
-    logger.info(f"Getting lecture name of task_id {task_id} from database")
-    with ydb.Driver(driver_config) as driver:
-        try:
-            driver.wait(timeout=5)
-            with ydb.QuerySessionPool(driver) as pool:
-                id = uuid.UUID(task_id)
-
-                result_sets = pool.execute_with_retries(
-                    f"""
-                    SELECT lecture_title 
-                    FROM `{config.ydb_tasks_table_name}`
-                    WHERE task_id = $taskId
-                    """,
-                    {
-                        "$taskId": (id, ydb.PrimitiveType.UUID),
-                    }
-                )
-                row = result_sets[0].rows[0]
-                return row.lecture_title
-        except TimeoutError:
-            logger.warning(f"Connect failed to YDB. Last reported errors by discovery: {driver.discovery_debug_details()}")
-            exit(1)
-            
+_s3_client = None
 
-def change_status_in_db(config: Config, task_id: str, status: str, description: str | None):
-    driver_config = ydb.DriverConfig(
-        config.ydb_endpoint, 
-        config.ydb_database, 
-        credentials=ydb.credentials_from_env_variables(),
-        root_certificates=ydb.load_ydb_root_certificate(),
-    )
+def get_s3_client(config: Config):
+    global _s3_client
+    if _s3_client is None:
+        import boto3
 
-    logger.info(f"Saving status {status} for task_id {task_id} to database")
-    with ydb.Driver(driver_config) as driver:
-        try:
-            driver.wait(timeout=5)
-            with ydb.QuerySessionPool(driver) as pool:
-                id = uuid.UUID(task_id)
-
-                pool.execute_with_retries(
-                    f"""
-                    UPDATE `{config.ydb_tasks_table_name}`
-                    SET status = $status, description = $description
-                    WHERE task_id = $taskId
-                    """,
-                    {
-                        "$taskId": (id, ydb.PrimitiveType.UUID),
-                        "$status": (status, ydb.PrimitiveType.Utf8),
-                        "$description": (description, ydb.OptionalType(ydb.PrimitiveType.Utf8)),
-                    }
-                )
-        except TimeoutError:
-            logger.warning(f"Connect failed to YDB. Last reported errors by discovery: {driver.discovery_debug_details()}")
-            exit(1)
-
-
-def send_message_to_queue(config: Config, queue_url: str, message_body: str):
-    logger.info(f"Sending message to queue: {queue_url}")
+        _s3_client = instrument_boto_client(boto3.client(
+            's3',
+            endpoint_url='https://storage.yandexcloud.net',
+            region_name='ru-central1',
+            aws_access_key_id=config.aws_access_key_id,
+            aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _s3_client
+
+_sqs_client = None
+
+def get_sqs_client(config: Config):
+    global _sqs_client
+    if _sqs_client is None:
+        import boto3.session
 
-    try:
         session = boto3.session.Session()
-        sqs = session.client(
+        _sqs_client = instrument_boto_client(session.client(
             service_name='sqs',
             endpoint_url='https://message-queue.api.cloud.yandex.net',
             region_name='ru-central1',
             aws_access_key_id=config.aws_access_key_id,
             aws_secret_access_key=config.aws_secret_access_key,
+        ))
+    return _sqs_client
+
+def get_lecture_name(config: Config, task_id: str) -> str:
+    import ydb
+
+    logger.info(f"Getting lecture name of task_id {task_id} from database")
+    with start_span("ydb.get_lecture_name", "ydb", table=config.ydb_tasks_table_name):
+        result_sets = get_ydb_pool(config).execute_with_retries(
+            f"""
+            SELECT lecture_title 
+            FROM `{config.ydb_tasks_table_name}`
+            WHERE task_id = $taskId
+            """,
+            {
+                "$taskId": (uuid.UUID(task_id), ydb.PrimitiveType.UUID),
+            }
+        )
+        return result_sets[0].rows[0].lecture_title
+
+
+def change_status_in_db(config: Config, task_id: str, status: str, description: str | None):
+    import ydb
+
+    logger.info(f"Saving status {status} for task_id {task_id} to database")
+    with start_span("ydb.change_status_in_db", "ydb", table=config.ydb_tasks_table_name):
+        get_ydb_pool(config).execute_with_retries(
+            f"""
+            UPDATE `{config.ydb_tasks_table_name}`
+            SET status = $status, description = $description
+            WHERE task_id = $taskId
+            """,
+            {
+                "$taskId": (uuid.UUID(task_id), ydb.PrimitiveType.UUID),
+                "$status": (status, ydb.PrimitiveType.Utf8),
+                "$description": (description, ydb.OptionalType(ydb.PrimitiveType.Utf8)),
+            }
         )
+
+
+def send_message_to_queue(config: Config, queue_url: str, message_body: str, delay_seconds: int = 0):
+    logger.info(f"Sending message to queue: {queue_url}")
+
+    try:
+        sqs = get_sqs_client(config)
             
         response = sqs.send_message(
                 QueueUrl=queue_url,
                 MessageBody=message_body,
-                MessageAttributes={
-                    'Source': {
-                        'StringValue': 'cloud-function',
-                        'DataType': 'String'
-                    }
-                }
+                DelaySeconds=delay_seconds,
+                MessageAttributes=get_message_attributes()
             )
             
         logger.info(f"Message sent successfully. MessageId: {response.get('MessageId', 'Unknown')}")
@@ -111,95 +119,148 @@ def send_message_to_queue(config: Config, queue_url: str, message_body: str):
 
 def get_speech_summary_from_s3(config: Config, object_name: str) -> str:
     try:
-      s3 = boto3.client(
-        's3',
-        endpoint_url='https://storage.yandexcloud.net',
-        region_name='ru-central1',
-        aws_access_key_id=config.aws_access_key_id,
-        aws_secret_access_key=config.aws_secret_access_key,
-      )
-      
-      resp = s3.get_object(Bucket=config.s3_bucket_name, Key=object_name)
-      return resp["Body"].read().decode("utf-8")
+      s3 = get_s3_client(config)
+      return get_artifact_text(s3, config.s3_bucket_name, object_name)
     except Exception as e:
       logger.error(f"Error when getting object from s3: {e}")
       raise
 
 
-def get_ai_html_summary(config: Config, lecture_name: str, speech_summary: str) -> str:
+def get_ai_html_summary(config: Config, lecture_name: str, speech_summary: str, lane: str) -> str:
     instruction = f"Тебе даётся ТЕКСТ конспекта лекции, структурированный в виде JSON. Сделай из него HTML страницу, вставляя значения из JSON. В HTML в начале тега body должен быть заголовок <h1>{lecture_name}</h1>. Ответ должен начинаться с <!DOCTYPE html><html>. Пиши только в одной строке, т.е. новых строк, табов не должно быть между элементами. НЕ обрамляй ответ символами markdown code типа ```html. ТЕКСТ:"
-    sdk = YCloudML(
-        folder_id=config.folder_id,
-        auth=config.ya_api_key,
-    )
 
-    model = sdk.models.completions("yandexgpt-lite", model_version="rc").configure(temperature=0.2)
-    messages = [{"role": "system", "text": instruction}, {"role": "user", "text": speech_summary}]
+    s3_client = get_s3_client(config)
+    cache_key = make_cache_key(LLM_MODEL_NAME, LLM_MODEL_VERSION, LLM_TEMPERATURE, instruction, speech_summary)
+    cached = get_cached_response(config, s3_client, cache_key)
+    if cached is not None:
+        logger.info(f"Using cached LLM response {cache_key}")
+        return cached
+
+    # REST вместо yandex_cloud_ml_sdk: SDK тянет в бандл десятки пакетов и долго импортируется
+    import requests
 
-    result = model.run(messages)
-    return result.alternatives[0].text
+    headers = {
+        "Authorization": f"Api-Key {config.ya_api_key}"
+    }
+
+    data = {
+        "modelUri": f"gpt://{config.folder_id}/{LLM_MODEL_NAME}/{LLM_MODEL_VERSION}",
+        "completionOptions": {
+            "stream": False,
+            "temperature": LLM_TEMPERATURE
+        },
+        "messages": [
+            {"role": "system", "text": instruction},
+            {"role": "user", "text": speech_summary}
+        ]
+    }
+
+    acquire(config, LLM_API_NAME, config.llm_rate_per_second, config.llm_burst,
+            get_lane_wait_seconds(config.rate_limit_wait_seconds, lane))
+
+    with start_span("llm.completion", "llm", model=LLM_MODEL_NAME, input_chars=len(speech_summary)) as span:
+        response = requests.post(LLM_COMPLETION_URL, headers=headers, json=data, timeout=LLM_TIMEOUT_SECONDS)
+        span.attributes['http_status'] = response.status_code
+        if response.status_code == 429:
+            raise RateLimitedError(LLM_API_NAME, get_retry_after(response, config.rate_limit_wait_seconds))
+        response.raise_for_status()
+        result = response.json()['result']
+        text = result['alternatives'][0]['message']['text']
+        span.attributes['usage'] = result.get('usage')
+
+    put_cached_response(config, s3_client, cache_key, text)
+    return text
 
 
 def generate_s3_pdf_from_html(config: Config, html_str: str, 
-                              task_id: str, lecture_name: str) -> str:
-    try:
-        pdf_buffer = io.BytesIO()
-        HTML(string=html_str).write_pdf(pdf_buffer)
-        pdf_buffer.seek(0)
-        
-        object_name = f"pdf/{task_id}/{lecture_name}.pdf"
+                              task_id: str, lecture_name: str) -> tuple[str, int]:
+    object_name = f"pdf/{task_id}/{lecture_name}.pdf"
+    writer = MultipartUploadWriter(
+        get_s3_client(config),
+        config.s3_bucket_name,
+        object_name,
+        'application/pdf'
+    )
 
-        s3_client = boto3.client(
-            's3',
-            endpoint_url='https://storage.yandexcloud.net',
-            region_name='ru-central1',
-            aws_access_key_id=config.aws_access_key_id,
-            aws_secret_access_key=config.aws_secret_access_key,
-        )
-        
-        s3_client.upload_fileobj(
-            pdf_buffer,
-            config.s3_bucket_name,
-            object_name,
-            ExtraArgs={'ContentType': 'application/pdf'}
-        )
+    try:
+        get_pdf_renderer().render(html_str, writer)
+        writer.close()
         
-        logger.info(f"PDF successfully uploaded as {object_name}")
-        return object_name
+        logger.info(f"PDF successfully uploaded as {object_name} ({writer.bytes_written} bytes)")
+        return object_name, writer.bytes_written
         
     except Exception as e:
-        print(f"Error generating or uploading PDF: {str(e)}")
+        logger.error(f"Error generating or uploading PDF: {str(e)}")
+        writer.abort()
         raise
-    finally:
-        if 'pdf_buffer' in locals():
-            pdf_buffer.close() # type: ignore
 
 
+@record_invocation_metrics("summary")
 def handler(event, context):
     try:
         logger.info(f"Event: {json.dumps(event, ensure_ascii=False)}")
-        load_dotenv(".env")
-        config = Config()
+        config = get_config()
         
         for message in event["messages"]:
             body = json.loads(message['details']['message']['body'])
             task_id = body['task_id']
             object_name = body['object_name']
+            lane = get_lane(body)
+            record_queue_wait(STAGE_NAME, lane, message)
             
-            logger.info(f"Received data: task_id={task_id}, object_name={object_name}")
+            with trace_invocation(STAGE_NAME, get_message_traceparent(message), task_id=task_id, lane=lane):
+                logger.info(f"Received data: task_id={task_id}, object_name={object_name}, lane={lane}")
+
+                claim = claim_stage(config, task_id, STAGE_NAME)
+                if not claim.claimed:
+                    logger.info(f"Summary already generated: {claim.result}")
+                    return { 'statusCode': 200 }
         
-            speech_summary = get_speech_summary_from_s3(config, object_name)
-            lecture_name = get_lecture_name(config, task_id)
+                try:
+                    speech_summary = get_speech_summary_from_s3(config, object_name)
+                    add_bytes_in(len(speech_summary.encode("utf-8")))
+                    lecture_name = get_lecture_name(config, task_id)
+
+                    with stage_timer(config, task_id, LLM_STAGE_NAME, lane) as stage_event:
+                        html_summary = get_ai_html_summary(config, lecture_name, speech_summary, lane)
+                        if html_summary.startswith("```") and html_summary.endswith("```"):
+                            html_summary = html_summary[3:-3]
+                        stage_event.bytes_in = len(speech_summary.encode("utf-8"))
+                        stage_event.bytes_out = len(html_summary.encode("utf-8"))
 
-            html_summary = get_ai_html_summary(config, lecture_name, speech_summary)
-            if html_summary.startswith("```") and html_summary.endswith("```"):
-                html_summary = html_summary[3:-3]
+                    with stage_timer(config, task_id, PDF_STAGE_NAME, lane) as stage_event:
+                        pdf_object_name, pdf_bytes = generate_s3_pdf_from_html(config, html_summary, task_id, lecture_name)
+                        stage_event.bytes_in = len(html_summary.encode("utf-8"))
+                        stage_event.bytes_out = pdf_bytes
+                        add_bytes_out(pdf_bytes)
 
-            pdf_object_name = generate_s3_pdf_from_html(config, html_summary, task_id, lecture_name)
+                    change_status_in_db(config, task_id, "Успешно завершено", pdf_object_name)
+                    complete_stage(config, claim, pdf_object_name)
+                except RateLimitedError as e:
+                    release_stage(config, claim)
+                    delay = get_requeue_delay(get_lane_delay_seconds(e.retry_after, lane))
+                    logger.info(f"Deferring task_id {task_id} by {delay}s: {str(e)}")
+                    send_message_to_queue(config, config.summary_queue_urls[lane], message['details']['message']['body'], delay)
+                    return { 'statusCode': 200 }
+                except Exception:
+                    release_stage(config, claim)
+                    raise
 
-            change_status_in_db(config, task_id, "Успешно завершено", pdf_object_name)
+                # Поиск — необязательный этап после завершения: сбой отправки не должен
+                # повторять summary с LLM и PDF, лекция останется без индекса
+                try:
+                    send_message_to_queue(config, config.search_index_queue_urls[lane], json.dumps({
+                        "task_id": task_id,
+                        "object_name": object_name,
+                        "transcript_object_name": body.get('transcript_object_name'),
+                        "lecture_name": lecture_name,
+                        "pdf_object_name": pdf_object_name,
+                        "lane": lane
+                    }, ensure_ascii=False))
+                except Exception as e:
+                    logger.warning(f"Task_id {task_id} will not be searchable, failed to enqueue indexing: {str(e)}")
             
-            return { 'statusCode': 200 }
+                return { 'statusCode': 200 }
         
     except Exception as e:
         logger.error(f"Error in handler: {str(e)}")
@@ -210,4 +271,3 @@ def handler(event, context):
             },
             'body': f'Error occurred: {str(e)}'
         }
-handler({"messages": [{'details': {'message': {"body": "{\"task_id\": \"42e9475a-8d1e-4603-a911-a0262af60b22\", \"object_name\": \"speech/42e9475a-8d1e-4603-a911-a0262af60b22\"}"}}}]}, {})
\ No newline at end of file
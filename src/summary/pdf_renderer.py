@@ -0,0 +1,136 @@
+import io
+import logging
+
+logger = logging.getLogger()
+
+# Минимальный размер части multipart upload в S3 — 5 МБ
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+
+HOUSE_STYLESHEET = """
+@page {
+    size: A4;
+    margin: 2cm 1.8cm;
+}
+body {
+    font-family: "DejaVu Sans", "Liberation Sans", sans-serif;
+    font-size: 11pt;
+    line-height: 1.45;
+    color: #222;
+}
+h1 { font-size: 20pt; margin: 0 0 12pt; }
+h2 { font-size: 15pt; margin: 14pt 0 6pt; }
+h3 { font-size: 12.5pt; margin: 10pt 0 4pt; }
+ul, ol { margin: 4pt 0 4pt 16pt; }
+code, pre { font-family: "DejaVu Sans Mono", monospace; font-size: 9.5pt; }
+"""
+
+WARMUP_HTML = "<!DOCTYPE html><html><body><h1>Прогрев</h1><p>Warm-up</p></body></html>"
+
+
+# Файлоподобный объект для write_pdf: части уходят в S3, как только буфер
+# набирает part_size, поэтому большой PDF начинает загружаться ещё во время
+# рендера. Маленькие документы отправляются одним put_object.
+class MultipartUploadWriter:
+
+    def __init__(self, s3_client, bucket: str, key: str, content_type: str,
+                 part_size: int = MULTIPART_PART_SIZE):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.part_size = part_size
+        self.upload_id = None
+        self.parts = []
+        self.bytes_written = 0
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def tell(self) -> int:
+        return self.bytes_written
+
+    def flush(self):
+        pass
+
+    def _upload_part(self, data: bytes):
+        if self.upload_id is None:
+            resp = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )
+            self.upload_id = resp["UploadId"]
+            logger.info(f"Started multipart upload for {self.key}")
+
+        part_number = len(self.parts) + 1
+        resp = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self.parts.append({"ETag": resp["ETag"], "PartNumber": part_number})
+
+    def close(self):
+        if self.upload_id is None:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=bytes(self._buffer),
+                ContentType=self.content_type,
+            )
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        self._buffer.clear()
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+            self.upload_id = None
+        self._buffer.clear()
+
+
+# Живёт всё время жизни контейнера: поиск шрифтов и разбор стилей
+# выполняются один раз, дальше переиспользуются FontConfiguration и CSS.
+class PdfRenderer:
+
+    def __init__(self, warm_up: bool = True):
+        # weasyprint тяжёлый, импортируем только когда действительно нужен рендер
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+
+        self._html_cls = HTML
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(string=HOUSE_STYLESHEET, font_config=self.font_config)
+        if warm_up:
+            self.render(WARMUP_HTML, io.BytesIO())
+
+    def render(self, html_str: str, target):
+        self._html_cls(string=html_str).write_pdf(
+            target,
+            stylesheets=[self.stylesheet],
+            font_config=self.font_config,
+        )
+
+
+_pdf_renderer = None
+
+def get_pdf_renderer() -> PdfRenderer:
+    global _pdf_renderer
+    if _pdf_renderer is None:
+        _pdf_renderer = PdfRenderer()
+    return _pdf_renderer
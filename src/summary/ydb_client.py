@@ -0,0 +1,48 @@
+import logging
+import re
+from config import Config
+from tracing import start_span
+
+logger = logging.getLogger()
+
+YDB_TABLE_PATTERN = re.compile(r"`([^`]+)`")
+
+_ydb_pool = None
+
+
+# Каждый запрос через общий пул попадает в трассировку отдельным спаном
+class TracedSessionPool:
+    def __init__(self, pool):
+        self._pool = pool
+
+    def execute_with_retries(self, query: str, *args, **kwargs):
+        tables = sorted({t.rsplit("/", 1)[-1] for t in YDB_TABLE_PATTERN.findall(query)})
+        with start_span("ydb.execute", "ydb", tables=tables):
+            return self._pool.execute_with_retries(query, *args, **kwargs)
+
+    def retry_tx_sync(self, callee, *args, **kwargs):
+        with start_span("ydb.transaction", "ydb"):
+            return self._pool.retry_tx_sync(callee, *args, **kwargs)
+
+
+# Один драйвер и пул сессий на контейнер вместо нового подключения на каждый запрос
+def get_ydb_pool(config: Config):
+    global _ydb_pool
+    if _ydb_pool is None:
+        import ydb
+
+        driver_config = ydb.DriverConfig(
+            config.ydb_endpoint, 
+            config.ydb_database, 
+            credentials=ydb.credentials_from_env_variables(),
+            root_certificates=ydb.load_ydb_root_certificate(),
+        )
+        driver = ydb.Driver(driver_config)
+        try:
+            driver.wait(timeout=5, fail_fast=True)
+        except TimeoutError:
+            logger.warning(f"Connect failed to YDB. Last reported errors by discovery: {driver.discovery_debug_details()}")
+            driver.stop()
+            raise
+        _ydb_pool = TracedSessionPool(ydb.QuerySessionPool(driver))
+    return _ydb_pool
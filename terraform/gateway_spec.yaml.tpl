@@ -22,6 +22,59 @@ paths:
                     type: array
                     items:
                       type: object
+  /api/tasks/{task_id}/timings:
+    get:
+      parameters:
+        - in: path
+          name: task_id
+          schema:
+            type: string
+          required: true
+      x-yc-apigateway-integration:
+        type: cloud_functions
+        function_id: ${fetch_ydb_timings_function_id}
+        service_account_id: ${service_account_id}
+        timeout_ms: 30000
+  /api/stages/latency:
+    get:
+      parameters:
+        - in: query
+          name: window_hours
+          schema:
+            type: integer
+          required: false
+      x-yc-apigateway-integration:
+        type: cloud_functions
+        function_id: ${fetch_ydb_timings_function_id}
+        service_account_id: ${service_account_id}
+        timeout_ms: 30000
+  /api/search:
+    get:
+      parameters:
+        - in: query
+          name: q
+          schema:
+            type: string
+          required: true
+        - in: query
+          name: limit
+          schema:
+            type: integer
+          required: false
+      x-yc-apigateway-integration:
+        type: cloud_functions
+        function_id: ${fetch_ydb_search_function_id}
+        service_account_id: ${service_account_id}
+        timeout_ms: 30000
+  /api/tasks/bulk:
+    post:
+      x-yc-apigateway-integration:
+        payload_format_version: '2.0'
+        function_id: ${form_receiver_bulk_function_id}
+        tag: ''
+        type: cloud_functions
+        service_account_id: ${service_account_id}
+        timeout_ms: 120000
   /:
     get:
       x-yc-apigateway-integration:
@@ -11,6 +11,11 @@ provider "yandex" {
   zone = "ru-central1-d"
 }
 
+locals {
+  // Полосы задач по размеру видео: короткие лекции не ждут за длинными
+  lanes = ["short", "medium", "long"]
+}
+
 // ydb
 resource "yandex_ydb_database_serverless" "ydb" {
   name      = "${var.prefix}-ydb"
@@ -51,6 +56,205 @@ resource "yandex_ydb_table" "tasks_table" {
     type     = "Utf8"
     not_null = false
   }
+  column {
+    name     = "video_path"
+    type     = "Utf8"
+    not_null = false
+  }
+  column {
+    name     = "eta"
+    type     = "Timestamp"
+    not_null = false
+  }
+  primary_key = ["task_id"]
+}
+
+resource "yandex_ydb_table" "stage_ledger_table" {
+  path              = "${var.prefix}_dir/stage_ledger"
+  connection_string = yandex_ydb_database_serverless.ydb.ydb_full_endpoint
+
+  column {
+    name     = "task_id"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "stage"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "status"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "owner"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "lease_until"
+    type     = "Timestamp"
+    not_null = true
+  }
+  column {
+    name     = "result"
+    type     = "Utf8"
+    not_null = false
+  }
+  column {
+    name     = "updated_at"
+    type     = "Timestamp"
+    not_null = true
+  }
+  primary_key = ["task_id", "stage"]
+}
+
+resource "yandex_ydb_table" "rate_limits_table" {
+  path              = "${var.prefix}_dir/rate_limits"
+  connection_string = yandex_ydb_database_serverless.ydb.ydb_full_endpoint
+
+  column {
+    name     = "api"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "tokens"
+    type     = "Double"
+    not_null = true
+  }
+  column {
+    name     = "updated_at"
+    type     = "Timestamp"
+    not_null = true
+  }
+  primary_key = ["api"]
+}
+
+resource "yandex_ydb_table" "stage_events_table" {
+  path              = "${var.prefix}_dir/stage_events"
+  connection_string = yandex_ydb_database_serverless.ydb.ydb_full_endpoint
+
+  column {
+    name     = "task_id"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "stage"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "started_at"
+    type     = "Timestamp"
+    not_null = true
+  }
+  column {
+    name     = "finished_at"
+    type     = "Timestamp"
+    not_null = true
+  }
+  column {
+    name     = "duration_ms"
+    type     = "Double"
+    not_null = true
+  }
+  column {
+    name     = "status"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "lane"
+    type     = "Utf8"
+    not_null = false
+  }
+  column {
+    name     = "bytes_in"
+    type     = "Uint64"
+    not_null = false
+  }
+  column {
+    name     = "bytes_out"
+    type     = "Uint64"
+    not_null = false
+  }
+  primary_key = ["task_id", "stage", "started_at"]
+}
+
+resource "yandex_ydb_table" "search_postings_table" {
+  path              = "${var.prefix}_dir/search_postings"
+  connection_string = yandex_ydb_database_serverless.ydb.ydb_full_endpoint
+
+  column {
+    name     = "term"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "task_id"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "tf"
+    type     = "Uint32"
+    not_null = true
+  }
+  column {
+    name     = "doc_length"
+    type     = "Uint32"
+    not_null = true
+  }
+  column {
+    name     = "timestamps"
+    type     = "Json"
+    not_null = false
+  }
+  primary_key = ["term", "task_id"]
+}
+
+// Термины лекции при повторной индексации
+resource "yandex_ydb_table_index" "search_postings_task_id_index" {
+  table_path        = yandex_ydb_table.search_postings_table.path
+  connection_string = yandex_ydb_table.search_postings_table.connection_string
+  name              = "task_id_index"
+  type              = "global_sync"
+  columns           = ["task_id"]
+}
+
+resource "yandex_ydb_table" "search_documents_table" {
+  path              = "${var.prefix}_dir/search_documents"
+  connection_string = yandex_ydb_database_serverless.ydb.ydb_full_endpoint
+
+  column {
+    name     = "task_id"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "lecture_title"
+    type     = "Utf8"
+    not_null = true
+  }
+  column {
+    name     = "pdf_object_name"
+    type     = "Utf8"
+    not_null = false
+  }
+  column {
+    name     = "length"
+    type     = "Uint32"
+    not_null = true
+  }
+  column {
+    name     = "indexed_at"
+    type     = "Timestamp"
+    not_null = true
+  }
   primary_key = ["task_id"]
 }
 
@@ -118,12 +322,12 @@ data "archive_file" "form_receiver_zip" {
   output_path = "function-form-receiver.zip"
   source_dir  = "../src/form-receiver"
 
-  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock"]
+  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock", "pyproject.toml"]
 }
 
 resource "yandex_function" "form_receiver" {
   name               = "${var.prefix}-form-receiver"
-  description        = "Функция получает форму из API gateway, создаёт строку в YDB и отправляет сообщение в очередь download"
+  description        = "Функция получает форму из API gateway, по глубине очередей принимает, откладывает или отклоняет задачу, создаёт строку в YDB с оценкой готовности и отправляет сообщение в очередь download"
   user_hash          = data.archive_file.form_receiver_zip.output_sha256
   runtime            = "python312"
   entrypoint         = "main.handler"
@@ -135,18 +339,80 @@ resource "yandex_function" "form_receiver" {
     zip_filename = data.archive_file.form_receiver_zip.output_path
   }
   environment = {
-    YDB_ENDPOINT          = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
-    YDB_DATABASE          = yandex_ydb_database_serverless.ydb.database_path
-    YDB_TASKS_TABLE_NAME  = yandex_ydb_table.tasks_table.path
-    AWS_ACCESS_KEY_ID     = yandex_iam_service_account_static_access_key.sa_static_key.access_key
-    AWS_SECRET_ACCESS_KEY = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
-    DOWNLOAD_QUEUE_URL    = data.yandex_message_queue.download_queue.url
+    YDB_ENDPOINT                      = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                      = yandex_ydb_database_serverless.ydb.database_path
+    YDB_TASKS_TABLE_NAME              = yandex_ydb_table.tasks_table.path
+    AWS_ACCESS_KEY_ID                 = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+    AWS_SECRET_ACCESS_KEY             = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+    DOWNLOAD_QUEUE_URL_SHORT          = data.yandex_message_queue.download_queue["short"].url
+    DOWNLOAD_QUEUE_URL_MEDIUM         = data.yandex_message_queue.download_queue["medium"].url
+    DOWNLOAD_QUEUE_URL_LONG           = data.yandex_message_queue.download_queue["long"].url
+    LANE_SHORT_MAX_BYTES              = "209715200"
+    LANE_MEDIUM_MAX_BYTES             = "1073741824"
+    S3_BUCKET_NAME                    = yandex_storage_bucket.bucket.bucket
+    YDB_STAGE_EVENTS_TABLE_NAME       = yandex_ydb_table.stage_events_table.path
+    EXTRACT_AUDIO_QUEUE_URL_SHORT     = data.yandex_message_queue.extract_audio_queue["short"].url
+    EXTRACT_AUDIO_QUEUE_URL_MEDIUM    = data.yandex_message_queue.extract_audio_queue["medium"].url
+    EXTRACT_AUDIO_QUEUE_URL_LONG      = data.yandex_message_queue.extract_audio_queue["long"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_SHORT  = data.yandex_message_queue.recognize_speech_queue["short"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_MEDIUM = data.yandex_message_queue.recognize_speech_queue["medium"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_LONG   = data.yandex_message_queue.recognize_speech_queue["long"].url
+    SUMMARY_QUEUE_URL_SHORT           = data.yandex_message_queue.summary_queue["short"].url
+    SUMMARY_QUEUE_URL_MEDIUM          = data.yandex_message_queue.summary_queue["medium"].url
+    SUMMARY_QUEUE_URL_LONG            = data.yandex_message_queue.summary_queue["long"].url
+    ADMISSION_DEFER_WATERMARK         = "200"
+    ADMISSION_REJECT_WATERMARK        = "2000"
+    ADMISSION_CACHE_SECONDS           = "5"
+  }
+}
+
+// form-receiver-bulk: тот же код, точка входа bulk_handler
+resource "yandex_function" "form_receiver_bulk" {
+  name               = "${var.prefix}-form-receiver-bulk"
+  description        = "Функция получает список ссылок или публичную папку Яндекс.Диска, создаёт строки в YDB одним UPSERT и отправляет сообщения в очередь download пачками по 10"
+  user_hash          = data.archive_file.form_receiver_zip.output_sha256
+  runtime            = "python312"
+  entrypoint         = "main.bulk_handler"
+  memory             = "256"
+  execution_timeout  = "120"
+  folder_id          = var.folder_id
+  service_account_id = yandex_iam_service_account.sa.id
+  content {
+    zip_filename = data.archive_file.form_receiver_zip.output_path
+  }
+  environment = {
+    YDB_ENDPOINT                      = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                      = yandex_ydb_database_serverless.ydb.database_path
+    YDB_TASKS_TABLE_NAME              = yandex_ydb_table.tasks_table.path
+    AWS_ACCESS_KEY_ID                 = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+    AWS_SECRET_ACCESS_KEY             = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+    DOWNLOAD_QUEUE_URL_SHORT          = data.yandex_message_queue.download_queue["short"].url
+    DOWNLOAD_QUEUE_URL_MEDIUM         = data.yandex_message_queue.download_queue["medium"].url
+    DOWNLOAD_QUEUE_URL_LONG           = data.yandex_message_queue.download_queue["long"].url
+    LANE_SHORT_MAX_BYTES              = "209715200"
+    LANE_MEDIUM_MAX_BYTES             = "1073741824"
+    S3_BUCKET_NAME                    = yandex_storage_bucket.bucket.bucket
+    YDB_STAGE_EVENTS_TABLE_NAME       = yandex_ydb_table.stage_events_table.path
+    EXTRACT_AUDIO_QUEUE_URL_SHORT     = data.yandex_message_queue.extract_audio_queue["short"].url
+    EXTRACT_AUDIO_QUEUE_URL_MEDIUM    = data.yandex_message_queue.extract_audio_queue["medium"].url
+    EXTRACT_AUDIO_QUEUE_URL_LONG      = data.yandex_message_queue.extract_audio_queue["long"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_SHORT  = data.yandex_message_queue.recognize_speech_queue["short"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_MEDIUM = data.yandex_message_queue.recognize_speech_queue["medium"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_LONG   = data.yandex_message_queue.recognize_speech_queue["long"].url
+    SUMMARY_QUEUE_URL_SHORT           = data.yandex_message_queue.summary_queue["short"].url
+    SUMMARY_QUEUE_URL_MEDIUM          = data.yandex_message_queue.summary_queue["medium"].url
+    SUMMARY_QUEUE_URL_LONG            = data.yandex_message_queue.summary_queue["long"].url
+    ADMISSION_DEFER_WATERMARK         = "200"
+    ADMISSION_REJECT_WATERMARK        = "2000"
+    ADMISSION_CACHE_SECONDS           = "5"
   }
 }
 
 // download: queue -> trigger -> function
 resource "yandex_message_queue" "download_queue" {
-  name                       = "${var.prefix}-download-queue"
+  for_each = toset(local.lanes)
+
+  name                       = "${var.prefix}-download-queue-${each.key}"
   visibility_timeout_seconds = 600
   receive_wait_time_seconds  = 20
   redrive_policy = jsonencode({
@@ -157,16 +423,20 @@ resource "yandex_message_queue" "download_queue" {
   secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
 }
 data "yandex_message_queue" "download_queue" {
-  name       = yandex_message_queue.download_queue.name
+  for_each = yandex_message_queue.download_queue
+
+  name       = each.value.name
   access_key = yandex_iam_service_account_static_access_key.sa_static_key.access_key
   secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
 }
 
 resource "yandex_function_trigger" "download_trigger" {
-  name      = "${var.prefix}-download-trigger"
+  for_each = yandex_message_queue.download_queue
+
+  name      = "${var.prefix}-download-trigger-${each.key}"
   folder_id = var.folder_id
   message_queue {
-    queue_id           = yandex_message_queue.download_queue.arn
+    queue_id           = each.value.arn
     batch_cutoff       = "2"
     batch_size         = 1
     service_account_id = yandex_iam_service_account.sa.id
@@ -182,7 +452,7 @@ data "archive_file" "download_zip" {
   output_path = "function-download.zip"
   source_dir  = "../src/download"
 
-  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock"]
+  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock", "pyproject.toml"]
 }
 
 resource "yandex_function" "download" {
@@ -199,19 +469,27 @@ resource "yandex_function" "download" {
     zip_filename = data.archive_file.download_zip.output_path
   }
   environment = {
-    YDB_ENDPOINT            = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
-    YDB_DATABASE            = yandex_ydb_database_serverless.ydb.database_path
-    YDB_TASKS_TABLE_NAME    = yandex_ydb_table.tasks_table.path
-    AWS_ACCESS_KEY_ID       = yandex_iam_service_account_static_access_key.sa_static_key.access_key
-    AWS_SECRET_ACCESS_KEY   = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
-    S3_BUCKET_NAME          = yandex_storage_bucket.bucket.bucket
-    EXTRACT_AUDIO_QUEUE_URL = data.yandex_message_queue.extract_audio_queue.url
+    YDB_ENDPOINT                   = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                   = yandex_ydb_database_serverless.ydb.database_path
+    YDB_TASKS_TABLE_NAME           = yandex_ydb_table.tasks_table.path
+    AWS_ACCESS_KEY_ID              = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+    AWS_SECRET_ACCESS_KEY          = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+    S3_BUCKET_NAME                 = yandex_storage_bucket.bucket.bucket
+    EXTRACT_AUDIO_QUEUE_URL_SHORT  = data.yandex_message_queue.extract_audio_queue["short"].url
+    EXTRACT_AUDIO_QUEUE_URL_MEDIUM = data.yandex_message_queue.extract_audio_queue["medium"].url
+    EXTRACT_AUDIO_QUEUE_URL_LONG   = data.yandex_message_queue.extract_audio_queue["long"].url
+    LANE_SHORT_MAX_BYTES           = "209715200"
+    LANE_MEDIUM_MAX_BYTES          = "1073741824"
+    YDB_LEDGER_TABLE_NAME          = yandex_ydb_table.stage_ledger_table.path
+    YDB_STAGE_EVENTS_TABLE_NAME    = yandex_ydb_table.stage_events_table.path
   }
 }
 
 // extract-audio: queue -> trigger -> function
 resource "yandex_message_queue" "extract_audio_queue" {
-  name                       = "${var.prefix}-extract-audio"
+  for_each = toset(local.lanes)
+
+  name                       = "${var.prefix}-extract-audio-${each.key}"
   visibility_timeout_seconds = 600
   receive_wait_time_seconds  = 20
   redrive_policy = jsonencode({
@@ -222,17 +500,21 @@ resource "yandex_message_queue" "extract_audio_queue" {
   secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
 }
 data "yandex_message_queue" "extract_audio_queue" {
-  name       = yandex_message_queue.extract_audio_queue.name
+  for_each = yandex_message_queue.extract_audio_queue
+
+  name       = each.value.name
   access_key = yandex_iam_service_account_static_access_key.sa_static_key.access_key
   secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
 }
 
 resource "yandex_function_trigger" "extract_audio_trigger" {
-  name      = "${var.prefix}-extract-audio-trigger"
+  for_each = yandex_message_queue.extract_audio_queue
+
+  name      = "${var.prefix}-extract-audio-trigger-${each.key}"
   folder_id = var.folder_id
   message_queue {
     // https://yandex.cloud/ru/docs/functions/operations/trigger/ymq-trigger-create#tf_1
-    queue_id           = yandex_message_queue.extract_audio_queue.arn
+    queue_id           = each.value.arn
     batch_cutoff       = "2"
     batch_size         = 1
     service_account_id = yandex_iam_service_account.sa.id
@@ -273,16 +555,20 @@ resource "yandex_function" "extract_audio" {
     object_name = yandex_storage_object.extract_audio_zip.key
   }
   environment = {
-    AWS_ACCESS_KEY_ID          = yandex_iam_service_account_static_access_key.sa_static_key.access_key
-    AWS_SECRET_ACCESS_KEY      = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
-    S3_BUCKET_NAME             = yandex_storage_bucket.bucket.bucket
-    RECOGNIZE_SPEECH_QUEUE_URL = data.yandex_message_queue.recognize_speech_queue.url
+    AWS_ACCESS_KEY_ID                 = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+    AWS_SECRET_ACCESS_KEY             = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+    S3_BUCKET_NAME                    = yandex_storage_bucket.bucket.bucket
+    RECOGNIZE_SPEECH_QUEUE_URL_SHORT  = data.yandex_message_queue.recognize_speech_queue["short"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_MEDIUM = data.yandex_message_queue.recognize_speech_queue["medium"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_LONG   = data.yandex_message_queue.recognize_speech_queue["long"].url
   }
 }
 
 // recognize-speech: queue -> trigger -> function -> s3 (speech-tasks/*) <-- recognize-speech-cron
 resource "yandex_message_queue" "recognize_speech_queue" {
-  name                       = "${var.prefix}-recognize-speech-queue"
+  for_each = toset(local.lanes)
+
+  name                       = "${var.prefix}-recognize-speech-queue-${each.key}"
   visibility_timeout_seconds = 600
   receive_wait_time_seconds  = 20
   redrive_policy = jsonencode({
@@ -293,16 +579,20 @@ resource "yandex_message_queue" "recognize_speech_queue" {
   secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
 }
 data "yandex_message_queue" "recognize_speech_queue" {
-  name       = yandex_message_queue.recognize_speech_queue.name
+  for_each = yandex_message_queue.recognize_speech_queue
+
+  name       = each.value.name
   access_key = yandex_iam_service_account_static_access_key.sa_static_key.access_key
   secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
 }
 
 resource "yandex_function_trigger" "recognize_speech_trigger" {
-  name      = "${var.prefix}-recognize-speech-trigger"
+  for_each = yandex_message_queue.recognize_speech_queue
+
+  name      = "${var.prefix}-recognize-speech-trigger-${each.key}"
   folder_id = var.folder_id
   message_queue {
-    queue_id           = yandex_message_queue.recognize_speech_queue.arn
+    queue_id           = each.value.arn
     batch_cutoff       = "2"
     batch_size         = 1
     service_account_id = yandex_iam_service_account.sa.id
@@ -318,7 +608,7 @@ data "archive_file" "recognize_speech_zip" {
   output_path = "function-recognize-speech.zip"
   source_dir  = "../src/recognize-speech"
 
-  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock"]
+  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock", "pyproject.toml"]
 }
 
 resource "yandex_function" "recognize_speech" {
@@ -335,11 +625,22 @@ resource "yandex_function" "recognize_speech" {
     zip_filename = data.archive_file.recognize_speech_zip.output_path
   }
   environment = {
-    AWS_ACCESS_KEY_ID     = yandex_iam_service_account_static_access_key.sa_static_key.access_key
-    AWS_SECRET_ACCESS_KEY = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
-    S3_BUCKET_NAME        = yandex_storage_bucket.bucket.bucket
-    FOLDER_ID             = var.folder_id
-    YA_API_KEY            = yandex_iam_service_account_api_key.sa_api_key.secret_key
+    AWS_ACCESS_KEY_ID                 = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+    AWS_SECRET_ACCESS_KEY             = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+    S3_BUCKET_NAME                    = yandex_storage_bucket.bucket.bucket
+    FOLDER_ID                         = var.folder_id
+    YA_API_KEY                        = yandex_iam_service_account_api_key.sa_api_key.secret_key
+    YDB_ENDPOINT                      = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                      = yandex_ydb_database_serverless.ydb.database_path
+    YDB_LEDGER_TABLE_NAME             = yandex_ydb_table.stage_ledger_table.path
+    YDB_STAGE_EVENTS_TABLE_NAME       = yandex_ydb_table.stage_events_table.path
+    YDB_RATE_LIMITS_TABLE_NAME        = yandex_ydb_table.rate_limits_table.path
+    RECOGNIZE_SPEECH_QUEUE_URL_SHORT  = data.yandex_message_queue.recognize_speech_queue["short"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_MEDIUM = data.yandex_message_queue.recognize_speech_queue["medium"].url
+    RECOGNIZE_SPEECH_QUEUE_URL_LONG   = data.yandex_message_queue.recognize_speech_queue["long"].url
+    SPEECHKIT_RATE_PER_SECOND         = "1"
+    SPEECHKIT_BURST                   = "5"
+    ARTIFACT_ENCODING                 = "zstd"
   }
 }
 
@@ -360,7 +661,7 @@ data "archive_file" "recognize_speech_cron_zip" {
   output_path = "function-recognize-speech-cron.zip"
   source_dir  = "../src/recognize-speech-cron"
 
-  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock"]
+  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock", "pyproject.toml"]
 }
 
 resource "yandex_function" "recognize_speech_cron" {
@@ -377,17 +678,25 @@ resource "yandex_function" "recognize_speech_cron" {
     zip_filename = data.archive_file.recognize_speech_cron_zip.output_path
   }
   environment = {
-    AWS_ACCESS_KEY_ID     = yandex_iam_service_account_static_access_key.sa_static_key.access_key
-    AWS_SECRET_ACCESS_KEY = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
-    S3_BUCKET_NAME        = yandex_storage_bucket.bucket.bucket
-    YA_API_KEY            = yandex_iam_service_account_api_key.sa_api_key.secret_key
-    SUMMARY_QUEUE_URL     = data.yandex_message_queue.summary_queue.url
+    AWS_ACCESS_KEY_ID           = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+    AWS_SECRET_ACCESS_KEY       = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+    S3_BUCKET_NAME              = yandex_storage_bucket.bucket.bucket
+    YA_API_KEY                  = yandex_iam_service_account_api_key.sa_api_key.secret_key
+    SUMMARY_QUEUE_URL_SHORT     = data.yandex_message_queue.summary_queue["short"].url
+    SUMMARY_QUEUE_URL_MEDIUM    = data.yandex_message_queue.summary_queue["medium"].url
+    SUMMARY_QUEUE_URL_LONG      = data.yandex_message_queue.summary_queue["long"].url
+    ARTIFACT_ENCODING           = "zstd"
+    YDB_ENDPOINT                = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                = yandex_ydb_database_serverless.ydb.database_path
+    YDB_STAGE_EVENTS_TABLE_NAME = yandex_ydb_table.stage_events_table.path
   }
 }
 
 // summary: queue -> trigger -> function -> ydb
 resource "yandex_message_queue" "summary_queue" {
-  name                       = "${var.prefix}-summary-queue"
+  for_each = toset(local.lanes)
+
+  name                       = "${var.prefix}-summary-queue-${each.key}"
   visibility_timeout_seconds = 600
   receive_wait_time_seconds  = 20
   redrive_policy = jsonencode({
@@ -398,16 +707,20 @@ resource "yandex_message_queue" "summary_queue" {
   secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
 }
 data "yandex_message_queue" "summary_queue" {
-  name       = yandex_message_queue.summary_queue.name
+  for_each = yandex_message_queue.summary_queue
+
+  name       = each.value.name
   access_key = yandex_iam_service_account_static_access_key.sa_static_key.access_key
   secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
 }
 
 resource "yandex_function_trigger" "summary_trigger" {
-  name      = "${var.prefix}-summary-trigger"
+  for_each = yandex_message_queue.summary_queue
+
+  name      = "${var.prefix}-summary-trigger-${each.key}"
   folder_id = var.folder_id
   message_queue {
-    queue_id           = yandex_message_queue.summary_queue.arn
+    queue_id           = each.value.arn
     batch_cutoff       = "2"
     batch_size         = 1
     service_account_id = yandex_iam_service_account.sa.id
@@ -423,7 +736,7 @@ data "archive_file" "summary_zip" {
   output_path = "function-summary.zip"
   source_dir  = "../src/summary"
 
-  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock"]
+  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock", "pyproject.toml"]
 }
 
 resource "yandex_function" "summary" {
@@ -440,14 +753,100 @@ resource "yandex_function" "summary" {
     zip_filename = data.archive_file.summary_zip.output_path
   }
   environment = {
-    YDB_ENDPOINT          = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
-    YDB_DATABASE          = yandex_ydb_database_serverless.ydb.database_path
-    YDB_TASKS_TABLE_NAME  = yandex_ydb_table.tasks_table.path
-    AWS_ACCESS_KEY_ID     = yandex_iam_service_account_static_access_key.sa_static_key.access_key
-    AWS_SECRET_ACCESS_KEY = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
-    S3_BUCKET_NAME        = yandex_storage_bucket.bucket.bucket
-    YA_API_KEY            = yandex_iam_service_account_api_key.sa_api_key.secret_key
-    FOLDER_ID             = var.folder_id
+    YDB_ENDPOINT                  = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                  = yandex_ydb_database_serverless.ydb.database_path
+    YDB_TASKS_TABLE_NAME          = yandex_ydb_table.tasks_table.path
+    AWS_ACCESS_KEY_ID             = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+    AWS_SECRET_ACCESS_KEY         = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+    S3_BUCKET_NAME                = yandex_storage_bucket.bucket.bucket
+    YA_API_KEY                    = yandex_iam_service_account_api_key.sa_api_key.secret_key
+    FOLDER_ID                     = var.folder_id
+    LLM_CACHE_TTL_SECONDS         = "86400"
+    LLM_CACHE_MAX_BYTES           = "268435456"
+    LLM_CACHE_EVICT_PROBABILITY   = "0.05"
+    YDB_LEDGER_TABLE_NAME         = yandex_ydb_table.stage_ledger_table.path
+    YDB_STAGE_EVENTS_TABLE_NAME   = yandex_ydb_table.stage_events_table.path
+    YDB_RATE_LIMITS_TABLE_NAME    = yandex_ydb_table.rate_limits_table.path
+    SUMMARY_QUEUE_URL_SHORT       = data.yandex_message_queue.summary_queue["short"].url
+    SUMMARY_QUEUE_URL_MEDIUM      = data.yandex_message_queue.summary_queue["medium"].url
+    SUMMARY_QUEUE_URL_LONG        = data.yandex_message_queue.summary_queue["long"].url
+    SEARCH_INDEX_QUEUE_URL_SHORT  = data.yandex_message_queue.search_index_queue["short"].url
+    SEARCH_INDEX_QUEUE_URL_MEDIUM = data.yandex_message_queue.search_index_queue["medium"].url
+    SEARCH_INDEX_QUEUE_URL_LONG   = data.yandex_message_queue.search_index_queue["long"].url
+    LLM_RATE_PER_SECOND           = "1"
+    LLM_BURST                     = "5"
+  }
+}
+
+// search-index: queue -> trigger -> function -> ydb
+resource "yandex_message_queue" "search_index_queue" {
+  for_each = toset(local.lanes)
+
+  name                       = "${var.prefix}-search-index-queue-${each.key}"
+  visibility_timeout_seconds = 120
+  receive_wait_time_seconds  = 20
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = yandex_message_queue.deadletter_queue.arn
+    maxReceiveCount     = 3
+  })
+  access_key = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+  secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+}
+data "yandex_message_queue" "search_index_queue" {
+  for_each = yandex_message_queue.search_index_queue
+
+  name       = each.value.name
+  access_key = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+  secret_key = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+}
+
+resource "yandex_function_trigger" "search_index_trigger" {
+  for_each = yandex_message_queue.search_index_queue
+
+  name      = "${var.prefix}-search-index-trigger-${each.key}"
+  folder_id = var.folder_id
+  message_queue {
+    queue_id           = each.value.arn
+    batch_cutoff       = "2"
+    batch_size         = 1
+    service_account_id = yandex_iam_service_account.sa.id
+  }
+  function {
+    id                 = yandex_function.search_index.id
+    service_account_id = yandex_iam_service_account.sa.id
+  }
+}
+
+data "archive_file" "search_index_zip" {
+  type        = "zip"
+  output_path = "function-search-index.zip"
+  source_dir  = "../src/search-index"
+
+  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock", "pyproject.toml"]
+}
+
+resource "yandex_function" "search_index" {
+  name               = "${var.prefix}-search-index"
+  description        = "Функция получает сообщение с очереди после summary, разбивает на термины название, резюме speech/* и расшифровку transcript/* лекции и обновляет поисковый индекс в YDB"
+  user_hash          = data.archive_file.search_index_zip.output_sha256
+  runtime            = "python312"
+  entrypoint         = "main.handler"
+  memory             = "256"
+  execution_timeout  = "60"
+  folder_id          = var.folder_id
+  service_account_id = yandex_iam_service_account.sa.id
+  content {
+    zip_filename = data.archive_file.search_index_zip.output_path
+  }
+  environment = {
+    YDB_ENDPOINT                    = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                    = yandex_ydb_database_serverless.ydb.database_path
+    YDB_STAGE_EVENTS_TABLE_NAME     = yandex_ydb_table.stage_events_table.path
+    YDB_SEARCH_POSTINGS_TABLE_NAME  = yandex_ydb_table.search_postings_table.path
+    YDB_SEARCH_DOCUMENTS_TABLE_NAME = yandex_ydb_table.search_documents_table.path
+    AWS_ACCESS_KEY_ID               = yandex_iam_service_account_static_access_key.sa_static_key.access_key
+    AWS_SECRET_ACCESS_KEY           = yandex_iam_service_account_static_access_key.sa_static_key.secret_key
+    S3_BUCKET_NAME                  = yandex_storage_bucket.bucket.bucket
   }
 }
 
@@ -457,7 +856,7 @@ data "archive_file" "fetch_ydb_zip" {
   output_path = "function-fetch-ydb.zip"
   source_dir  = "../src/fetch-ydb"
 
-  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock"]
+  excludes = ["__pycache__", "*.pyc", ".DS_Store", ".env", ".python-version", ".venv", "uv.lock", "pyproject.toml"]
 }
 
 resource "yandex_function" "fetch_ydb" {
@@ -474,9 +873,58 @@ resource "yandex_function" "fetch_ydb" {
     zip_filename = data.archive_file.fetch_ydb_zip.output_path
   }
   environment = {
-    YDB_ENDPOINT         = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
-    YDB_DATABASE         = yandex_ydb_database_serverless.ydb.database_path
-    YDB_TASKS_TABLE_NAME = yandex_ydb_table.tasks_table.path
+    YDB_ENDPOINT                    = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                    = yandex_ydb_database_serverless.ydb.database_path
+    YDB_TASKS_TABLE_NAME            = yandex_ydb_table.tasks_table.path
+    YDB_STAGE_EVENTS_TABLE_NAME     = yandex_ydb_table.stage_events_table.path
+    YDB_SEARCH_POSTINGS_TABLE_NAME  = yandex_ydb_table.search_postings_table.path
+    YDB_SEARCH_DOCUMENTS_TABLE_NAME = yandex_ydb_table.search_documents_table.path
+  }
+}
+
+resource "yandex_function" "fetch_ydb_timings" {
+  name               = "${var.prefix}-fetch-ydb-timings"
+  description        = "Функция возвращает тайминги этапов задачи и перцентили длительности этапов за окно времени"
+  user_hash          = data.archive_file.fetch_ydb_zip.output_sha256
+  runtime            = "python312"
+  entrypoint         = "main.timings_handler"
+  memory             = "256"
+  execution_timeout  = "60"
+  folder_id          = var.folder_id
+  service_account_id = yandex_iam_service_account.sa.id
+  content {
+    zip_filename = data.archive_file.fetch_ydb_zip.output_path
+  }
+  environment = {
+    YDB_ENDPOINT                    = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                    = yandex_ydb_database_serverless.ydb.database_path
+    YDB_TASKS_TABLE_NAME            = yandex_ydb_table.tasks_table.path
+    YDB_STAGE_EVENTS_TABLE_NAME     = yandex_ydb_table.stage_events_table.path
+    YDB_SEARCH_POSTINGS_TABLE_NAME  = yandex_ydb_table.search_postings_table.path
+    YDB_SEARCH_DOCUMENTS_TABLE_NAME = yandex_ydb_table.search_documents_table.path
+  }
+}
+
+resource "yandex_function" "fetch_ydb_search" {
+  name               = "${var.prefix}-fetch-ydb-search"
+  description        = "Функция ищет лекции по названию, резюме и расшифровке и возвращает их по релевантности с отметками времени"
+  user_hash          = data.archive_file.fetch_ydb_zip.output_sha256
+  runtime            = "python312"
+  entrypoint         = "main.search_handler"
+  memory             = "256"
+  execution_timeout  = "60"
+  folder_id          = var.folder_id
+  service_account_id = yandex_iam_service_account.sa.id
+  content {
+    zip_filename = data.archive_file.fetch_ydb_zip.output_path
+  }
+  environment = {
+    YDB_ENDPOINT                    = "grpcs://${yandex_ydb_database_serverless.ydb.ydb_api_endpoint}"
+    YDB_DATABASE                    = yandex_ydb_database_serverless.ydb.database_path
+    YDB_TASKS_TABLE_NAME            = yandex_ydb_table.tasks_table.path
+    YDB_STAGE_EVENTS_TABLE_NAME     = yandex_ydb_table.stage_events_table.path
+    YDB_SEARCH_POSTINGS_TABLE_NAME  = yandex_ydb_table.search_postings_table.path
+    YDB_SEARCH_DOCUMENTS_TABLE_NAME = yandex_ydb_table.search_documents_table.path
   }
 }
 
@@ -508,8 +956,11 @@ resource "yandex_api_gateway" "tasks_gateway" {
 
     service_account_id = yandex_iam_service_account.sa.id
 
-    fetch_ydb_function_id     = yandex_function.fetch_ydb.id
-    form_receiver_function_id = yandex_function.form_receiver.id
+    fetch_ydb_function_id          = yandex_function.fetch_ydb.id
+    form_receiver_function_id      = yandex_function.form_receiver.id
+    form_receiver_bulk_function_id = yandex_function.form_receiver_bulk.id
+    fetch_ydb_timings_function_id = yandex_function.fetch_ydb_timings.id
+    fetch_ydb_search_function_id = yandex_function.fetch_ydb_search.id
   })
 }
 